@@ -0,0 +1,129 @@
+"""Builds a talent_management.db of any size for benchmarks: the schema and seed rows from
+database/database_setup.py, then synthetic companies, users and profiles from a fixed seed.
+
+    python benchmarks/generate_db.py --profiles 5000 --output /tmp/bench/talent_management.db
+"""
+import os
+import sys
+import random
+import sqlite3
+import argparse
+import tempfile
+import contextlib
+import runpy
+import shutil
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent.absolute()
+SETUP_SCRIPT = PROJECT_ROOT / "database" / "database_setup.py"
+
+FIRST_NAMES = ["Aarav", "Priya", "Liam", "Olivia", "Noah", "Emma", "Arjun", "Sofia", "Mateo", "Yuki", "Chen", "Fatima",
+               "Omar", "Hannah", "Lucas", "Isabella", "Ravi", "Meera", "Ethan", "Zara", "Kofi", "Amara", "Diego", "Lena"]
+LAST_NAMES = ["Sharma", "Smith", "Garcia", "Kim", "Patel", "Nguyen", "Muller", "Rossi", "Khan", "Silva", "Tanaka",
+              "Okafor", "Dubois", "Novak", "Iyer", "Brown", "Lopez", "Cohen", "Haddad", "Larsen"]
+JOB_TITLES = {
+    "Data Scientist": ["Python", "SQL", "Machine Learning", "Statistics", "TensorFlow", "Pandas"],
+    "Data Engineer": ["Python", "SQL", "Spark", "AWS", "Airflow", "Kafka"],
+    "Java Developer": ["Java", "Spring", "Microservices", "SQL", "Docker"],
+    "Frontend Developer": ["JavaScript", "React", "TypeScript", "CSS", "HTML"],
+    "DevOps Engineer": ["DevOps", "Cloud", "Kubernetes", "Docker", "Terraform", "AWS"],
+    "PHP Developer": ["PHP", "Laravel", "MySQL", "JavaScript"],
+    "HR Manager": ["Recruitment", "Payroll", "Onboarding", "Employee Relations"],
+    "Sales Manager": ["Sales", "Negotiation", "CRM", "Lead Generation"],
+    "IT Consultant": ["DevOps", "Cloud", "Project Management", "ITIL"],
+    "Business Analyst": ["Requirements", "SQL", "Stakeholder Management", "Agile"],
+}
+CITIES = [("Mumbai", "MH", "India"), ("Bengaluru", "KA", "India"), ("Pune", "MH", "India"), ("London", "ENG", "UK"),
+          ("New York", "NY", "USA"), ("Toronto", "ON", "Canada"), ("Berlin", "BE", "Germany"), ("Sydney", "NSW", "Australia")]
+CATEGORIES = ["IT Services", "Finance", "Healthcare", "Education", "Retail", "Energy", "Consulting", "Logistics"]
+EMPLOYEE_TYPES = ["Full-Time", "Part-Time", "Freelancer"]
+AVAILABILITY = ["Available", "Immediate", "Unavailable", "Available in 30 days"]
+
+
+def profile_names(count, seed=0):
+    """The first `count` synthetic profile names, in insertion order (questions are built from them)"""
+    rng = random.Random(seed)
+    names = []
+    for i in range(count):
+        names.append(f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}")
+    return names
+
+
+def generate_database(path, profiles=2000, companies=50, seed=0):
+    """Write a fresh database with `profiles` synthetic profiles (on top of the seed rows) to `path`"""
+    rng = random.Random(seed)
+    path = Path(path).absolute()
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    # database_setup.py writes talent_management.db into the working directory and prints when done
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            with contextlib.redirect_stdout(sys.stderr):
+                runpy.run_path(str(SETUP_SCRIPT))
+        finally:
+            os.chdir(cwd)
+        shutil.move(os.path.join(workdir, "talent_management.db"), path)
+
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA foreign_keys = ON;")
+    first_company = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM company").fetchone()[0]
+    first_user = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM users").fetchone()[0]
+    first_profile = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM add_profile").fetchone()[0]
+
+    company_ids = list(range(first_company, first_company + companies))
+    conn.executemany(
+        "INSERT INTO company (id, company_name, company_category, company_turnover, email, number_of_employee, is_active, plan_id, expire_date) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (company_id, f"Company {company_id}", rng.choice(CATEGORIES), f"${rng.randint(1, 50)}M", f"contact@company{company_id}.com",
+             str(rng.randint(10, 5000)), rng.randint(0, 1), rng.randint(1, 3), f"2026-{rng.randint(1, 12):02d}-01")
+            for company_id in company_ids
+        ],
+    )
+
+    users, rows = [], []
+    for i, name in enumerate(profile_names(profiles, seed)):
+        user_id, profile_id = first_user + i, first_profile + i
+        company_id = rng.choice(company_ids)
+        title = rng.choice(list(JOB_TITLES))
+        skills = rng.sample(JOB_TITLES[title], k=rng.randint(2, len(JOB_TITLES[title])))
+        city, state, country = rng.choice(CITIES)
+        years = rng.randint(1, 20)
+        rate = rng.randint(20, 120)
+        email = f"user{user_id}@example.com"
+        users.append((user_id, company_id, name, email, "hashed_pw", str(rng.randint(10**9, 10**10 - 1)), rng.randint(1, 2), 1))
+        experience, charge_rate = f"{years} years", f"${rate}/hr"
+        rows.append((
+            profile_id, user_id, company_id, name, title, f"{title} with {years} years of experience in {', '.join(skills)}",
+            ", ".join(skills), experience, f"{title} Cert", charge_rate, rate, rate * 80, "Bachelor's degree",
+            f"Project {profile_id}", rng.choice(EMPLOYEE_TYPES), rng.choice(AVAILABILITY), f"linkedin_{profile_id}",
+            f"img{profile_id}.jpg", f"resume{profile_id}.pdf", users[-1][5], email, city, rng.choice(["Male", "Female"]),
+            country, state, city, rng.randint(0, 500),
+        ))
+
+    conn.executemany(
+        "INSERT INTO users (id, company_id, full_name, email, password, phone, user_type, is_active) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        users,
+    )
+    conn.executemany("""
+        INSERT INTO add_profile (id, user_id, company_id, profile_name, job_title, professional_summary, key_skill, experience, certificate, charge_rate,
+                                 charge_rate_dollar, charge_rate_inr, education, projects, employee_type, availability, linkedin_account_id, profile_image,
+                                 profile_resume, mobile, email, location, gender, country, state, city, view_count)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+    conn.commit()
+    conn.execute("ANALYZE;")
+    conn.close()
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", default="talent_management.db")
+    parser.add_argument("--profiles", type=int, default=2000)
+    parser.add_argument("--companies", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(generate_database(args.output, args.profiles, args.companies, args.seed))
@@ -0,0 +1,303 @@
+"""End-to-end benchmark of the RAG pipeline on the offline LLM/embedding stand-ins (LLM_BACKEND=fake).
+
+Generates a talent_management.db, then drives every stage (routing, SQL generation, SQL execution,
+answering, get_structured_qa_chain, RAGSystem.process_query, match_candidate) at each concurrency
+level and reports p50/p95/p99 latency and throughput. Results are written as JSON so two commits
+can be compared:
+
+    python benchmarks/run_benchmark.py --output before.json
+    python benchmarks/run_benchmark.py --output after.json --compare before.json
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+import contextlib
+from pathlib import Path
+from datetime import datetime, timezone
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).parent.parent.absolute()
+sys.path.append(str(PROJECT_ROOT))
+
+from benchmarks.generate_db import generate_database, profile_names, JOB_TITLES, CITIES
+
+RESULTS_SCHEMA_VERSION = 1
+
+STAGES = ["route", "sql_generation", "sql_execution", "answer", "structured_chain", "process_query", "match_candidate", "match_candidate_pdf"]
+
+QUESTION_TEMPLATES = [
+    "What is the job title of {name}?",
+    "What is the phone number and email of {name}?",
+    "How many profiles have {skill} skills?",
+    "What is the average charge rate of {title}s?",
+    "List profiles with more than {years} years of experience",
+    "Show me the profiles in {city}?",
+]
+
+SAMPLE_JD_PDF = PROJECT_ROOT / "utils" / "sample-job-description.pdf"
+
+
+class Workload:
+    """Never-repeating questions and job descriptions, so caches only help where production would hit them too"""
+
+    def __init__(self, names):
+        self.names = names
+        self.skills = sorted({skill for skills in JOB_TITLES.values() for skill in skills})
+        self.titles = list(JOB_TITLES)
+        self.cities = [city for city, _, _ in CITIES]
+        self._next = 0
+
+    def _take(self):
+        i = self._next
+        self._next += 1
+        return i
+
+    def question(self):
+        i = self._take()
+        template = QUESTION_TEMPLATES[i % len(QUESTION_TEMPLATES)]
+        return template.format(
+            name=self.names[i % len(self.names)],
+            skill=self.skills[i % len(self.skills)],
+            title=self.titles[i % len(self.titles)],
+            years=1 + i % 19,
+            city=self.cities[i % len(self.cities)],
+        )
+
+    def job_description(self):
+        i = self._take()
+        title = self.titles[i % len(self.titles)]
+        skills = JOB_TITLES[title]
+        return (
+            f"We are hiring a {title} (req {i}) with strong {', '.join(skills[:3])} skills and {3 + i % 10}+ years of "
+            f"experience. The candidate should be available immediately and able to work from {self.cities[i % len(self.cities)]}."
+        )
+
+
+def summarize(latencies, errors, wall_seconds):
+    samples = np.asarray(latencies, dtype=np.float64) * 1000
+    summary = {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / wall_seconds, 3) if wall_seconds else None,
+    }
+    for name, q in (("p50_ms", 50), ("p95_ms", 95), ("p99_ms", 99)):
+        summary[name] = round(float(np.percentile(samples, q)), 3) if len(samples) else None
+    summary["mean_ms"] = round(float(samples.mean()), 3) if len(samples) else None
+    return summary
+
+
+async def run_level(call, requests, concurrency):
+    """`requests` calls of `call()`, `concurrency` at a time; latency of each successful call and the wall time"""
+    latencies, errors = [], 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                await call()
+            except Exception as e:
+                errors += 1
+                print(f"  error: {e}", file=sys.stderr)
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+def stage_calls(rag, workload):
+    """Stage name -> zero-argument coroutine function exercising that stage with fresh input each call"""
+    from config.fake_llm import FakeLLM
+    from config.gemini_llm import gemini_pro_llm
+    from utils.result_compactor import compact_result
+    from utils.structured_qa_chain import get_structured_qa_chain, get_structured_chain, STRUCTURED_TABLES
+
+    chain = get_structured_chain()
+    scripted = FakeLLM()
+
+    def scripted_sql(question):
+        return scripted.respond(f"Question: {question}\nSQLQuery: ")
+
+    async def route():
+        await rag.router.route(workload.question())
+
+    async def sql_generation():
+        await chain.awrite_query({"question": workload.question()})
+
+    async def sql_execution():
+        await chain.aexecute_query(scripted_sql(workload.question()))
+
+    async def answer():
+        question = workload.question()
+        sql = scripted_sql(question)
+        sql_result = await chain.aexecute_query(sql)
+        inputs = {
+            "question": question, "query": sql, "sql_result": sql_result, "result": compact_result(sql_result),
+            "language": "ENGLISH", "chat_history": "No previous conversation chat history",
+        }
+        await chain.aanswer(inputs)
+
+    async def structured_chain():
+        question = workload.question()
+        await get_structured_qa_chain(
+            token="benchmark", connection="", table_names=STRUCTURED_TABLES, query=question,
+            real_user_question=question, chat_history=[], llm=gemini_pro_llm, chat_id="benchmark",
+        )
+
+    async def process_query():
+        await rag.process_query(workload.question())
+
+    async def match_candidate():
+        await asyncio.to_thread(rag.candidate_matcher, input_data=workload.job_description())
+
+    async def match_candidate_pdf():
+        await asyncio.to_thread(rag.candidate_matcher, document_path=str(SAMPLE_JD_PDF))
+
+    return {
+        "route": route,
+        "sql_generation": sql_generation,
+        "sql_execution": sql_execution,
+        "answer": answer,
+        "structured_chain": structured_chain,
+        "process_query": process_query,
+        "match_candidate": match_candidate,
+        "match_candidate_pdf": match_candidate_pdf,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+async def run(args, db_path):
+    # Imported only now: the config module reads the environment prepared in main()
+    from config.config import FAKE_LLM_LATENCY_SECONDS, FAKE_LLM_TOKENS_PER_SECOND, FAKE_EMBEDDING_LATENCY_SECONDS
+    from config.llm_gateway import llm_gateway
+    from main import RAGSystem
+
+    with contextlib.redirect_stdout(sys.stderr):
+        rag = RAGSystem()
+    if not args.provider_limits:
+        # The fakes have no provider quota: keep the gateway's concurrency caps, lift its requests/tokens per minute
+        for name in llm_gateway.stats():
+            limiter = llm_gateway.limiter(name)
+            limiter.rpm = limiter.tpm = float("inf")
+    workload = Workload(profile_names(args.profiles, args.seed))
+    calls = stage_calls(rag, workload)
+
+    results = {}
+    for stage in args.stages:
+        results[stage] = {}
+        for concurrency in args.concurrency:
+            # The first call pays for lazy set-up (model warm-up, index load); keep it out of the numbers
+            with contextlib.redirect_stdout(sys.stderr):
+                await calls[stage]()
+                summary = await run_level(calls[stage], args.requests, concurrency)
+            results[stage][str(concurrency)] = summary
+            print(f"{stage:<20} c={concurrency:<3} p50={summary['p50_ms']}ms p95={summary['p95_ms']}ms "
+                  f"p99={summary['p99_ms']}ms {summary['throughput_rps']} req/s", file=sys.stderr)
+
+    return {
+        "schema_version": RESULTS_SCHEMA_VERSION,
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": str(db_path),
+            "profiles": args.profiles,
+            "requests_per_level": args.requests,
+            "concurrency": args.concurrency,
+            "provider_limits": args.provider_limits,
+            "fake_llm_latency_seconds": FAKE_LLM_LATENCY_SECONDS,
+            "fake_llm_tokens_per_second": FAKE_LLM_TOKENS_PER_SECOND,
+            "fake_embedding_latency_seconds": FAKE_EMBEDDING_LATENCY_SECONDS,
+        },
+        "stages": results,
+        "counters": json.loads(json.dumps(rag.stats(), default=str)),
+    }
+
+
+def compare(current, baseline):
+    """Per stage and concurrency: p50/p95/p99 and throughput now vs. the baseline file, as printable lines"""
+    lines = [f"{'stage':<20} {'c':>3} {'metric':<15} {'baseline':>10} {'current':>10} {'change':>8}"]
+    for stage, levels in current["stages"].items():
+        for concurrency, summary in levels.items():
+            before = baseline.get("stages", {}).get(stage, {}).get(concurrency)
+            if not before:
+                continue
+            for metric in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps"):
+                old, new = before.get(metric), summary.get(metric)
+                if old is None or new is None:
+                    continue
+                change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+                lines.append(f"{stage:<20} {concurrency:>3} {metric:<15} {old:>10.2f} {new:>10.2f} {change:>8}")
+    return lines
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="write the JSON results here (default: stdout)")
+    parser.add_argument("--compare", help="earlier results file to print deltas against")
+    parser.add_argument("--profiles", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--requests", type=int, default=50, help="calls per stage and concurrency level")
+    parser.add_argument("--concurrency", type=lambda s: [int(c) for c in s.split(",")], default=[1, 4, 16])
+    parser.add_argument("--stages", type=lambda s: s.split(","), default=STAGES)
+    parser.add_argument("--llm-latency", type=float, help="fake LLM time to first token, seconds")
+    parser.add_argument("--llm-tokens-per-second", type=float, help="fake LLM output rate")
+    parser.add_argument("--embedding-latency", type=float, help="fake embedder time per text, seconds")
+    parser.add_argument("--provider-limits", action="store_true", help="keep the gateway's requests/min and tokens/min limits")
+    parser.add_argument("--workdir", help="where the database and caches go (default: a fresh temporary directory)")
+    args = parser.parse_args()
+    unknown = set(args.stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main():
+    args = parse_args()
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="ragbench-")).absolute()
+    workdir.mkdir(parents=True, exist_ok=True)
+    output = Path(args.output).absolute() if args.output else None
+    baseline_path = Path(args.compare).absolute() if args.compare else None
+    db_path = generate_database(workdir / "talent_management.db", profiles=args.profiles, seed=args.seed)
+
+    os.environ.update({"LLM_BACKEND": "fake", "SQLITE_DB_PATH": str(db_path), "PROFILE_SOURCE": "sqlite"})
+    for option, variable in (("llm_latency", "FAKE_LLM_LATENCY_SECONDS"), ("llm_tokens_per_second", "FAKE_LLM_TOKENS_PER_SECOND"),
+                             ("embedding_latency", "FAKE_EMBEDDING_LATENCY_SECONDS")):
+        if getattr(args, option) is not None:
+            os.environ[variable] = str(getattr(args, option))
+    # Caches, the candidate index and example files are created relative to the working directory
+    os.chdir(workdir)
+
+    results = asyncio.run(run(args, db_path))
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if output:
+        output.write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+    if baseline_path:
+        baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+        print("\n".join(compare(results, baseline)), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
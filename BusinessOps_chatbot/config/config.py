@@ -1,3 +1,5 @@
+import os
+
 USER = "your_username"
 PASSWORD = "your_password"
 HOST = "your_host"
@@ -5,4 +7,128 @@ DATABASE = "your_database"
 
 GEMINI_PRO_002_MODEL = "gemini-1.5-pro-002"
 GEMINI_EMBEDDINGS_MODEL = "text-embedding-004"
-GEMINI_FLASH_LITE_001_MODEL = "gemini-2.0-flash-lite-001"
\ No newline at end of file
+GEMINI_FLASH_LITE_001_MODEL = "gemini-2.0-flash-lite-001"
+GROQ_MATCHER_MODEL = "llama3-70b-8192"
+
+# Semantic question -> SQL cache
+SQL_CACHE_SIMILARITY_THRESHOLD = 0.95
+SQL_CACHE_MAX_SIZE = 512
+SQL_CACHE_TTL_SECONDS = 3600
+# Columns whose values (cities, skills, names, ...) a semantic hit must agree on, and a cap on how many are loaded
+SQL_CACHE_ENTITY_COLUMNS = [
+    "add_profile.city", "add_profile.location", "add_profile.country", "add_profile.job_title",
+    "add_profile.profile_name", "profile_skill.skill", "company.company_name", "company.company_category", "users.full_name",
+]
+SQL_CACHE_MAX_ENTITY_VALUES = 100000
+
+# SQL result cache ("memory" or "disk")
+SQL_RESULT_CACHE_BACKEND = "memory"
+SQL_RESULT_CACHE_PATH = "sql_result_cache.db"
+SQL_RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# Upper bound on an entry's age, for writes the cache is not told about (e.g. another service writing MySQL)
+SQL_RESULT_CACHE_TTL_SECONDS = 300
+
+# Local CPU embedding model (router, candidate index)
+LOCAL_EMBEDDINGS_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Query router
+ROUTER_CENTROID_MARGIN = 0.05
+ROUTER_CACHE_SIZE = 1024
+
+# HTTP service (overridable per deployment)
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "4"))
+MAX_IN_FLIGHT_REQUESTS = int(os.getenv("MAX_IN_FLIGHT_REQUESTS", "32"))
+# Admin endpoints (POST /sql_examples) require this value in the X-Admin-Token header; unset disables them
+ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN")
+# The only directory `job_description_path` may point into
+JOB_DESCRIPTION_DIR = os.getenv("JOB_DESCRIPTION_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "job_descriptions"))
+
+# On-disk embedding cache shared by every embedding call site. Past EMBEDDING_CACHE_MAX_ENTRIES vectors
+# (per model) the least recently used are dropped until the cache is back to 3/4 of the cap
+EMBEDDING_CACHE_DIR = "embedding_cache"
+EMBEDDING_CACHE_MAX_ENTRIES = 200000
+
+# Profile ingestion (EMBEDDING_WORKERS = 0 uses every core)
+EMBEDDING_BATCH_SIZE = 256
+EMBEDDING_WORKERS = 0
+
+# SQLite copy of the talent management schema (see database/database_setup.py)
+SQLITE_DB_PATH = os.getenv("SQLITE_DB_PATH", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "database", "talent_management.db"))
+
+# Candidate profile loader: "mysql" (candidates table) or "sqlite" (add_profile)
+PROFILE_SOURCE = os.getenv("PROFILE_SOURCE", "mysql")
+PROFILE_LOAD_CHUNK_SIZE = 1000
+
+# Hybrid candidate retrieval (BM25 + vector, reciprocal-rank fusion)
+HYBRID_FETCH_K = 20
+RRF_K = 60
+
+# SQLite engine for generated SQL (read-only pooled connections)
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+SQLITE_CACHE_SIZE_KB = 64 * 1024
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "8"))
+SQLITE_POOL_TIMEOUT = 30
+
+# Worker threads running generated SQL off the event loop
+SQL_EXECUTOR_WORKERS = SQLITE_POOL_SIZE
+
+# Cost guard for generated SQL
+SQL_GUARD_MAX_ROWS = 200
+SQL_GUARD_MAX_SCAN_ROWS = 100000
+SQL_STATEMENT_TIMEOUT_SECONDS = 10
+
+# Query results in the answer prompt (larger results are summarized and truncated)
+ANSWER_RESULT_TOKEN_BUDGET = 1500
+ANSWER_RESULT_MAX_CELL_CHARS = 300
+
+# Few-shot examples for SQL generation (seed list plus verified pairs appended to SQL_EXAMPLES_PATH)
+FEW_SHOT_K = 3
+SQL_EXAMPLES_PATH = "sql_examples.jsonl"
+
+# Schema linking: only the columns a question needs go into table_info
+SCHEMA_LINK_TOP_COLUMNS = 8
+SCHEMA_LINK_MIN_SIMILARITY = 0.3
+SCHEMA_EXCLUDED_COLUMNS = ["password"]
+
+# Answer simple results (a scalar or a small table) from a template instead of the answer LLM
+ANSWER_TEMPLATES_ENABLED = True
+ANSWER_TEMPLATE_MAX_ROWS = 10
+ANSWER_TEMPLATE_MAX_COLUMNS = 6
+
+# "speculative" writes the SQL while the router decides; "sequential" routes first
+ROUTING_MODE = os.getenv("ROUTING_MODE", "speculative")
+LATENCY_WINDOW = 1000
+
+# Identical questions in flight at the same time share one execution
+SINGLE_FLIGHT_TIMEOUT_SECONDS = 120
+
+# LLM gateway: per-model concurrency, requests/min and tokens/min, shared by every chain
+LLM_DEFAULT_LIMITS = {"concurrency": 4, "rpm": 60, "tpm": 100000}
+LLM_MODEL_LIMITS = {
+    GEMINI_PRO_002_MODEL: {"concurrency": 8, "rpm": 360, "tpm": 2000000},
+    GEMINI_FLASH_LITE_001_MODEL: {"concurrency": 16, "rpm": 1000, "tpm": 2000000},
+    GROQ_MATCHER_MODEL: {"concurrency": 2, "rpm": 30, "tpm": 6000},
+}
+LLM_CALL_TIMEOUT_SECONDS = 60
+LLM_MAX_RETRIES = 3
+LLM_LATENCY_TARGET_SECONDS = 20
+LLM_OUTPUT_TOKEN_ESTIMATE = 500
+# Budget for all LLM calls made while answering one request
+REQUEST_DEADLINE_SECONDS = 90
+
+# "gemini" calls the real Gemini/Groq models; "fake" swaps in the offline stand-ins from config/fake_llm.py
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+# Fake LLM latency model: fixed time to first token, then prompt reading and output at these token rates
+FAKE_LLM_LATENCY_SECONDS = float(os.getenv("FAKE_LLM_LATENCY_SECONDS", "0.3"))
+FAKE_LLM_PREFILL_TOKENS_PER_SECOND = float(os.getenv("FAKE_LLM_PREFILL_TOKENS_PER_SECOND", "20000"))
+FAKE_LLM_TOKENS_PER_SECOND = float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "150"))
+FAKE_EMBEDDING_LATENCY_SECONDS = float(os.getenv("FAKE_EMBEDDING_LATENCY_SECONDS", "0.005"))
+FAKE_EMBEDDING_DIMENSIONS = 384
+
+# Stage latency histograms are always collected and served on /metrics. Spans are written as OpenTelemetry
+# JSON lines when TRACE_EXPORT_PATH is set ("{pid}" in it becomes the worker process id)
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH")
+TRACE_SAMPLE_RATIO = float(os.getenv("TRACE_SAMPLE_RATIO", "1.0"))
+STAGE_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
\ No newline at end of file
@@ -0,0 +1,154 @@
+import re
+import time
+import asyncio
+import hashlib
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import LLM
+from langchain_core.outputs import GenerationChunk
+
+from config.config import (
+    FAKE_LLM_LATENCY_SECONDS, FAKE_LLM_PREFILL_TOKENS_PER_SECOND, FAKE_LLM_TOKENS_PER_SECOND,
+    FAKE_EMBEDDING_LATENCY_SECONDS, FAKE_EMBEDDING_DIMENSIONS,
+)
+
+# Question pattern -> SQL, for the questions the benchmark asks. Named groups are substituted into the SQL
+# with quotes escaped; questions that match nothing get DEFAULT_SQL.
+SQL_RULES = [
+    (r"job title of (?P<name>.+?)\?", "SELECT job_title FROM add_profile WHERE profile_name = '{name}'"),
+    (r"phone number and email of (?P<name>.+?)\?", "SELECT mobile, email FROM add_profile WHERE profile_name = '{name}'"),
+    (r"how many profiles have (?P<skill>.+?) skills",
+     "SELECT COUNT(*) FROM profile_skill WHERE skill = lower('{skill}')"),
+    (r"average charge rate (?:of|for) (?P<title>.+?)s?\?",
+     "SELECT AVG(charge_rate_dollar) FROM add_profile WHERE job_title = '{title}'"),
+    (r"more than (?P<years>\d+) years",
+     "SELECT profile_name, job_title, experience FROM add_profile WHERE experience_years > {years} ORDER BY experience_years DESC LIMIT 25"),
+    (r"profiles (?:located )?in (?P<city>.+?)\?",
+     "SELECT profile_name, job_title, charge_rate FROM add_profile WHERE city = '{city}' LIMIT 25"),
+]
+DEFAULT_SQL = "SELECT COUNT(*) FROM add_profile"
+
+_FILLER = (
+    "Based on the available records the result above answers the question. The figures come straight from "
+    "the profiles on file and reflect their latest update. Let me know if you would like them broken down "
+    "further by company, location or availability."
+).split()
+
+
+def _tokens(text):
+    return (len(text) + 3) // 4
+
+
+class FakeLLM(LLM):
+    """Offline stand-in for the Gemini and Groq models: scripted, deterministic output with a latency model.
+
+    The reply depends on which prompt it gets: "structured" for the router, SQL from `sql_rules` for
+    the SQL prompt (matched against its last question), and `answer_tokens` of filler for anything
+    else. A call takes `latency_seconds`, plus the prompt at `prefill_tokens_per_second`, plus the
+    output at `tokens_per_second`; streaming spreads the output over its chunks.
+    """
+
+    latency_seconds: float = FAKE_LLM_LATENCY_SECONDS
+    prefill_tokens_per_second: float = FAKE_LLM_PREFILL_TOKENS_PER_SECOND
+    tokens_per_second: float = FAKE_LLM_TOKENS_PER_SECOND
+    sql_rules: List[Tuple[str, str]] = SQL_RULES
+    default_sql: str = DEFAULT_SQL
+    answer_tokens: int = 120
+    calls: int = 0
+
+    @property
+    def _llm_type(self):
+        return "fake"
+
+    def respond(self, prompt):
+        """The scripted reply to `prompt`"""
+        tail = prompt.rstrip()
+        if tail.endswith("Classification:"):
+            return "structured"
+        if "SQLQuery:" in tail[-200:]:
+            question = re.findall(r"Question: (.*?)\s*SQLQuery:", prompt, re.DOTALL)[-1]
+            for pattern, sql in self.sql_rules:
+                match = re.search(pattern, question, re.IGNORECASE)
+                if match:
+                    return sql.format(**{k: v.replace("'", "''") for k, v in match.groupdict().items()})
+            return self.default_sql
+        # Same prompt, same words: the filler starts at an offset derived from the prompt
+        offset = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), 16) % len(_FILLER)
+        words = [_FILLER[(offset + i) % len(_FILLER)] for i in range(max(1, self.answer_tokens * 3 // 4))]
+        return " ".join(words)
+
+    def _delays(self, prompt, output):
+        first = self.latency_seconds + _tokens(prompt) / self.prefill_tokens_per_second
+        return first, _tokens(output) / self.tokens_per_second
+
+    @staticmethod
+    def _stop(text, stop):
+        for marker in stop or ():
+            index = text.find(marker)
+            if index != -1:
+                text = text[:index]
+        return text
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> str:
+        self.calls += 1
+        output = self._stop(self.respond(prompt), stop)
+        first, generate = self._delays(prompt, output)
+        time.sleep(first + generate)
+        return output
+
+    async def _acall(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> str:
+        self.calls += 1
+        output = self._stop(self.respond(prompt), stop)
+        first, generate = self._delays(prompt, output)
+        await asyncio.sleep(first + generate)
+        return output
+
+    def _chunks(self, prompt, stop):
+        output = self._stop(self.respond(prompt), stop)
+        chunks = re.findall(r"\S+\s*", output) or [output]
+        first, generate = self._delays(prompt, output)
+        return chunks, first, generate / len(chunks)
+
+    def _stream(self, prompt, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        chunks, first, per_chunk = self._chunks(prompt, stop)
+        time.sleep(first)
+        for chunk in chunks:
+            time.sleep(per_chunk)
+            yield GenerationChunk(text=chunk)
+
+    async def _astream(self, prompt, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        chunks, first, per_chunk = self._chunks(prompt, stop)
+        await asyncio.sleep(first)
+        for chunk in chunks:
+            await asyncio.sleep(per_chunk)
+            yield GenerationChunk(text=chunk)
+
+
+class FakeEmbeddings(Embeddings):
+    """Offline embedder: hashed bag of words, so texts sharing words are similar and every run gives the
+    same vectors. Each call sleeps `latency_seconds` per text"""
+
+    def __init__(self, dimensions=FAKE_EMBEDDING_DIMENSIONS, latency_seconds=FAKE_EMBEDDING_LATENCY_SECONDS):
+        self.dimensions = dimensions
+        self.latency_seconds = latency_seconds
+        self.model_name = f"fake-embeddings-{dimensions}"
+
+    def _embed(self, text):
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for word in re.findall(r"[a-z0-9+#]+", text.lower()):
+            digest = hashlib.md5(word.encode("utf-8")).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.dimensions] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        time.sleep(self.latency_seconds * len(texts))
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        time.sleep(self.latency_seconds)
+        return self._embed(text)
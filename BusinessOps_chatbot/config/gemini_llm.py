@@ -1,9 +1,17 @@
 import os
 from langchain_google_genai import GoogleGenerativeAI, ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings, HarmBlockThreshold, HarmCategory
+from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain_groq import ChatGroq
 
 
 
-from config.config import GEMINI_FLASH_LITE_001_MODEL, GEMINI_PRO_002_MODEL, GEMINI_EMBEDDINGS_MODEL
+from config.config import (
+    GEMINI_FLASH_LITE_001_MODEL, GEMINI_PRO_002_MODEL, GEMINI_EMBEDDINGS_MODEL, LOCAL_EMBEDDINGS_MODEL, GROQ_MATCHER_MODEL,
+    LLM_CALL_TIMEOUT_SECONDS, LLM_BACKEND,
+)
+from config.llm_gateway import llm_gateway
+from config.fake_llm import FakeLLM, FakeEmbeddings
+from utils.embedding_cache import CachedEmbeddings
 
 
 api_key = ""
@@ -16,26 +24,49 @@ safety_settings = {
     HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_ONLY_HIGH,
 }
 
-gemini_flash_llm = GoogleGenerativeAI(
-    model=GEMINI_FLASH_LITE_001_MODEL,
-    google_api_key = api_key,
-    temperature=0.1,
-    max_tokens=8192,
-    verbose=True,
-    timeout=None,
-    max_retries=2,
-    safety_settings = safety_settings
-)
+# Every model goes through the LLM gateway, which owns concurrency, rate limits, 429 retries and deadlines,
+# so the clients themselves do not retry
+if LLM_BACKEND == "fake":
+    # Offline: scripted output and a latency model, no keys or network (benchmarks, local runs)
+    gemini_flash_llm = llm_gateway.wrap(FakeLLM(), GEMINI_FLASH_LITE_001_MODEL)
+    gemini_pro_llm = llm_gateway.wrap(FakeLLM(), GEMINI_PRO_002_MODEL)
+    groq_matcher_llm = llm_gateway.wrap(FakeLLM(), GROQ_MATCHER_MODEL)
+    gemini_embeddings = CachedEmbeddings(FakeEmbeddings(), model_name="fake-" + GEMINI_EMBEDDINGS_MODEL)
+    local_embeddings = CachedEmbeddings(FakeEmbeddings(), model_name="fake-" + LOCAL_EMBEDDINGS_MODEL)
+else:
+    gemini_flash_llm = llm_gateway.wrap(GoogleGenerativeAI(
+        model=GEMINI_FLASH_LITE_001_MODEL,
+        google_api_key = api_key,
+        temperature=0.1,
+        max_tokens=8192,
+        verbose=True,
+        timeout=LLM_CALL_TIMEOUT_SECONDS,
+        max_retries=0,
+        safety_settings = safety_settings
+    ), GEMINI_FLASH_LITE_001_MODEL)
 
-gemini_pro_llm = GoogleGenerativeAI(
-    model=GEMINI_PRO_002_MODEL,
-    google_api_key = api_key,
-    temperature=0.1,
-    max_tokens=8192,
-    verbose=True,
-    timeout=None,
-    max_retries=2,
-    safety_settings = safety_settings
-)
+    gemini_pro_llm = llm_gateway.wrap(GoogleGenerativeAI(
+        model=GEMINI_PRO_002_MODEL,
+        google_api_key = api_key,
+        temperature=0.1,
+        max_tokens=8192,
+        verbose=True,
+        timeout=LLM_CALL_TIMEOUT_SECONDS,
+        max_retries=0,
+        safety_settings = safety_settings
+    ), GEMINI_PRO_002_MODEL)
+
+    # Candidate matcher
+    groq_matcher_llm = llm_gateway.wrap(
+        ChatGroq(model=GROQ_MATCHER_MODEL, temperature=0, timeout=LLM_CALL_TIMEOUT_SECONDS, max_retries=0),
+        GROQ_MATCHER_MODEL
+    )
+
+    # Both embedders sit behind the on-disk cache so text that was embedded once is never paid for again
+    gemini_embeddings = CachedEmbeddings(
+        GoogleGenerativeAIEmbeddings(model=GEMINI_EMBEDDINGS_MODEL, google_api_key = api_key),
+        model_name=GEMINI_EMBEDDINGS_MODEL
+    )
 
-gemini_embeddings = GoogleGenerativeAIEmbeddings(model=GEMINI_EMBEDDINGS_MODEL, google_api_key = api_key)
+    # Local CPU model for cheap similarity work (routing, candidate index)
+    local_embeddings = CachedEmbeddings(HuggingFaceEmbeddings(model_name=LOCAL_EMBEDDINGS_MODEL), model_name=LOCAL_EMBEDDINGS_MODEL)
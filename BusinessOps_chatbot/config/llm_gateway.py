@@ -0,0 +1,270 @@
+import time
+import random
+import asyncio
+import threading
+import contextvars
+from contextlib import contextmanager
+
+from langchain_core.runnables import Runnable
+
+from config.config import (
+    LLM_DEFAULT_LIMITS, LLM_MODEL_LIMITS, LLM_CALL_TIMEOUT_SECONDS, LLM_MAX_RETRIES,
+    LLM_LATENCY_TARGET_SECONDS, LLM_OUTPUT_TOKEN_ESTIMATE,
+)
+
+# Absolute time.monotonic() by which the current request must be answered; None means no deadline
+_deadline = contextvars.ContextVar("llm_deadline", default=None)
+
+_POLL_SECONDS = 0.05
+
+
+@contextmanager
+def request_deadline(seconds):
+    """Every LLM call made inside this block (tasks and threads started from it included) must finish
+    within `seconds` of entering it"""
+    token = _deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def _remaining(default):
+    deadline = _deadline.get()
+    if deadline is None:
+        return default
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise TimeoutError("request deadline exceeded before the LLM call")
+    return min(default, remaining) if default else remaining
+
+
+def _is_rate_limited(error):
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in ("429", "rate limit", "ratelimit", "resourceexhausted", "resource exhausted", "quota"))
+
+
+def _estimate_tokens(value):
+    if hasattr(value, "to_string"):
+        value = value.to_string()
+    elif isinstance(value, (list, tuple)):
+        value = " ".join(str(getattr(message, "content", message)) for message in value)
+    return (len(str(value)) + 3) // 4
+
+
+class ModelLimiter:
+    """Client-side limits for one model: concurrent calls, requests/min and tokens/min (token buckets).
+
+    Limits shrink multiplicatively when the provider answers 429 or latency exceeds the target and grow
+    back additively on healthy calls, so a burst settles at what the provider will actually serve
+    instead of turning into a retry storm.
+    """
+
+    def __init__(self, name, concurrency, rpm, tpm, latency_target=LLM_LATENCY_TARGET_SECONDS,
+                 output_estimate=LLM_OUTPUT_TOKEN_ESTIMATE):
+        self.name = name
+        self.concurrency = concurrency
+        self.rpm = rpm
+        self.tpm = tpm
+        self.latency_target = latency_target
+        self.output_estimate = output_estimate
+        self._lock = threading.Lock()
+        self._active = 0
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._refilled_at = time.monotonic()
+        self._cooldown_until = 0.0
+        self._consecutive_limited = 0
+        self.scale = 1.0
+        self.calls = 0
+        self.rate_limited = 0
+        self.timeouts = 0
+
+    def _refill(self, now):
+        elapsed = now - self._refilled_at
+        self._refilled_at = now
+        self._requests = min(self.rpm, self._requests + elapsed * self.rpm * self.scale / 60)
+        self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm * self.scale / 60)
+
+    def _try_acquire(self, tokens):
+        # The output is unknown until the call returns: reserve an estimate now, settle it on release
+        tokens += self.output_estimate
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self._cooldown_until:
+                return False
+            if self._active >= max(1, int(self.concurrency * self.scale)):
+                return False
+            # A single call larger than the whole bucket still goes through once the bucket is full
+            if self._requests < 1 or self._tokens < min(tokens, self.tpm):
+                return False
+            self._active += 1
+            self._requests -= 1
+            self._tokens -= tokens
+            return True
+
+    def acquire(self, tokens, timeout):
+        deadline = time.monotonic() + timeout
+        while not self._try_acquire(tokens):
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"no {self.name} capacity within {timeout:.1f}s")
+            time.sleep(_POLL_SECONDS)
+
+    async def aacquire(self, tokens, timeout):
+        deadline = time.monotonic() + timeout
+        while not self._try_acquire(tokens):
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"no {self.name} capacity within {timeout:.1f}s")
+            await asyncio.sleep(_POLL_SECONDS)
+
+    def release(self, latency=None, output_tokens=None, rate_limited=False, timed_out=False):
+        with self._lock:
+            self._active -= 1
+            self.calls += 1
+            if output_tokens is not None:
+                self._tokens -= output_tokens - self.output_estimate
+            if timed_out:
+                self.timeouts += 1
+            if rate_limited:
+                self.rate_limited += 1
+                self._consecutive_limited += 1
+                self.scale = max(0.1, self.scale * 0.5)
+                backoff = min(30.0, 2 ** self._consecutive_limited) * random.uniform(0.5, 1.0)
+                self._cooldown_until = max(self._cooldown_until, time.monotonic() + backoff)
+            elif latency is not None:
+                self._consecutive_limited = 0
+                if timed_out or latency > self.latency_target:
+                    self.scale = max(0.1, self.scale * 0.8)
+                else:
+                    self.scale = min(1.0, self.scale + 0.05)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "active": self._active,
+                "scale": round(self.scale, 3),
+                "calls": self.calls,
+                "rate_limited": self.rate_limited,
+                "timeouts": self.timeouts,
+            }
+
+
+class GatedLLM(Runnable):
+    """Drop-in Runnable around a LangChain LLM/chat model that takes a limiter slot for every call,
+    retries 429s with backoff itself and bounds each call by the request deadline"""
+
+    def __init__(self, llm, limiter, timeout=LLM_CALL_TIMEOUT_SECONDS, max_retries=LLM_MAX_RETRIES):
+        self.llm = llm
+        self.limiter = limiter
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+    def __getattr__(self, name):
+        # Model attributes (model name, temperature, ...) read through to the wrapped client
+        if name == "llm":
+            raise AttributeError(name)
+        return getattr(self.llm, name)
+
+    def invoke(self, input, config=None, **kwargs):
+        # A blocking client call cannot be interrupted from here: the deadline bounds the wait for a slot
+        # and is re-checked before every retry, and the call itself is bounded by the client's own
+        # timeout (LLM_CALL_TIMEOUT_SECONDS, set on every client in gemini_llm.py). Async callers get the
+        # tighter bound of ainvoke
+        tokens = _estimate_tokens(input)
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(tokens, _remaining(self.timeout))
+            started = time.monotonic()
+            try:
+                result = self.llm.invoke(input, config, **kwargs)
+            except Exception as e:
+                limited = _is_rate_limited(e)
+                self.limiter.release(rate_limited=limited)
+                if limited and attempt < self.max_retries:
+                    continue
+                raise
+            self.limiter.release(time.monotonic() - started, _estimate_tokens(result))
+            return result
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        tokens = _estimate_tokens(input)
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.aacquire(tokens, _remaining(self.timeout))
+            started = time.monotonic()
+            try:
+                result = await asyncio.wait_for(self.llm.ainvoke(input, config, **kwargs), _remaining(self.timeout))
+            except asyncio.TimeoutError:
+                self.limiter.release(time.monotonic() - started, timed_out=True)
+                raise TimeoutError(f"{self.limiter.name} call exceeded its deadline")
+            except asyncio.CancelledError:
+                self.limiter.release()
+                raise
+            except Exception as e:
+                limited = _is_rate_limited(e)
+                self.limiter.release(rate_limited=limited)
+                if limited and attempt < self.max_retries:
+                    continue
+                raise
+            self.limiter.release(time.monotonic() - started, _estimate_tokens(result))
+            return result
+
+    def stream(self, input, config=None, **kwargs):
+        # Streams are not retried: part of the answer may already be on its way to the client
+        self.limiter.acquire(_estimate_tokens(input), _remaining(self.timeout))
+        started = time.monotonic()
+        produced = 0
+        try:
+            for chunk in self.llm.stream(input, config, **kwargs):
+                produced += _estimate_tokens(chunk)
+                yield chunk
+        except Exception as e:
+            self.limiter.release(rate_limited=_is_rate_limited(e))
+            raise
+        except BaseException:
+            self.limiter.release()
+            raise
+        self.limiter.release(time.monotonic() - started, produced)
+
+    async def astream(self, input, config=None, **kwargs):
+        await self.limiter.aacquire(_estimate_tokens(input), _remaining(self.timeout))
+        started = time.monotonic()
+        produced = 0
+        try:
+            async for chunk in self.llm.astream(input, config, **kwargs):
+                produced += _estimate_tokens(chunk)
+                yield chunk
+        except Exception as e:
+            self.limiter.release(rate_limited=_is_rate_limited(e))
+            raise
+        except BaseException:
+            self.limiter.release()
+            raise
+        self.limiter.release(time.monotonic() - started, produced)
+
+
+class LLMGateway:
+    """One ModelLimiter per model name, shared by every chain that calls that model"""
+
+    def __init__(self):
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, model_name):
+        with self._lock:
+            limiter = self._limiters.get(model_name)
+            if limiter is None:
+                limits = {**LLM_DEFAULT_LIMITS, **LLM_MODEL_LIMITS.get(model_name, {})}
+                limiter = self._limiters[model_name] = ModelLimiter(model_name, **limits)
+            return limiter
+
+    def wrap(self, llm, model_name=None):
+        model_name = model_name or getattr(llm, "model", None) or getattr(llm, "model_name", None) or type(llm).__name__
+        return GatedLLM(llm, self.limiter(model_name))
+
+    def stats(self):
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {name: limiter.stats() for name, limiter in limiters.items()}
+
+
+llm_gateway = LLMGateway()
@@ -7,6 +7,7 @@ cursor = conn.cursor()
 
 cursor.execute("PRAGMA foreign_keys = ON;")
 
+
 # Create the table (Ensuring compatibility with SQLite)
 cursor.execute("""
 CREATE TABLE IF NOT EXISTS company (
@@ -76,6 +77,7 @@ CREATE TABLE IF NOT EXISTS add_profile (
     state TEXT,
     city TEXT,
     view_count INTEGER DEFAULT 0,
+    experience_years REAL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
@@ -83,6 +85,130 @@ CREATE TABLE IF NOT EXISTS add_profile (
 );
 """)
 
+# `experience_years` is a numeric copy of `experience` ("10 years") and `charge_rate_dollar` holds the rate in
+# `charge_rate` ("$50/hr") as a number, so range filters and aggregates compare numbers and can use an index.
+# experience_years is added in place on databases created before it.
+existing_columns = {row[1] for row in cursor.execute("PRAGMA table_info(add_profile);")}
+if "experience_years" not in existing_columns:
+    cursor.execute("ALTER TABLE add_profile ADD COLUMN experience_years REAL;")
+
+for column in ("experience_years", "charge_rate_dollar", "job_title", "company_id", "created_at", "view_count"):
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_add_profile_{column} ON add_profile({column});")
+
+# Full-text index over the free-text columns the chatbot searches, so `LIKE '%term%'` scans become index probes.
+# External-content FTS5 table: the text lives only in add_profile, the triggers below keep the index in sync.
+cursor.execute("""
+CREATE VIRTUAL TABLE IF NOT EXISTS add_profile_fts USING fts5(
+    key_skill,
+    job_title,
+    availability,
+    professional_summary,
+    content='add_profile',
+    content_rowid='id',
+    tokenize="unicode61 tokenchars '+#'"
+);
+""")
+
+# One row per (profile, skill), lower-cased and trimmed, for exact skill lookups
+cursor.execute("""
+CREATE TABLE IF NOT EXISTS profile_skill (
+    profile_id INTEGER NOT NULL,
+    skill TEXT NOT NULL,
+    PRIMARY KEY (profile_id, skill),
+    FOREIGN KEY (profile_id) REFERENCES add_profile(id) ON DELETE CASCADE
+);
+""")
+cursor.execute("CREATE INDEX IF NOT EXISTS idx_profile_skill_skill ON profile_skill(skill, profile_id);")
+
+# Splits key_skill ("Recruitment, Payroll", or one skill per line) into rows. Triggers cannot use recursive
+# CTEs, so the list is turned into a JSON array and expanded with json_each: line breaks become commas,
+# json_quote escapes quotes, backslashes and any other control character, and each comma closes one element.
+SPLIT_SKILLS = """
+    SELECT {row}.id, lower(trim(value, ' ' || char(9)))
+    FROM {source}json_each('[' || replace(json_quote(replace(replace({row}.key_skill, char(13), ','), char(10), ',')), ',', '","') || ']')
+    WHERE trim(value, ' ' || char(9)) <> ''
+"""
+
+# First number in free text such as "10 years" or "$1,500/hr" (NULL if there is none): commas are removed,
+# the text is cut at its first digit and CAST keeps the leading number
+_WITHOUT_COMMAS = "replace({column}, ',', '')"
+NUMBER_FROM_TEXT = "CAST(nullif(substr({text}, min({positions})), '') AS REAL)".format(
+    text=_WITHOUT_COMMAS,
+    positions=", ".join(f"coalesce(nullif(instr({_WITHOUT_COMMAS}, '{digit}'), 0), 1000000)" for digit in "0123456789"),
+)
+
+# Triggers are dropped and recreated so databases set up by an older version pick up the current definitions
+for trigger in ("add_profile_ai", "add_profile_ad", "add_profile_au", "add_profile_numbers_ai", "add_profile_numbers_au",
+                "add_profile_touch", "users_touch"):
+    cursor.execute(f"DROP TRIGGER IF EXISTS {trigger};")
+
+cursor.execute(f"""
+CREATE TRIGGER add_profile_ai AFTER INSERT ON add_profile BEGIN
+    INSERT INTO add_profile_fts(rowid, key_skill, job_title, availability, professional_summary)
+    VALUES (new.id, new.key_skill, new.job_title, new.availability, new.professional_summary);
+    INSERT OR IGNORE INTO profile_skill (profile_id, skill) {SPLIT_SKILLS.format(row="new", source="")};
+END;
+""")
+
+cursor.execute("""
+CREATE TRIGGER add_profile_ad AFTER DELETE ON add_profile BEGIN
+    INSERT INTO add_profile_fts(add_profile_fts, rowid, key_skill, job_title, availability, professional_summary)
+    VALUES ('delete', old.id, old.key_skill, old.job_title, old.availability, old.professional_summary);
+    DELETE FROM profile_skill WHERE profile_id = old.id;
+END;
+""")
+
+cursor.execute(f"""
+CREATE TRIGGER add_profile_au AFTER UPDATE OF key_skill, job_title, availability, professional_summary ON add_profile BEGIN
+    INSERT INTO add_profile_fts(add_profile_fts, rowid, key_skill, job_title, availability, professional_summary)
+    VALUES ('delete', old.id, old.key_skill, old.job_title, old.availability, old.professional_summary);
+    INSERT INTO add_profile_fts(rowid, key_skill, job_title, availability, professional_summary)
+    VALUES (new.id, new.key_skill, new.job_title, new.availability, new.professional_summary);
+    DELETE FROM profile_skill WHERE profile_id = old.id;
+    INSERT OR IGNORE INTO profile_skill (profile_id, skill) {SPLIT_SKILLS.format(row="new", source="")};
+END;
+""")
+
+# Keep the numeric columns in step with the text they are derived from. charge_rate_dollar is only derived
+# when the writer left it empty (on insert) or changed charge_rate without setting it (on update).
+cursor.execute(f"""
+CREATE TRIGGER add_profile_numbers_ai AFTER INSERT ON add_profile BEGIN
+    UPDATE add_profile
+    SET experience_years = {NUMBER_FROM_TEXT.format(column="new.experience")},
+        charge_rate_dollar = coalesce(new.charge_rate_dollar, {NUMBER_FROM_TEXT.format(column="new.charge_rate")})
+    WHERE id = new.id;
+END;
+""")
+
+cursor.execute(f"""
+CREATE TRIGGER add_profile_numbers_au AFTER UPDATE OF experience, charge_rate ON add_profile BEGIN
+    UPDATE add_profile
+    SET experience_years = {NUMBER_FROM_TEXT.format(column="new.experience")},
+        charge_rate_dollar = CASE
+            WHEN new.charge_rate IS NOT old.charge_rate AND new.charge_rate_dollar IS old.charge_rate_dollar
+            THEN {NUMBER_FROM_TEXT.format(column="new.charge_rate")}
+            ELSE new.charge_rate_dollar
+        END
+    WHERE id = new.id;
+END;
+""")
+
+# SQLite has no ON UPDATE CURRENT_TIMESTAMP: bump updated_at on every update that does not set it itself,
+# so the candidate index sync (which loads rows by updated_at) sees the change. users.department is part
+# of the indexed profile text, so changing it touches the user's profiles too.
+cursor.execute("""
+CREATE TRIGGER add_profile_touch AFTER UPDATE ON add_profile WHEN new.updated_at IS old.updated_at BEGIN
+    UPDATE add_profile SET updated_at = CURRENT_TIMESTAMP WHERE id = new.id;
+END;
+""")
+
+cursor.execute("""
+CREATE TRIGGER users_touch AFTER UPDATE ON users WHEN new.updated_at IS old.updated_at BEGIN
+    UPDATE users SET updated_at = CURRENT_TIMESTAMP WHERE id = new.id;
+    UPDATE add_profile SET updated_at = CURRENT_TIMESTAMP WHERE user_id = new.id AND new.department IS NOT old.department;
+END;
+""")
+
 companies = [
     (1, "Tech Solutions", "IT Services", "$5M", "contact@tech.com", "200", "1112223333", "123 Tech Street", "MSME001", "GST001", "linkedin.com/tech", "techsolutions.com", "IT consulting firm", 1, 1, "2026-01-01"),
     (2, "Finance Corp", "Finance", "$10M", "hr@financecorp.com", "500", "2223334444", "456 Finance Road", "MSME002", "GST002", "linkedin.com/fin", "financecorp.com", "Financial services", 1, 2, "2026-02-01"),
@@ -96,9 +222,10 @@ companies = [
     (10, "Travel Now", "Travel & Tourism", "$9M", "support@travelnow.com", "350", "1112223333", "876 Travel Blvd", "MSME010", "GST010", "linkedin.com/travelnow", "travelnow.com", "Travel and tourism services", 1, 1, "2026-09-01")
 ]
 
-# Insert companies
+# Seed rows have fixed ids; they are skipped when already there, so the script can be re-run on an existing
+# database to apply the migrations and backfills below
 cursor.executemany("""
-INSERT INTO company (id, company_name, company_category, company_turnover, email, number_of_employee, phone, company_address,
+INSERT OR IGNORE INTO company (id, company_name, company_category, company_turnover, email, number_of_employee, phone, company_address,
                      msme_registration_no, gst_registration_no, linkedin_url, company_website, about_company, is_active, plan_id, expire_date)
 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
 """, companies)
@@ -117,7 +244,7 @@ users = [
 ]
 
 cursor.executemany("""
-INSERT INTO users (id, company_id, full_name, email, password, phone, user_type, is_active, department, permission)
+INSERT OR IGNORE INTO users (id, company_id, full_name, email, password, phone, user_type, is_active, department, permission)
 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
 """, users)
 
@@ -135,14 +262,26 @@ profiles = [
 ]
 
 
-# Insert profiles
+# Insert profiles; the triggers above derive experience_years from the experience text
 cursor.executemany("""
-INSERT INTO add_profile (id, user_id, company_id, profile_name, job_title, professional_summary, key_skill, experience, certificate, charge_rate, 
+INSERT OR IGNORE INTO add_profile (id, user_id, company_id, profile_name, job_title, professional_summary, key_skill, experience, certificate, charge_rate, 
                          charge_rate_dollar, charge_rate_inr, education, projects, employee_type, availability, linkedin_account_id, profile_image, 
                          profile_resume, mobile, email, location, gender, country, state, city, view_count)
 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
 """, profiles)
 
+# Backfill the numeric columns for rows written before the triggers
+cursor.execute(f"""
+UPDATE add_profile
+SET experience_years = {NUMBER_FROM_TEXT.format(column="experience")},
+    charge_rate_dollar = coalesce(charge_rate_dollar, {NUMBER_FROM_TEXT.format(column="charge_rate")})
+WHERE experience_years IS NULL OR charge_rate_dollar IS NULL;
+""")
+
+# Backfill the full-text index and skill table for rows that existed before the triggers
+cursor.execute("INSERT INTO add_profile_fts(add_profile_fts) VALUES ('rebuild');")
+cursor.execute(f"INSERT OR IGNORE INTO profile_skill (profile_id, skill) {SPLIT_SKILLS.format(row='add_profile', source='add_profile, ')};")
+
 # Commit and close
 conn.commit()
 conn.close()
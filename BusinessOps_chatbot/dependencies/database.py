@@ -1,7 +1,11 @@
+import sqlite3
+import threading
+from pathlib import Path
 import mysql.connector
 import sqlalchemy
 from sqlalchemy.pool import QueuePool
 from config.config import USER, HOST, DATABASE, PASSWORD
+from config.config import SQLITE_MMAP_SIZE, SQLITE_CACHE_SIZE_KB, SQLITE_POOL_SIZE, SQLITE_POOL_TIMEOUT
 
 # Function to create a MySQL connection
 def getconn():
@@ -29,4 +33,65 @@ pool = sqlalchemy.create_engine(
 # Function to get a connection from the pool
 def get_mysql_connection():
     conn = pool.connect()
-    return conn
\ No newline at end of file
+    return conn
+
+
+# ------------------ SQLite ------------------ #
+
+_sqlite_engines = {}
+_sqlite_engines_lock = threading.Lock()
+
+
+def _enable_wal(path):
+    # journal_mode is stored in the file, so one read-write connection sets it for every later reader
+    try:
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.close()
+    except sqlite3.Error as e:
+        print(f"Could not enable WAL on {path}: {e}")
+
+
+def _connect_sqlite_read_only(path):
+    # as_uri() percent-encodes the path, so "?", "#" or "%" in a directory name cannot break the URI
+    conn = sqlite3.connect(Path(path).resolve().as_uri() + "?mode=ro", uri=True, check_same_thread=False)
+    conn.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size = -{SQLITE_CACHE_SIZE_KB}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA query_only = ON")
+    return conn
+
+
+def sqlite_data_version(path):
+    """Callable returning SQLite's data_version for `path` as seen by one dedicated connection; the value
+    changes whenever any other connection or process commits a write to the file"""
+    conn = _connect_sqlite_read_only(path)
+    lock = threading.Lock()
+
+    def data_version():
+        with lock:
+            return conn.execute("PRAGMA data_version").fetchone()[0]
+
+    return data_version
+
+
+def create_sqlite_engine(path, pool_size=SQLITE_POOL_SIZE, pool_timeout=SQLITE_POOL_TIMEOUT):
+    """Engine over read-only (mode=ro) connections to the SQLite file at `path`, tuned for concurrent reads"""
+    _enable_wal(path)
+    return sqlalchemy.create_engine(
+        "sqlite://",
+        creator=lambda: _connect_sqlite_read_only(path),
+        poolclass=QueuePool,
+        pool_size=pool_size,
+        max_overflow=0,
+        pool_timeout=pool_timeout,
+    )
+
+
+def get_sqlite_engine(path):
+    """Shared read-only engine for `path`; every chain and request reading that file uses the same pool"""
+    with _sqlite_engines_lock:
+        engine = _sqlite_engines.get(path)
+        if engine is None:
+            engine = _sqlite_engines[path] = create_sqlite_engine(path)
+        return engine
@@ -1,61 +1,223 @@
 import os
 import sys
+import time
 import asyncio
+import hashlib
+import threading
 from pathlib import Path
+from collections import deque
 import json
+from uuid import uuid1
+
+import numpy as np
 
 # Ensure paths are correctly set up
 PROJECT_ROOT = Path(__file__).parent.absolute()
 sys.path.append(str(PROJECT_ROOT))
 
+from config.config import ROUTING_MODE, LATENCY_WINDOW
+from config.llm_gateway import llm_gateway
+
 # Import the router
 from routers.query_router import QueryRouter
     
 # Import the structured RAG chain
-from utils.structured_qa_chain import test_rag_chain
+from utils.structured_qa_chain import test_rag_chain, get_structured_chain, stream_structured_qa_chain, STRUCTURED_TABLES
 
 # Import the unstructured RAG chain
 from utils.unstructured_qa_chain import create_candidate_matcher
 
+from utils.single_flight import SingleFlight
+from utils.tracing import stage, annotate
+
+
+def _file_hash(path):
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        # Let the matcher report the missing file as before
+        return path
+
 class RAGSystem:
-    def __init__(self):
+    def __init__(self, routing_mode=ROUTING_MODE):
         """Initialize the RAG system with both chains and the router"""
         self.router = QueryRouter()
+        self.routing_mode = routing_mode
+
+        # End-to-end latency per routing mode, and what speculation threw away
+        self._latencies = {"sequential": deque(maxlen=LATENCY_WINDOW), "speculative": deque(maxlen=LATENCY_WINDOW)}
+        self._stats_lock = threading.Lock()
+        self.speculation = {"runs": 0, "sql_used": 0, "sql_discarded": 0, "wasted_tokens": 0}
+
+        # Identical questions arriving together (dashboard refreshes, shared links) run once
+        self.single_flight = SingleFlight()
+        
+        # Build the structured chain now so queries only pay for the LLM calls and the SQL. It is looked up
+        # again per request: refresh_structured_schema() swaps in a new chain after DDL changes
+        get_structured_chain()
         
         # Initialize the unstructured RAG chain (candidate matcher)
         self.candidate_matcher = create_candidate_matcher()
         
         print("RAG System initialized successfully!")
     
-    async def process_query(self, query, job_description_path=None):
-        """Process a user query and route it to the appropriate chain"""
-        # Determine which chain to use
-        chain_type = await self.router.route_query(query)
-        print(f"Router decision: {chain_type}")
-        
+    async def _coalesce_key(self, kind, query, job_description_path=None, tenant_id=None):
+        jd_hash = await asyncio.to_thread(_file_hash, job_description_path) if job_description_path else None
+        # Only case and spacing are ignored: "> 5" and "< 5", or "C#" and "C++", must never share a run
+        return (kind, " ".join(query.lower().split()), jd_hash, tenant_id)
+
+    async def process_query(self, query, job_description_path=None, tenant_id=None):
+        """Process a user query and route it to the appropriate chain; concurrent identical queries share one run"""
+        with stage("process_query", routing_mode=self.routing_mode, has_document=bool(job_description_path)):
+            key = await self._coalesce_key("query", query, job_description_path, tenant_id)
+            return await self.single_flight.do(key, lambda: self._process_query(query, job_description_path, tenant_id))
+
+    async def _process_query(self, query, job_description_path=None, tenant_id=None):
+        started = time.perf_counter()
+        if self.routing_mode == "speculative":
+            result = await self._process_speculative(query, job_description_path, tenant_id)
+        else:
+            # Determine which chain to use
+            chain_type = await self.router.route_query(query)
+            print(f"Router decision: {chain_type}")
+            result = await self._run_chain(chain_type, query, job_description_path, tenant_id=tenant_id)
+        with self._stats_lock:
+            self._latencies[self.routing_mode].append(time.perf_counter() - started)
+        return result
+
+    async def _process_speculative(self, query, job_description_path=None, tenant_id=None):
+        """Write the SQL while the router decides. Structured (the common case) then skips one LLM
+        round trip; otherwise the SQL task is cancelled and its tokens are counted as wasted"""
+        usage = {}
+        sql_task = asyncio.create_task(get_structured_chain().awrite_query({
+            "question": query, "language": "ENGLISH",
+            "chat_history": "No previous conversation chat history", "usage": usage,
+        }))
+        try:
+            chain_type = await self.router.route_query(query)
+        except BaseException:
+            sql_task.cancel()
+            raise
+        print(f"Router decision: {chain_type} (speculative)")
+
+        sql_query = None
+        if chain_type == "structured":
+            try:
+                sql_query = await sql_task
+            except Exception as e:
+                # Let the chain write the SQL again on the normal path
+                print(f"Speculative SQL generation failed: {e}")
+        else:
+            sql_task.cancel()
+            try:
+                await sql_task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+        with self._stats_lock:
+            self.speculation["runs"] += 1
+            if sql_query:
+                self.speculation["sql_used"] += 1
+            elif chain_type != "structured":
+                self.speculation["sql_discarded"] += 1
+                self.speculation["wasted_tokens"] += usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0)
+        return await self._run_chain(chain_type, query, job_description_path, sql_query, tenant_id)
+
+    async def _run_chain(self, chain_type, query, job_description_path=None, sql_query=None, tenant_id=None):
+        annotate(chain_type=chain_type, speculative_sql=bool(sql_query))
         if chain_type == "structured":
             # Use the structured RAG chain
             print("Using structured RAG chain...")
-            response = await test_rag_chain(query)
+            response = await test_rag_chain(query, sql_query)
             return {
                 "chain_type": "structured",
                 "query": query,
                 "sql_query": response.get("query", "No SQL query generated"),
+                "sql_result": response.get("sql_result"),
                 "answer": response.get("output", "No answer generated")
             }
         else:
             # Use the unstructured RAG chain (candidate matcher)
             print("Using unstructured RAG chain...")
-            if job_description_path:
-                result = self.candidate_matcher(document_path=job_description_path)
-            else:
-                result = self.candidate_matcher(input_data=query)
+            result = await self._match_candidate(query, job_description_path, tenant_id)
             return {
                 "chain_type": "unstructured",
                 "query": query,
                 "answer": result
             }
 
+    def stats(self):
+        """Latency percentiles per routing mode plus router, structured chain, speculation, coalescing and
+        LLM gateway counters"""
+        with self._stats_lock:
+            latencies = {
+                mode: {
+                    "count": len(samples),
+                    "p50_ms": float(np.percentile(samples, 50) * 1000) if samples else None,
+                    "p95_ms": float(np.percentile(samples, 95) * 1000) if samples else None,
+                }
+                for mode, samples in self._latencies.items()
+            }
+            return {
+                "routing_mode": self.routing_mode,
+                "latency": latencies,
+                "speculation": dict(self.speculation),
+                "single_flight": self.single_flight.stats(),
+                "router": self.router.stats(),
+                "structured": get_structured_chain().stats(),
+                "llm": llm_gateway.stats(),
+            }
+
+    async def _match_candidate(self, query, job_description_path=None, tenant_id=None):
+        key = await self._coalesce_key("match", query, job_description_path, tenant_id)
+        return await self.single_flight.do(key, lambda: self._run_candidate_matcher(query, job_description_path))
+
+    async def _run_candidate_matcher(self, query, job_description_path=None):
+        # The matcher is synchronous (PDF parsing, retrieval, Groq call); keep it off the event loop
+        if job_description_path:
+            return await asyncio.to_thread(self.candidate_matcher, document_path=job_description_path)
+        return await asyncio.to_thread(self.candidate_matcher, input_data=query)
+
+    async def stream_query(self, query, job_description_path=None, chat_id=None, tenant_id=None):
+        """Streaming variant of process_query. Yields the same JSON events as the structured chain;
+        concurrent identical queries subscribe to one shared stream"""
+        chat_id = chat_id or str(uuid1())
+        key = await self._coalesce_key("stream", query, job_description_path, tenant_id)
+        async for event in self.single_flight.stream(key, lambda: self._stream_query(query, job_description_path, tenant_id=tenant_id)):
+            # The shared events were produced for whichever request came first; ids belong to this one
+            kind = json.loads(event).get("type")
+            if kind == "chatId":
+                event = json.dumps({"type": "chatId", "content": chat_id})
+            elif kind == "messageId":
+                event = json.dumps({"type": "messageId", "content": str(uuid1())})
+            yield event
+
+    async def _stream_query(self, query, job_description_path=None, chat_id=None, tenant_id=None):
+        # Runs inside the single-flight producer task, so the stage spans every yield in one context
+        with stage("stream_query", has_document=bool(job_description_path)) as span:
+            chain_type = await self.router.route_query(query)
+            span.set("chain_type", chain_type)
+            
+            if chain_type == "structured":
+                async for event in stream_structured_qa_chain(
+                    token="test_user",
+                    connection="",
+                    table_names=STRUCTURED_TABLES,
+                    query=query,
+                    real_user_question=query,
+                    chat_history=[],
+                    llm=get_structured_chain().llm,
+                    chat_id=chat_id
+                ):
+                    yield event
+            else:
+                # The Groq matcher is not streamed; send its answer as a single text event
+                yield json.dumps({"type": "chatId", "content": chat_id})
+                result = await self._match_candidate(query, job_description_path, tenant_id)
+                yield json.dumps({"type": "text", "content": result})
+                yield json.dumps({"type": "messageId", "content": str(uuid1())})
+
 async def main():
     """Main entry point for the application"""
     # Initialize the RAG system
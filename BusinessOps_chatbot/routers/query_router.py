@@ -1,17 +1,23 @@
 import os
+import re
 import sys
 import asyncio
+import threading
+from collections import OrderedDict
 from pathlib import Path
 from operator import itemgetter
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
+import numpy as np
 
 # Ensure paths are correctly set up
 PROJECT_ROOT = Path(__file__).parent.parent.absolute()
 sys.path.append(str(PROJECT_ROOT))
 
 # Import the LLM models
-from config.gemini_llm import gemini_pro_llm
+from config.gemini_llm import gemini_pro_llm, local_embeddings
+from config.config import ROUTER_CENTROID_MARGIN, ROUTER_CACHE_SIZE
+from utils.tracing import stage
 
 # The router prompt template to classify queries
 ROUTER_PROMPT = """
@@ -47,23 +53,145 @@ ROUTER_PROMPT = """
         Classification:
     """
 
+# Labelled examples for the nearest-centroid tier. The first five are the ones shown in ROUTER_PROMPT.
+ROUTER_EXAMPLES = [
+    ("How many developers have Python skills?", "structured"),
+    ("Find the best candidate for this senior developer role", "unstructured"),
+    ("What is the average charge rate for data scientists?", "structured"),
+    ("Match this job description to available candidates", "unstructured"),
+    ("List all profiles with Java skills", "structured"),
+    ("How many active users are in company with ID 123?", "structured"),
+    ("Show companies expiring their subscription in next 30 days", "structured"),
+    ("What is the job title of Charlie Davis?", "structured"),
+    ("Which skills are most common among profiles with high view counts?", "structured"),
+    ("Find all employees with more than 10 years of experience", "structured"),
+    ("What is the phone number and email of Bob Williams?", "structured"),
+    ("Who would be the ideal fit for a cloud architect position?", "unstructured"),
+    ("Recommend candidates for a data engineer role with AWS experience", "unstructured"),
+    ("Analyze this resume and suggest matching profiles", "unstructured"),
+    ("We need someone strong in stakeholder management to lead our finance team", "unstructured"),
+    ("Which candidate is most suitable for this job description?", "unstructured"),
+]
+
+# Deterministic first tier: phrases that only ever show up in one kind of query. Words that are common
+# in both ("company", "list", "show", "total", "highest") are left to the centroid and LLM tiers.
+STRUCTURED_PATTERNS = [
+    r"\bhow many\b", r"\bcount of\b", r"\bnumber of\b", r"\baverage\b", r"\bavg\b", r"\bsum of\b",
+    r"\bratio of\b", r"\bpercentage of\b", r"\b(phone number|email( address)?|linkedin( account)?( id)?) (of|for)\b",
+]
+UNSTRUCTURED_PATTERNS = [
+    r"\bbest (candidate|match|fit)\b", r"\bideal (candidate|fit)\b", r"\bjob description\b", r"\bjd\b",
+    r"\bresume\b", r"\bcv\b", r"\brecommend", r"\bsuitable\b", r"\bmatch(ing)? (this|the|my)\b",
+    r"\bgood fit\b", r"\bwho should (we|i) hire\b",
+]
+_STRUCTURED_RE = re.compile("|".join(STRUCTURED_PATTERNS))
+_UNSTRUCTURED_RE = re.compile("|".join(UNSTRUCTURED_PATTERNS))
+
+# Anything this long is a pasted job description or resume, not a database question
+LONG_QUERY_WORDS = 80
+
+
+def _normalize_query(query):
+    return re.sub(r"\s+", " ", query.lower()).strip()
+
+
 class QueryRouter:
-    def __init__(self, llm=None):
+    """Tiered router: memoized decisions, keyword rules, embedding nearest-centroid, then the LLM
+    only when the cheaper tiers are not confident"""
+
+    def __init__(self, llm=None, embeddings=None, margin=ROUTER_CENTROID_MARGIN, cache_size=ROUTER_CACHE_SIZE):
         self.llm = llm or gemini_pro_llm
+        self.embeddings = embeddings or local_embeddings
+        self.margin = margin
+        self.cache_size = cache_size
         
         # Create the router chain
         router_prompt = ChatPromptTemplate.from_template(ROUTER_PROMPT)
         self.router_chain = router_prompt | self.llm | StrOutputParser()
-    
-    async def route_query(self, query):
-        """Determine which RAG pipeline to use for a given query"""
+
+        # One unit-length centroid per label, built once from the labelled examples
+        self.labels = sorted({label for _, label in ROUTER_EXAMPLES})
+        vectors = np.asarray(self.embeddings.embed_documents([text for text, _ in ROUTER_EXAMPLES]), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        centroids = np.stack([
+            vectors[[i for i, (_, label) in enumerate(ROUTER_EXAMPLES) if label == wanted]].mean(axis=0)
+            for wanted in self.labels
+        ])
+        self.centroids = centroids / np.linalg.norm(centroids, axis=1, keepdims=True)
+
+        self._decisions = OrderedDict()
+        self._lock = threading.Lock()
+        self.tier_hits = {"cache": 0, "rules": 0, "centroid": 0, "llm": 0}
+
+    def _classify_rules(self, normalized):
+        if len(normalized.split()) >= LONG_QUERY_WORDS:
+            return "unstructured"
+        structured = bool(_STRUCTURED_RE.search(normalized))
+        unstructured = bool(_UNSTRUCTURED_RE.search(normalized))
+        if structured != unstructured:
+            return "structured" if structured else "unstructured"
+        return None
+
+    async def _classify_centroid(self, query):
+        vector = np.asarray(await self.embeddings.aembed_query(query), dtype=np.float32)
+        vector /= np.linalg.norm(vector) or 1.0
+        scores = self.centroids @ vector
+        best, runner_up = np.argsort(-scores)[:2]
+        if scores[best] - scores[runner_up] >= self.margin:
+            return self.labels[best]
+        return None
+
+    async def _classify_llm(self, query):
         result = await self.router_chain.ainvoke({"query": query})
         result = result.strip().upper()
         
-        if "STRUCTURED_QUERY" in result:
-            return "structured"
-        elif "UNSTRUCTURED_QUERY" in result:
+        # "UNSTRUCTURED" contains "STRUCTURED", so it has to be checked first
+        if "UNSTRUCTURED" in result:
             return "unstructured"
+        elif "STRUCTURED" in result:
+            return "structured"
         else:
             # Default fallback if classification is unclear
-            return "structured"
\ No newline at end of file
+            return "structured"
+
+    def _remember(self, key, label):
+        with self._lock:
+            self._decisions[key] = label
+            self._decisions.move_to_end(key)
+            while len(self._decisions) > self.cache_size:
+                self._decisions.popitem(last=False)
+
+    async def route(self, query):
+        """Return (chain type, tier that decided it)"""
+        with stage("route") as span:
+            key = _normalize_query(query)
+            with self._lock:
+                label = self._decisions.get(key)
+                if label is not None:
+                    self._decisions.move_to_end(key)
+                    self.tier_hits["cache"] += 1
+            if label is not None:
+                span.set("cache_hit", True)
+                span.set("route", label)
+                span.set("tier", "cache")
+                return label, "cache"
+
+            span.set("cache_hit", False)
+            for tier, classify in (("rules", self._classify_rules), ("centroid", self._classify_centroid), ("llm", self._classify_llm)):
+                label = classify(key) if tier == "rules" else await classify(query)
+                if label is not None:
+                    with self._lock:
+                        self.tier_hits[tier] += 1
+                    self._remember(key, label)
+                    span.set("route", label)
+                    span.set("tier", tier)
+                    return label, tier
+
+    async def route_query(self, query):
+        """Determine which RAG pipeline to use for a given query"""
+        label, _ = await self.route(query)
+        return label
+
+    def stats(self):
+        with self._lock:
+            return dict(self.tier_hits, cached_decisions=len(self._decisions))
\ No newline at end of file
@@ -0,0 +1,201 @@
+import sys
+import hmac
+import json
+import asyncio
+from pathlib import Path
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import uvicorn
+from fastapi import Depends, FastAPI, Header, HTTPException, Request, status
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from pydantic import BaseModel
+
+# Ensure paths are correctly set up
+PROJECT_ROOT = Path(__file__).parent.absolute()
+sys.path.append(str(PROJECT_ROOT))
+
+from config.config import SERVER_HOST, SERVER_PORT, SERVER_WORKERS, MAX_IN_FLIGHT_REQUESTS, REQUEST_DEADLINE_SECONDS, JOB_DESCRIPTION_DIR, ADMIN_API_TOKEN
+from config.llm_gateway import request_deadline
+from main import RAGSystem
+from utils.chat_history import router as chat_history_router
+from utils.structured_qa_chain import record_verified_example
+from utils.tracing import configure_tracing, shutdown_tracing, metrics, render_stats
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Build the router, structured chain and candidate matcher once per worker process"""
+    configure_tracing()
+    app.state.rag_system = await asyncio.to_thread(RAGSystem)
+    app.state.in_flight = asyncio.Semaphore(MAX_IN_FLIGHT_REQUESTS)
+    yield
+    shutdown_tracing()
+
+
+app = FastAPI(title="BusinessOps Chatbot", lifespan=lifespan)
+app.include_router(chat_history_router)
+
+
+# ------------------ Pydantic Models ------------------ #
+
+class QueryRequest(BaseModel):
+    query: str
+    job_description_path: Optional[str] = None  # relative to JOB_DESCRIPTION_DIR
+    chat_id: Optional[str] = None
+    tenant_id: Optional[str] = None
+
+
+class SQLExampleRequest(BaseModel):
+    question: str
+    sql: str
+
+
+# ------------------ Concurrency Limit ------------------ #
+
+def _reject_if_full(request: Request):
+    """Reject right away when every in-flight slot is taken; queueing would only stretch everyone's latency"""
+    in_flight = request.app.state.in_flight
+    if in_flight.locked():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many requests in flight, please retry shortly.",
+            headers={"Retry-After": "1"},
+        )
+    return in_flight
+
+
+async def _acquire_slot(request: Request):
+    """Take an in-flight slot or reject right away"""
+    in_flight = _reject_if_full(request)
+    await in_flight.acquire()
+    return in_flight
+
+
+def _require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    """Admin-only routes: the X-Admin-Token header must match ADMIN_API_TOKEN, and they are off when it is unset"""
+    if not ADMIN_API_TOKEN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin endpoints are disabled")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_API_TOKEN):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid admin token")
+
+
+def _job_description_file(path):
+    """Resolve a client-supplied job description path, refusing anything outside JOB_DESCRIPTION_DIR"""
+    if not path:
+        return None
+    base = Path(JOB_DESCRIPTION_DIR).resolve()
+    resolved = (base / path).resolve()
+    if not resolved.is_relative_to(base):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="job_description_path must name a file inside the job description directory",
+        )
+    return str(resolved)
+
+
+async def _cancel_on_disconnect(request: Request, coro):
+    """Run `coro`, cancelling it (and any SQL it is running) if the client goes away first"""
+    task = asyncio.ensure_future(coro)
+    while not task.done():
+        await asyncio.wait({task}, timeout=0.25)
+        if not task.done() and await request.is_disconnected():
+            task.cancel()
+            break
+    return await task
+
+
+def _error_event(message):
+    return f"data: {json.dumps({'type': 'error', 'content': message})}\n\n"
+
+
+# ------------------ Routes ------------------ #
+
+@app.post("/query")
+async def query(payload: QueryRequest, request: Request):
+    job_description_path = _job_description_file(payload.job_description_path)
+    in_flight = await _acquire_slot(request)
+    try:
+        with request_deadline(REQUEST_DEADLINE_SECONDS):
+            result = await _cancel_on_disconnect(
+                request, request.app.state.rag_system.process_query(payload.query, job_description_path, payload.tenant_id)
+            )
+        return {
+            "status": "success",
+            "data": result
+        }
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except TimeoutError as e:
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error processing query: {e}"
+        )
+    finally:
+        in_flight.release()
+
+
+@app.post("/query/stream")
+async def query_stream(payload: QueryRequest, request: Request):
+    job_description_path = _job_description_file(payload.job_description_path)
+    in_flight = _reject_if_full(request)
+
+    async def event_stream():
+        # The slot is taken and released here, so a stream that never starts never holds one. It is held
+        # until the last event is sent; if the client goes away the response task is cancelled, which
+        # cancels the generator and interrupts any SQL it is waiting on.
+        # The 200 is already sent by now, so failures are reported as a final error event
+        if in_flight.locked():
+            # Other streams took the last slot after the route checked; reject rather than queue
+            yield _error_event("Too many requests in flight, please retry shortly.")
+            return
+        async with in_flight:
+            try:
+                with request_deadline(REQUEST_DEADLINE_SECONDS):
+                    async for event in request.app.state.rag_system.stream_query(
+                        payload.query, job_description_path, payload.chat_id, payload.tenant_id
+                    ):
+                        yield f"data: {event}\n\n"
+            except FileNotFoundError as e:
+                yield _error_event(str(e))
+            except TimeoutError as e:
+                yield _error_event(str(e) or "Request deadline exceeded")
+            except Exception as e:
+                yield _error_event(f"Error processing query: {e}")
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+@app.post("/sql_examples", dependencies=[Depends(_require_admin)])
+async def add_sql_example(payload: SQLExampleRequest):
+    """Store a verified question/SQL pair as a few-shot example for similar questions. Examples end up in
+    every similar SQL prompt, so only admins may add them"""
+    added = await asyncio.to_thread(record_verified_example, payload.question, payload.sql)
+    return {"status": "success", "added": added}
+
+
+@app.get("/stats")
+async def stats(request: Request):
+    return {"status": "success", "data": request.app.state.rag_system.stats()}
+
+
+@app.get("/metrics")
+async def prometheus_metrics(request: Request):
+    """Stage latency histograms, outcomes, cache hits and token counts, plus the counters from /stats
+    (router tiers, cache hit rates, template answers, guard rejections), in the Prometheus text format"""
+    body = metrics.render()
+    rag_system = getattr(request.app.state, "rag_system", None)
+    if rag_system is not None:
+        body += render_stats(rag_system.stats())
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+
+@app.get("/health")
+async def health():
+    return {"status": "success"}
+
+
+if __name__ == "__main__":
+    uvicorn.run("server:app", host=SERVER_HOST, port=SERVER_PORT, workers=SERVER_WORKERS)
@@ -0,0 +1,17 @@
+import os
+import sys
+import shutil
+import tempfile
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent.absolute()
+sys.path.insert(0, str(PROJECT_ROOT))
+
+# Offline models, and a scratch working directory with its own copy of the database, so tests never
+# touch the checked-in talent_management.db or leave caches and indexes in the tree
+WORKDIR = Path(tempfile.mkdtemp(prefix="businessops-tests-"))
+shutil.copy(PROJECT_ROOT / "database" / "talent_management.db", WORKDIR / "talent_management.db")
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("PROFILE_SOURCE", "sqlite")
+os.environ.setdefault("SQLITE_DB_PATH", str(WORKDIR / "talent_management.db"))
+os.chdir(WORKDIR)
@@ -0,0 +1,74 @@
+import runpy
+import sqlite3
+from pathlib import Path
+
+from config.fake_llm import FakeEmbeddings
+from utils import unstructured_qa_chain
+from utils.unstructured_qa_chain import sync_vector_store
+
+SETUP_SCRIPT = Path(__file__).parent.parent / "database" / "database_setup.py"
+
+
+def test_sync_picks_up_updates_and_deletions(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    runpy.run_path(str(SETUP_SCRIPT))
+    db_path = str(tmp_path / "talent_management.db")
+    monkeypatch.setattr(unstructured_qa_chain, "SQLITE_DB_PATH", db_path)
+    monkeypatch.setattr(unstructured_qa_chain, "PROFILE_SOURCE", "sqlite")
+    # Small chunks, so hash lookups and deletions run over more than one chunk
+    monkeypatch.setattr(unstructured_qa_chain, "PROFILE_LOAD_CHUNK_SIZE", 3)
+    embeddings = FakeEmbeddings(latency_seconds=0)
+    index = str(tmp_path / "candidate_db")
+
+    store = sync_vector_store(index, embeddings)
+    assert len(store.get()["ids"]) == 10
+
+    conn = sqlite3.connect(db_path)
+    # Backdate every row, then change one through an ordinary UPDATE that does not touch updated_at
+    conn.execute("UPDATE add_profile SET updated_at = '2000-01-01 00:00:00'")
+    conn.commit()
+    store = sync_vector_store(index, embeddings)
+    conn.execute("UPDATE add_profile SET professional_summary = 'Now leads payroll automation' WHERE id = 1")
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("DELETE FROM add_profile WHERE id IN (4, 5, 6, 7)")
+    conn.commit()
+    conn.close()
+
+    store = sync_vector_store(index, embeddings)
+    stored = store.get(ids=["1"])
+    assert "payroll automation" in stored["documents"][0]
+    assert sorted(store.get()["ids"], key=int) == ["1", "2", "3", "8", "9", "10"]
+
+
+def test_rows_changed_during_a_sync_are_picked_up_by_the_next(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    runpy.run_path(str(SETUP_SCRIPT))
+    db_path = str(tmp_path / "talent_management.db")
+    monkeypatch.setattr(unstructured_qa_chain, "SQLITE_DB_PATH", db_path)
+    monkeypatch.setattr(unstructured_qa_chain, "PROFILE_SOURCE", "sqlite")
+    monkeypatch.setattr(unstructured_qa_chain, "PROFILE_LOAD_CHUNK_SIZE", 3)
+    embeddings = FakeEmbeddings(latency_seconds=0)
+    index = str(tmp_path / "candidate_db")
+
+    preprocess = unstructured_qa_chain.preprocess_profile
+    edited = False
+
+    def edit_behind_the_scan(row):
+        # Once the scan is past id 1, id 1 changes and then id 9 (still ahead of the scan) changes later
+        nonlocal edited
+        if row["id"] == 5 and not edited:
+            edited = True
+            conn = sqlite3.connect(db_path)
+            conn.execute("UPDATE add_profile SET professional_summary = 'Now leads payroll automation', updated_at = '2999-01-01 00:00:00' WHERE id = 1")
+            conn.execute("UPDATE add_profile SET updated_at = '2999-01-01 00:00:05' WHERE id = 9")
+            conn.commit()
+            conn.close()
+        return preprocess(row)
+
+    monkeypatch.setattr(unstructured_qa_chain, "preprocess_profile", edit_behind_the_scan)
+    store = sync_vector_store(index, embeddings)
+    assert "payroll automation" not in store.get(ids=["1"])["documents"][0]
+
+    monkeypatch.setattr(unstructured_qa_chain, "preprocess_profile", preprocess)
+    store = sync_vector_store(index, embeddings)
+    assert "payroll automation" in store.get(ids=["1"])["documents"][0]
@@ -0,0 +1,22 @@
+import sqlite3
+
+import pytest
+
+from dependencies.database import _connect_sqlite_read_only
+
+
+def test_read_only_connection_handles_uri_characters_in_the_path(tmp_path):
+    directory = tmp_path / "weird?dir#50%"
+    directory.mkdir()
+    path = directory / "data.db"
+    writer = sqlite3.connect(path)
+    writer.execute("CREATE TABLE t (n INTEGER)")
+    writer.execute("INSERT INTO t VALUES (1)")
+    writer.commit()
+    writer.close()
+
+    conn = _connect_sqlite_read_only(str(path))
+    assert conn.execute("SELECT n FROM t").fetchall() == [(1,)]
+    with pytest.raises(sqlite3.OperationalError):
+        conn.execute("INSERT INTO t VALUES (2)")
+    conn.close()
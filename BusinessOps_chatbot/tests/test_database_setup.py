@@ -0,0 +1,64 @@
+import runpy
+import sqlite3
+from pathlib import Path
+
+SETUP_SCRIPT = Path(__file__).parent.parent / "database" / "database_setup.py"
+
+
+def _setup_database(directory, monkeypatch):
+    monkeypatch.chdir(directory)
+    runpy.run_path(str(SETUP_SCRIPT))
+    return sqlite3.connect(directory / "talent_management.db")
+
+
+def _skills(conn, profile_id):
+    return sorted(row[0] for row in conn.execute("SELECT skill FROM profile_skill WHERE profile_id = ?", (profile_id,)))
+
+
+def test_multi_line_skills_are_split(tmp_path, monkeypatch):
+    conn = _setup_database(tmp_path, monkeypatch)
+    conn.execute(
+        "INSERT INTO add_profile (id, user_id, company_id, profile_name, key_skill) VALUES (?, ?, ?, ?, ?)",
+        (100, 1, 1, "Multi Line", 'Python\n\tSQL\r\nC:\\Tools, "Quoted"\x01, Spark,\n'),
+    )
+    assert _skills(conn, 100) == ['"quoted"\x01', "c:\\tools", "python", "spark", "sql"]
+
+    conn.execute("UPDATE add_profile SET key_skill = ? WHERE id = ?", ("Docker\nKubernetes", 100))
+    assert _skills(conn, 100) == ["docker", "kubernetes"]
+    conn.close()
+
+
+def test_setup_reruns_on_an_existing_database(tmp_path, monkeypatch):
+    _setup_database(tmp_path, monkeypatch).close()
+    conn = _setup_database(tmp_path, monkeypatch)
+    assert conn.execute("SELECT COUNT(*) FROM add_profile").fetchone()[0] == 10
+    assert _skills(conn, 1) == ["payroll", "recruitment"]
+    conn.close()
+
+
+def test_numeric_columns_follow_their_text(tmp_path, monkeypatch):
+    conn = _setup_database(tmp_path, monkeypatch)
+    assert conn.execute("SELECT experience_years, charge_rate_dollar FROM add_profile WHERE id = 1").fetchone() == (10.0, 50.0)
+
+    conn.execute(
+        "INSERT INTO add_profile (id, user_id, company_id, profile_name, experience, charge_rate) VALUES (?, ?, ?, ?, ?, ?)",
+        (100, 1, 1, "New Profile", "about 7.5 years", "$1,200/day"),
+    )
+    assert conn.execute("SELECT experience_years, charge_rate_dollar FROM add_profile WHERE id = 100").fetchone() == (7.5, 1200.0)
+
+    conn.execute("UPDATE add_profile SET experience = '11 years', charge_rate = '$52/hr' WHERE id = 1")
+    assert conn.execute("SELECT experience_years, charge_rate_dollar FROM add_profile WHERE id = 1").fetchone() == (11.0, 52.0)
+
+    conn.execute("UPDATE add_profile SET experience = 'not stated', charge_rate = 'EUR 40/hr', charge_rate_dollar = 44 WHERE id = 1")
+    assert conn.execute("SELECT experience_years, charge_rate_dollar FROM add_profile WHERE id = 1").fetchone() == (None, 44.0)
+    conn.close()
+
+
+def test_updates_bump_updated_at(tmp_path, monkeypatch):
+    conn = _setup_database(tmp_path, monkeypatch)
+    conn.execute("UPDATE add_profile SET updated_at = '2000-01-01 00:00:00'")
+    conn.execute("UPDATE add_profile SET availability = 'Unavailable' WHERE id = 1")
+    conn.execute("UPDATE users SET department = 'People' WHERE id = 2")
+    stale = [row[0] for row in conn.execute("SELECT id FROM add_profile WHERE updated_at = '2000-01-01 00:00:00' ORDER BY id")]
+    assert stale == list(range(3, 11))
+    conn.close()
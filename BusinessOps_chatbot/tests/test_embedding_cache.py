@@ -0,0 +1,105 @@
+import asyncio
+import hashlib
+import threading
+
+from langchain_core.embeddings import Embeddings
+
+from utils.embedding_cache import CachedEmbeddings
+
+
+class CountingEmbeddings(Embeddings):
+    """Deterministic 4-d vectors; remembers every text it was asked to embed"""
+
+    def __init__(self):
+        self.calls = []
+
+    @staticmethod
+    def vector(text):
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        return [b / 255 for b in digest[:4]]
+
+    def embed_documents(self, texts):
+        self.calls.extend(texts)
+        return [self.vector(text) for text in texts]
+
+    def embed_query(self, text):
+        self.calls.append(text)
+        return self.vector(text)
+
+
+def _close(vectors, texts):
+    return all(
+        all(abs(a - b) < 1e-6 for a, b in zip(vector, CountingEmbeddings.vector(text)))
+        for vector, text in zip(vectors, texts)
+    )
+
+
+def test_repeated_texts_are_embedded_once_and_shared_across_instances(tmp_path):
+    model = CountingEmbeddings()
+    cache = CachedEmbeddings(model, model_name="test", cache_dir=str(tmp_path))
+
+    assert _close(cache.embed_documents(["a", "b", "a"]), ["a", "b", "a"])
+    assert model.calls == ["a", "b"]
+    assert _close(cache.embed_documents(["b", "a"]), ["b", "a"])
+    assert model.calls == ["a", "b"]
+    # Queries and documents are cached separately
+    assert _close([cache.embed_query("a")], ["a"])
+    assert model.calls == ["a", "b", "a"]
+
+    # Another process sharing the directory reads what this one wrote
+    other_model = CountingEmbeddings()
+    other = CachedEmbeddings(other_model, model_name="test", cache_dir=str(tmp_path))
+    assert _close(other.embed_documents(["a", "b"]), ["a", "b"])
+    assert other_model.calls == []
+
+
+def test_async_variants_do_the_cache_io_off_the_event_loop(tmp_path, monkeypatch):
+    model = CountingEmbeddings()
+    cache = CachedEmbeddings(model, model_name="test", cache_dir=str(tmp_path))
+    threads = []
+    for name in ("_lookup", "_store"):
+        original = getattr(cache, name)
+
+        def traced(*args, _original=original, **kwargs):
+            threads.append(threading.get_ident())
+            return _original(*args, **kwargs)
+
+        monkeypatch.setattr(cache, name, traced)
+
+    async def scenario():
+        documents = await cache.aembed_documents(["x", "y"])
+        query = await cache.aembed_query("x")
+        again = await cache.aembed_documents(["x"])
+        return threading.get_ident(), documents, query, again
+
+    loop_thread, documents, query, again = asyncio.run(scenario())
+    assert _close(documents, ["x", "y"]) and _close([query], ["x"]) and _close(again, ["x"])
+    assert model.calls == ["x", "y", "x"]
+    assert threads and loop_thread not in threads
+
+
+def test_cap_keeps_the_most_recently_used_vectors(tmp_path):
+    model = CountingEmbeddings()
+    cache = CachedEmbeddings(model, model_name="test", cache_dir=str(tmp_path), max_entries=4)
+    reader = CachedEmbeddings(CountingEmbeddings(), model_name="test", cache_dir=str(tmp_path), max_entries=4)
+
+    cache.embed_documents(["a", "b", "c", "d"])
+    assert _close(reader.embed_documents(["b"]), ["b"])
+    cache.embed_documents(["a"])
+    # Past the cap: the 3 most recently used (e, then a, then the newest of the rest) survive
+    cache.embed_documents(["e"])
+
+    stats = cache.stats()
+    assert stats["entries"] == 3
+    assert stats["evictions"] == 2
+    model.calls.clear()
+    assert _close(cache.embed_documents(["e", "a", "d"]), ["e", "a", "d"])
+    assert model.calls == []
+    assert _close(cache.embed_documents(["b"]), ["b"])
+    assert model.calls == ["b"]
+
+    # A reader that still has the old generation mapped follows the compaction
+    reader_model = reader.embeddings
+    assert _close(reader.embed_documents(["a", "d", "e"]), ["a", "d", "e"])
+    assert reader_model.calls == []
+    assert len(list(tmp_path.joinpath("test").glob("vectors*.f32"))) == 1
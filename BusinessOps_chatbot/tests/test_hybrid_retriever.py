@@ -0,0 +1,32 @@
+import pytest
+
+from utils.hybrid_retriever import extract_candidate_filters
+
+
+@pytest.mark.parametrize("text", [
+    "Looking for a Java developer available immediately in Pune",
+    "Immediate joiners only.",
+    "The candidate must be available to start next week",
+    "Need someone who can join immediately",
+    "PHP developer available for immediate hiring",
+])
+def test_explicit_availability_requests_turn_on_the_filter(text):
+    assert extract_candidate_filters(text)["available"] is True
+
+
+@pytest.mark.parametrize("text", [
+    "Senior Python developer. Availability doesn't matter.",
+    "Candidates who are not available are fine too",
+    "Does not need to be available immediately",
+    "We are unavailable on weekends; availability will be discussed",
+    "Immediate manager: Priya",
+])
+def test_mentions_of_availability_alone_do_not(text):
+    assert "available" not in extract_candidate_filters(text)
+
+
+def test_rate_ceiling_and_single_known_location():
+    filters = extract_candidate_filters("React developer in Mumbai, budget of $45 per hour", known_locations=("mumbai", "pune"))
+    assert filters == {"max_charge_rate": 45.0, "location": "mumbai"}
+    # Two known locations are ambiguous, so neither is used
+    assert "location" not in extract_candidate_filters("Mumbai or Pune", known_locations=("mumbai", "pune"))
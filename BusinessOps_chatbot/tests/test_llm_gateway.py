@@ -0,0 +1,71 @@
+import time
+
+import pytest
+
+from config import llm_gateway
+from config.llm_gateway import GatedLLM, ModelLimiter, _remaining, request_deadline
+
+
+def test_remaining_is_bounded_by_the_request_deadline():
+    assert _remaining(60) == 60
+    with request_deadline(1):
+        assert 0 < _remaining(60) <= 1
+        assert 0 < _remaining(None) <= 1
+        assert _remaining(0.5) == 0.5
+    with request_deadline(0):
+        with pytest.raises(TimeoutError):
+            _remaining(60)
+
+
+def test_concurrency_limit_rejects_until_a_slot_is_released():
+    limiter = ModelLimiter("test", concurrency=1, rpm=100, tpm=100000)
+    limiter.acquire(10, timeout=0.1)
+    with pytest.raises(TimeoutError):
+        limiter.acquire(10, timeout=0.1)
+    limiter.release(latency=0.1, output_tokens=10)
+    limiter.acquire(10, timeout=0.1)
+
+
+def test_rate_limited_call_halves_the_limits_and_starts_a_cooldown():
+    limiter = ModelLimiter("test", concurrency=8, rpm=100, tpm=100000)
+    limiter.acquire(10, timeout=0.1)
+    limiter.release(rate_limited=True)
+
+    assert limiter.scale == 0.5
+    assert limiter.rate_limited == 1
+    assert limiter._cooldown_until > time.monotonic()
+    assert not limiter._try_acquire(10)
+
+    limiter._cooldown_until = 0
+    assert limiter._try_acquire(10)
+    # A healthy call grows the limits back additively
+    limiter.release(latency=0.1, output_tokens=10)
+    assert limiter.scale == pytest.approx(0.55)
+
+
+def test_output_tokens_are_settled_against_the_estimate_on_release():
+    limiter = ModelLimiter("test", concurrency=4, rpm=100, tpm=1000, output_estimate=100)
+    assert limiter._try_acquire(50)
+    assert limiter._tokens == pytest.approx(850, abs=1)
+    limiter.release(latency=0.1, output_tokens=300)
+    assert limiter._tokens == pytest.approx(650, abs=1)
+
+
+def test_gated_llm_retries_rate_limited_calls(monkeypatch):
+    monkeypatch.setattr(llm_gateway.random, "uniform", lambda low, high: 0.01)
+
+    class FlakyLLM:
+        calls = 0
+
+        def invoke(self, input, config=None, **kwargs):
+            self.calls += 1
+            if self.calls == 1:
+                raise RuntimeError("429 Too Many Requests")
+            return "answer"
+
+    limiter = ModelLimiter("test", concurrency=4, rpm=100, tpm=100000)
+    llm = GatedLLM(FlakyLLM(), limiter, timeout=5, max_retries=1)
+    assert llm.invoke("question") == "answer"
+    assert limiter.stats()["rate_limited"] == 1
+    assert limiter.stats()["calls"] == 2
+    assert limiter.stats()["active"] == 0
@@ -0,0 +1,34 @@
+import pytest
+
+from routers.query_router import QueryRouter, _normalize_query
+
+router = QueryRouter()
+
+
+@pytest.mark.parametrize("query", [
+    "Show me someone who could lead our company's cloud migration",
+    "List the strengths a person needs to run the companies we acquired",
+    "Who has the highest potential to grow into a team lead?",
+    "We need a total rethink of our hiring for the data platform team",
+    "Give me the people most likely to thrive at a fast-growing company",
+])
+def test_broad_words_do_not_force_structured(query):
+    assert router._classify_rules(_normalize_query(query)) != "structured"
+
+
+@pytest.mark.parametrize("query", [
+    "How many profiles have Java skills?",
+    "What is the average charge rate of Data Scientists?",
+    "What is the phone number of Bob Williams?",
+    "Number of companies expiring this month",
+])
+def test_high_precision_rules_still_route_structured(query):
+    assert router._classify_rules(_normalize_query(query)) == "structured"
+
+
+@pytest.mark.parametrize("query", [
+    "Find the best candidate for this senior developer role",
+    "Recommend candidates for a data engineer role with AWS experience",
+])
+def test_matching_requests_route_unstructured(query):
+    assert router._classify_rules(_normalize_query(query)) == "unstructured"
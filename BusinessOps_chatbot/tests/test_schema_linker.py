@@ -0,0 +1,13 @@
+import asyncio
+
+from utils.structured_qa_chain import get_structured_chain
+
+
+def test_fallback_table_info_leaves_out_excluded_columns():
+    linker = get_structured_chain().schema_linker
+    fallbacks = linker.stats()["fallbacks"]
+    table_info = asyncio.run(linker.atable_info("zzz qqq"))
+    assert "CREATE TABLE users" in table_info
+    assert "password" not in table_info
+    assert "hashed_pw" not in table_info
+    assert linker.stats()["fallbacks"] == fallbacks + 1
@@ -0,0 +1,60 @@
+import asyncio
+
+from utils.semantic_sql_cache import SemanticSQLCache
+
+
+class SameVectorEmbeddings:
+    """Every text embeds to the same vector, so only the literal check can tell questions apart"""
+
+    async def aembed_query(self, text):
+        return [1.0, 0.0]
+
+
+def _sql_for(cache, question):
+    async def generate():
+        return f"-- {question}"
+
+    return asyncio.run(cache.aget_or_generate(question, generate))
+
+
+def test_near_repeat_is_served_from_cache():
+    cache = SemanticSQLCache(SameVectorEmbeddings())
+    first = _sql_for(cache, "Show me the profiles in Pune")
+    assert _sql_for(cache, "Show me all the profiles in Pune") == first
+    assert cache.hits == 1
+
+
+def test_different_city_is_not_a_hit():
+    cache = SemanticSQLCache(SameVectorEmbeddings())
+    assert _sql_for(cache, "profiles in Pune") != _sql_for(cache, "profiles in Mumbai")
+    assert cache.hits == 0
+
+
+def test_known_entity_values_are_compared_regardless_of_case():
+    cache = SemanticSQLCache(SameVectorEmbeddings())
+    cache.set_entity_values(["Pune", "Mumbai", "New York", "Java"])
+    assert _sql_for(cache, "profiles in pune") != _sql_for(cache, "profiles in mumbai")
+    assert _sql_for(cache, "java developers in new york") != _sql_for(cache, "java developers in pune")
+    assert cache.hits == 0
+
+
+def test_operators_are_not_merged():
+    cache = SemanticSQLCache(SameVectorEmbeddings())
+    assert _sql_for(cache, "profiles with experience > 5") != _sql_for(cache, "profiles with experience < 5")
+    assert _sql_for(cache, "profiles with experience >= 5") != _sql_for(cache, "profiles with experience = 5")
+    assert _sql_for(cache, "profiles with more than 5 years") != _sql_for(cache, "profiles with less than 5 years")
+    assert cache.hits == 0
+
+
+def test_c_cpp_and_csharp_are_different_questions():
+    cache = SemanticSQLCache(SameVectorEmbeddings())
+    answers = {_sql_for(cache, f"profiles with {skill} skills") for skill in ("C++", "C#", "C")}
+    assert len(answers) == 3
+    assert cache.hits == 0
+
+
+def test_case_and_spacing_variants_are_exact_hits():
+    cache = SemanticSQLCache(SameVectorEmbeddings())
+    first = _sql_for(cache, "profiles with experience > 5?")
+    assert _sql_for(cache, "  Profiles with   experience > 5 ") == first
+    assert cache.hits == 1
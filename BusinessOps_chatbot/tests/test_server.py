@@ -0,0 +1,85 @@
+import json
+import asyncio
+
+
+def test_server_imports():
+    import server
+
+    assert server.app.title == "BusinessOps Chatbot"
+
+
+def test_job_description_path_outside_directory_is_rejected():
+    import pytest
+    from fastapi import HTTPException
+    from server import _job_description_file
+
+    for path in ("/etc/passwd", "../../../etc/passwd"):
+        with pytest.raises(HTTPException) as excinfo:
+            _job_description_file(path)
+        assert excinfo.value.status_code == 400
+
+
+def test_job_description_path_inside_directory_is_resolved():
+    from pathlib import Path
+    from config.config import JOB_DESCRIPTION_DIR
+    from server import _job_description_file
+
+    assert _job_description_file(None) is None
+    assert _job_description_file("backend.pdf") == str(Path(JOB_DESCRIPTION_DIR).resolve() / "backend.pdf")
+
+
+def test_sql_examples_requires_the_admin_token(monkeypatch):
+    from fastapi.testclient import TestClient
+    import server
+
+    client = TestClient(server.app)
+    example = {"question": "How many profiles are there?", "sql": "SELECT COUNT(*) FROM add_profile"}
+
+    monkeypatch.setattr(server, "ADMIN_API_TOKEN", None)
+    assert client.post("/sql_examples", json=example, headers={"X-Admin-Token": "anything"}).status_code == 403
+
+    monkeypatch.setattr(server, "ADMIN_API_TOKEN", "s3cret")
+    assert client.post("/sql_examples", json=example).status_code == 401
+    assert client.post("/sql_examples", json=example, headers={"X-Admin-Token": "wrong"}).status_code == 401
+
+    monkeypatch.setattr(server, "record_verified_example", lambda question, sql: True)
+    response = client.post("/sql_examples", json=example, headers={"X-Admin-Token": "s3cret"})
+    assert response.json() == {"status": "success", "added": True}
+
+
+class _FailingRAG:
+    async def stream_query(self, query, job_description_path=None, chat_id=None, tenant_id=None):
+        yield json.dumps({"type": "chatId", "content": "chat"})
+        raise RuntimeError("database went away")
+
+
+def test_stream_failure_ends_with_an_error_event(monkeypatch):
+    from fastapi.testclient import TestClient
+    import server
+
+    monkeypatch.setattr(server.app.state, "in_flight", asyncio.Semaphore(1), raising=False)
+    monkeypatch.setattr(server.app.state, "rag_system", _FailingRAG(), raising=False)
+    response = TestClient(server.app).post("/query/stream", json={"query": "How many profiles are there?"})
+
+    events = [json.loads(line[len("data: "):]) for line in response.text.splitlines() if line.startswith("data: ")]
+    assert response.status_code == 200
+    assert events[0] == {"type": "chatId", "content": "chat"}
+    assert events[-1]["type"] == "error"
+    assert "database went away" in events[-1]["content"]
+
+
+def test_stream_is_rejected_when_the_slots_fill_before_it_starts():
+    from types import SimpleNamespace
+    import server
+
+    async def scenario():
+        in_flight = asyncio.Semaphore(1)
+        request = SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(in_flight=in_flight, rag_system=_FailingRAG())))
+        response = await server.query_stream(server.QueryRequest(query="How many profiles are there?"), request)
+        # Another stream takes the last slot between the route returning and the body starting
+        await in_flight.acquire()
+        return [chunk async for chunk in response.body_iterator]
+
+    chunks = asyncio.run(scenario())
+    assert len(chunks) == 1
+    assert json.loads(chunks[0][len("data: "):])["type"] == "error"
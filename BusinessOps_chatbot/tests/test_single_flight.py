@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+
+from utils.single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_execution():
+    async def scenario():
+        flights = SingleFlight(timeout=5)
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return "answer"
+
+        results = await asyncio.gather(*(flights.do("key", work) for _ in range(5)))
+        return results, calls, flights.stats()
+
+    results, calls, stats = asyncio.run(scenario())
+    assert results == ["answer"] * 5
+    assert calls == 1
+    assert stats == {"in_flight": 0, "executions": 1, "coalesced": 4}
+
+
+def test_cancelled_waiter_leaves_the_shared_run_alone():
+    async def scenario():
+        flights = SingleFlight(timeout=5)
+        started = asyncio.Event()
+
+        async def work():
+            started.set()
+            await asyncio.sleep(0.05)
+            return "answer"
+
+        first = asyncio.create_task(flights.do("key", work))
+        second = asyncio.create_task(flights.do("key", work))
+        await started.wait()
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == "answer"
+
+
+def test_last_waiter_cancelling_cancels_the_work():
+    async def scenario():
+        flights = SingleFlight(timeout=5)
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def work():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        waiter = asyncio.create_task(flights.do("key", work))
+        await started.wait()
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.wait_for(cancelled.wait(), 1)
+        await asyncio.sleep(0)
+        return flights.stats()["in_flight"]
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_errors_reach_every_waiter():
+    async def scenario():
+        flights = SingleFlight(timeout=5)
+
+        async def work():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        return await asyncio.gather(*(flights.do("key", work) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert len(results) == 3
+    assert all(isinstance(result, ValueError) and str(result) == "boom" for result in results)
+
+
+def test_stream_fans_out_to_late_subscribers_and_propagates_errors():
+    async def scenario():
+        flights = SingleFlight(timeout=5)
+        produced = 0
+
+        async def events():
+            nonlocal produced
+            for event in ("a", "b", "c"):
+                produced += 1
+                yield event
+                await asyncio.sleep(0.02)
+            raise RuntimeError("stream failed")
+
+        async def subscribe(delay):
+            await asyncio.sleep(delay)
+            seen = []
+            try:
+                async for event in flights.stream("key", events):
+                    seen.append(event)
+            except RuntimeError as e:
+                seen.append(str(e))
+            return seen
+
+        results = await asyncio.gather(subscribe(0), subscribe(0.03))
+        return results, produced
+
+    results, produced = asyncio.run(scenario())
+    assert results == [["a", "b", "c", "stream failed"]] * 2
+    assert produced == 3
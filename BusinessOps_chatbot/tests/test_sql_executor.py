@@ -0,0 +1,51 @@
+import time
+import asyncio
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import create_engine
+
+from utils.sql_executor import AsyncSQLExecutor
+
+# Counts far enough that it only ends when interrupted
+SLOW_QUERY = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT COUNT(*) FROM n"
+
+
+def _executor(tmp_path, timeout=0):
+    engine = create_engine(f"sqlite:///{tmp_path / 'executor.db'}")
+    pool = ThreadPoolExecutor(max_workers=2)
+    return AsyncSQLExecutor(SimpleNamespace(_engine=engine), pool=pool, timeout=timeout), engine
+
+
+def test_cancelling_a_query_interrupts_it_and_returns_the_connection(tmp_path):
+    executor, engine = _executor(tmp_path)
+
+    async def scenario():
+        task = asyncio.create_task(executor.fetch(SLOW_QUERY))
+        await asyncio.sleep(0.2)
+        assert engine.pool.checkedout() == 1
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        deadline = time.monotonic() + 2
+        while engine.pool.checkedout() and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        return engine.pool.checkedout(), await executor.fetch("SELECT 1")
+
+    checked_out, result = asyncio.run(scenario())
+    assert checked_out == 0
+    assert executor.cancelled == 1
+    assert result == (["1"], [(1,)])
+
+
+def test_statement_timeout_and_row_cap(tmp_path):
+    executor, _ = _executor(tmp_path, timeout=0.2)
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(executor.fetch(SLOW_QUERY))
+    columns, rows = asyncio.run(executor.fetch("SELECT 1 AS a UNION ALL SELECT 2 UNION ALL SELECT 3", max_rows=2))
+
+    assert columns == ["a"]
+    assert len(rows) == 2
+    assert (executor.timed_out, executor.truncated) == (1, 1)
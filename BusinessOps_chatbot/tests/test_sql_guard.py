@@ -0,0 +1,15 @@
+import asyncio
+
+from utils.structured_qa_chain import get_structured_chain
+
+
+def test_existing_limit_above_the_cap_is_clamped():
+    chain = get_structured_chain()
+    max_rows = chain.guard.max_rows
+    chain.guard.max_rows = 3
+    try:
+        result = asyncio.run(chain.aexecute_query("SELECT id FROM add_profile ORDER BY id LIMIT 1000"))
+    finally:
+        chain.guard.max_rows = max_rows
+    assert result["rows"] == [[1], [2], [3]]
+    assert chain.stats()["executor"]["truncated"] >= 1
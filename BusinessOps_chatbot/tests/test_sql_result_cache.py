@@ -0,0 +1,37 @@
+import sqlite3
+
+from dependencies.database import sqlite_data_version
+from utils.sql_result_cache import SQLResultCache, MemoryResultBackend, normalize_sql
+
+RESULT = {"columns": ["n"], "rows": [[1]]}
+
+
+def test_normalize_sql_keeps_quoted_tokens_verbatim():
+    assert normalize_sql('SELECT  "Name" FROM T  WHERE x = \'Pune\';') == 'select "Name" from t where x = \'Pune\''
+    assert normalize_sql('SELECT "Name" FROM t') != normalize_sql('SELECT "name" FROM t')
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    cache = SQLResultCache(["t"], backend=MemoryResultBackend(), ttl=10)
+    now = [1000.0]
+    monkeypatch.setattr("utils.sql_result_cache.time.time", lambda: now[0])
+    cache.put("SELECT n FROM t", RESULT)
+    assert cache.get("SELECT n FROM t") == RESULT
+    now[0] += 11
+    assert cache.get("SELECT n FROM t") is None
+
+
+def test_entries_go_stale_when_another_connection_writes(tmp_path):
+    path = str(tmp_path / "data.db")
+    writer = sqlite3.connect(path)
+    writer.execute("CREATE TABLE t (n INTEGER)")
+    writer.commit()
+
+    cache = SQLResultCache(["t"], backend=MemoryResultBackend(), data_version=sqlite_data_version(path))
+    cache.put("SELECT n FROM t", RESULT)
+    assert cache.get("SELECT n FROM t") == RESULT
+
+    writer.execute("INSERT INTO t VALUES (2)")
+    writer.commit()
+    assert cache.get("SELECT n FROM t") is None
+    writer.close()
@@ -0,0 +1,19 @@
+from utils.tracing import render_stats
+
+
+def test_render_stats_flattens_numeric_leaves():
+    text = render_stats({
+        "router": {"rules": 3, "llm": 1},
+        "structured": {"result_cache": {"hit_rate": 0.5}, "guard": {"rejected": 2}},
+        "llm": {"gemini-1.5-pro": {"calls": 4}},
+        "routing_mode": "speculative",
+        "latency": {"sequential": {"p50_ms": None}},
+    })
+    lines = [line for line in text.splitlines() if not line.startswith("#")]
+    assert lines == [
+        "rag_llm_gemini_1_5_pro_calls 4.0",
+        "rag_router_llm 1.0",
+        "rag_router_rules 3.0",
+        "rag_structured_guard_rejected 2.0",
+        "rag_structured_result_cache_hit_rate 0.5",
+    ]
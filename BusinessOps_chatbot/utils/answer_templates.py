@@ -0,0 +1,47 @@
+import re
+
+from config.config import ANSWER_TEMPLATE_MAX_ROWS, ANSWER_TEMPLATE_MAX_COLUMNS
+
+NO_RESULT_ANSWER = "There is no relevant context in the database that can help answer your question."
+
+_AGGREGATES = {"count": "Number of", "avg": "Average", "sum": "Total", "min": "Lowest", "max": "Highest"}
+
+
+def column_label(column):
+    """Readable heading for a result column: "charge_rate_inr" -> "Charge Rate Inr", "AVG(x)" -> "Average X" """
+    match = re.fullmatch(r"\s*(count|avg|sum|min|max)\s*\(\s*(?:distinct\s+)?([\w.*]+)\s*\)\s*", column, re.IGNORECASE)
+    if match:
+        function, argument = match.group(1).lower(), match.group(2).split(".")[-1]
+        if argument == "*":
+            return "Count"
+        return f"{_AGGREGATES[function]} {column_label(argument)}"
+    return " ".join(word.capitalize() for word in column.split(".")[-1].split("_") if word)
+
+
+def _value(value):
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:,.2f}".rstrip("0").rstrip(".")
+    return str(value).replace("|", "\\|").replace("\n", " ")
+
+
+def render_answer(result, max_rows=ANSWER_TEMPLATE_MAX_ROWS, max_columns=ANSWER_TEMPLATE_MAX_COLUMNS):
+    """Markdown answer for results simple enough not to need the answer LLM; None for anything else"""
+    if "error" in result:
+        return None
+    columns, rows = result["columns"], result["rows"]
+    if not rows:
+        return NO_RESULT_ANSWER
+    if len(rows) > max_rows or len(columns) > max_columns:
+        return None
+
+    labels = [column_label(column) for column in columns]
+    if len(rows) == 1:
+        if len(columns) == 1:
+            return f"**{labels[0]}:** {_value(rows[0][0])}"
+        return "\n".join(f"- **{label}:** {_value(value)}" for label, value in zip(labels, rows[0]))
+
+    lines = ["| " + " | ".join(labels) + " |", "|" + "---|" * len(labels)]
+    lines += ["| " + " | ".join(_value(value) for value in row) + " |" for row in rows]
+    return "\n".join(lines)
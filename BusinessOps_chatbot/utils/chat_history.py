@@ -3,7 +3,7 @@ from typing import Optional, List
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from pydantic import BaseModel
 from pymongo import MongoClient
-from pymongo.errors import ConnectionError
+from pymongo.errors import ConnectionFailure
 
 # --- MongoDB Connection Setup ---
 def get_mongo_db():
@@ -21,7 +21,7 @@ def get_mongo_db():
         
         # Return the database instance (replace 'hr_chat_db' with your preferred DB name)
         return client["hr_chat_db"]
-    except ConnectionError as e:
+    except ConnectionFailure as e:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=f"Failed to connect to MongoDB: {str(e)}"
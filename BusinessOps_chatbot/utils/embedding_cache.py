@@ -0,0 +1,235 @@
+import os
+import re
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from config.config import EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_MAX_ENTRIES
+
+
+class CachedEmbeddings(Embeddings):
+    """Wraps any LangChain Embeddings with a content-addressed on-disk cache.
+
+    Vectors are float32 rows appended to `vectors.f32` and read back through a memory map; `index.db`
+    maps sha256(kind, text) to a row. Several processes can share one cache directory: appends are
+    serialized by an IMMEDIATE transaction on the index, and readers pick up rows written by others
+    on their next miss.
+
+    At most `max_entries` vectors are kept. Hits are remembered and written as last-used times with the
+    next append; an append that takes the index past the cap copies the most recently used 3/4 into a
+    new vectors file (the next generation) and drops the rest. Other processes follow the generation
+    change on their next lookup.
+    """
+
+    def __init__(self, embeddings, model_name=None, cache_dir=EMBEDDING_CACHE_DIR, max_entries=EMBEDDING_CACHE_MAX_ENTRIES):
+        self.embeddings = embeddings
+        self.model_name = model_name or getattr(embeddings, "model", None) or getattr(embeddings, "model_name", None) or type(embeddings).__name__
+        self.directory = os.path.join(cache_dir, re.sub(r"[^\w.-]", "_", self.model_name))
+        os.makedirs(self.directory, exist_ok=True)
+        self.max_entries = max_entries
+
+        self._conn = sqlite3.connect(os.path.join(self.directory, "index.db"), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, row INTEGER UNIQUE, used REAL NOT NULL DEFAULT 0)")
+        if "used" not in {column[1] for column in self._conn.execute("PRAGMA table_info(vectors)")}:
+            # Caches written before the size cap have no last-used times; they count as the oldest
+            self._conn.execute("ALTER TABLE vectors ADD COLUMN used REAL NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+        self._lock = threading.Lock()
+
+        self._rows = {}
+        self._touched = set()
+        self._generation = None
+        self.vectors_path = None
+        self._mmap = None
+        self.dim = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._refresh_index()
+
+    @staticmethod
+    def _key(kind, text):
+        return hashlib.sha256(f"{kind}\0{text}".encode("utf-8")).hexdigest()
+
+    def _vectors_path(self, generation):
+        # Generation 0 keeps the file name caches had before compaction existed
+        return os.path.join(self.directory, f"vectors.{generation}.f32" if generation else "vectors.f32")
+
+    def _sync_generation(self):
+        """Follow a compaction by us or another process: switch to its vectors file and forget every row"""
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        generation = row[0] if row else 0
+        if generation == self._generation:
+            return False
+        self._generation = generation
+        self.vectors_path = self._vectors_path(generation)
+        open(self.vectors_path, "ab").close()
+        self._rows = {}
+        self._mmap = None
+        return True
+
+    def _refresh_index(self):
+        """Pull in rows appended since we last looked, by us or another process"""
+        self._sync_generation()
+        known = max(self._rows.values(), default=-1)
+        self._rows.update(self._conn.execute("SELECT key, row FROM vectors WHERE row > ?", (known,)))
+        if self.dim is None:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+            self.dim = row[0] if row else None
+        self._mmap = None
+
+    def _matrix(self):
+        try:
+            if self._mmap is None and self.dim and os.path.getsize(self.vectors_path):
+                self._mmap = np.memmap(self.vectors_path, dtype=np.float32, mode="r").reshape(-1, self.dim)
+        except FileNotFoundError:
+            # Another process compacted and removed this generation; the next lookup follows it
+            return None
+        return self._mmap
+
+    def _lookup(self, keys):
+        """Cached vectors for `keys` (None where missing)"""
+        with self._lock:
+            if self._sync_generation() or any(key not in self._rows for key in keys):
+                self._refresh_index()
+            matrix = self._matrix()
+            found = [
+                matrix[self._rows[key]].tolist() if key in self._rows and matrix is not None and self._rows[key] < len(matrix) else None
+                for key in keys
+            ]
+            self._touched.update(key for key, vector in zip(keys, found) if vector is not None)
+            hits = sum(vector is not None for vector in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+            return found
+
+    def _store(self, keys, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            compacted = False
+            try:
+                # Rows go into the current generation's file, even if another process just compacted
+                self._sync_generation()
+                now = time.time()
+                if self.dim is None:
+                    self.dim = vectors.shape[1]
+                    self._conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('dim', ?)", (self.dim,))
+                existing = {k for (k,) in self._conn.execute(
+                    f"SELECT key FROM vectors WHERE key IN ({','.join('?' * len(keys))})", keys
+                )}
+                fresh = [(k, v) for k, v in dict(zip(keys, vectors)).items() if k not in existing]
+                if fresh:
+                    start = self._conn.execute("SELECT COALESCE(MAX(row), -1) + 1 FROM vectors").fetchone()[0]
+                    with open(self.vectors_path, "r+b") as f:
+                        f.seek(start * self.dim * 4)
+                        f.write(np.stack([v for _, v in fresh]).tobytes())
+                    self._conn.executemany(
+                        "INSERT INTO vectors (key, row, used) VALUES (?, ?, ?)",
+                        [(k, start + i, now) for i, (k, _) in enumerate(fresh)],
+                    )
+                if self._touched:
+                    self._conn.executemany("UPDATE vectors SET used = ? WHERE key = ?", [(now, k) for k in self._touched])
+                # Rows are numbered densely within a generation, so the next row is also the entry count
+                if fresh and start + len(fresh) > self.max_entries:
+                    self._compact(start + len(fresh))
+                    compacted = True
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._touched.clear()
+            self._refresh_index()
+            if compacted:
+                self._remove_old_generations()
+
+    def _compact(self, entries):
+        """Copy the most recently used 3/4 of the cap into the next generation's file. Runs inside the
+        write transaction, so no other process appends meanwhile"""
+        keep = self._conn.execute(
+            "SELECT key, row, used FROM vectors ORDER BY used DESC, row DESC LIMIT ?", (max(1, self.max_entries * 3 // 4),)
+        ).fetchall()
+        old = np.memmap(self.vectors_path, dtype=np.float32, mode="r").reshape(-1, self.dim)
+        generation = self._generation + 1
+        with open(self._vectors_path(generation), "wb") as f:
+            f.write(np.ascontiguousarray(old[[row for _, row, _ in keep]]).tobytes())
+        del old
+        self._conn.execute("DELETE FROM vectors")
+        self._conn.executemany(
+            "INSERT INTO vectors (key, row, used) VALUES (?, ?, ?)",
+            [(key, i, used) for i, (key, _, used) in enumerate(keep)],
+        )
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('generation', ?)", (generation,))
+        self.evictions += entries - len(keep)
+
+    def _remove_old_generations(self):
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith("vectors.") and name.endswith(".f32") and path != self.vectors_path:
+                try:
+                    os.remove(path)
+                except OSError:
+                    # Still mapped by a reader (Windows); the next compaction retries
+                    pass
+
+    def _split(self, kind, texts):
+        keys = [self._key(kind, text) for text in texts]
+        found = self._lookup(keys)
+        # Only the first occurrence of a repeated text goes to the model
+        first = {}
+        for i, vector in enumerate(found):
+            if vector is None:
+                first.setdefault(keys[i], i)
+        return keys, found, list(first.values())
+
+    def _merge(self, keys, found, missing, computed):
+        if missing:
+            self._store([keys[i] for i in missing], computed)
+            by_key = {keys[i]: list(vector) for i, vector in zip(missing, computed)}
+            found = [vector if vector is not None else by_key[key] for key, vector in zip(keys, found)]
+        return found
+
+    def embed_documents(self, texts):
+        keys, found, missing = self._split("document", texts)
+        computed = self.embeddings.embed_documents([texts[i] for i in missing]) if missing else []
+        return self._merge(keys, found, missing, computed)
+
+    def embed_query(self, text):
+        keys, found, missing = self._split("query", [text])
+        computed = [self.embeddings.embed_query(text)] if missing else []
+        return self._merge(keys, found, missing, computed)[0]
+
+    # The async variants keep the index queries, vector file I/O and any compaction off the event loop
+
+    async def aembed_documents(self, texts):
+        keys, found, missing = await asyncio.to_thread(self._split, "document", texts)
+        if not missing:
+            return found
+        computed = await self.embeddings.aembed_documents([texts[i] for i in missing])
+        return await asyncio.to_thread(self._merge, keys, found, missing, computed)
+
+    async def aembed_query(self, text):
+        keys, found, missing = await asyncio.to_thread(self._split, "query", [text])
+        if not missing:
+            return found[0]
+        computed = [await self.embeddings.aembed_query(text)]
+        return (await asyncio.to_thread(self._merge, keys, found, missing, computed))[0]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "model": self.model_name,
+                "entries": len(self._rows),
+                "max_entries": self.max_entries,
+                "evictions": self.evictions,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
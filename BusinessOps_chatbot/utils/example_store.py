@@ -0,0 +1,75 @@
+import os
+import json
+import threading
+
+import numpy as np
+
+from config.config import SQL_EXAMPLES_PATH, FEW_SHOT_K
+from utils.semantic_sql_cache import normalize_question
+
+
+class SQLExampleStore:
+    """Question -> SQL examples for the few-shot prompt, retrieved by similarity to the incoming question.
+
+    Starts from the seed examples and grows with verified pairs, which are appended to a JSONL file
+    so they are loaded again on the next start.
+    """
+
+    def __init__(self, embeddings, seed_examples=(), path=SQL_EXAMPLES_PATH):
+        self.embeddings = embeddings
+        self.path = path
+        self._lock = threading.Lock()
+        self._examples = []
+        self._keys = set()
+        self._matrix = None
+
+        examples = list(seed_examples)
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                examples.extend(json.loads(line) for line in f if line.strip())
+        self._add_many(examples)
+
+    @staticmethod
+    def _unit(vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def _add_many(self, examples):
+        fresh = []
+        with self._lock:
+            for example in examples:
+                key = normalize_question(example["input_question"])
+                if key not in self._keys:
+                    self._keys.add(key)
+                    fresh.append(example)
+        if not fresh:
+            return []
+        vectors = self._unit(self.embeddings.embed_documents([e["input_question"] for e in fresh]))
+        with self._lock:
+            self._examples.extend(fresh)
+            self._matrix = vectors if self._matrix is None else np.vstack([self._matrix, vectors])
+        return fresh
+
+    def add(self, question, sql):
+        """Record a verified question/SQL pair; returns False if the question is already known"""
+        example = {"input_question": question, "SQLQuery": sql}
+        if not self._add_many([example]):
+            return False
+        if self.path:
+            with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(example) + "\n")
+        return True
+
+    async def aselect(self, question, k=FEW_SHOT_K):
+        """The `k` examples most similar to `question`, most similar first"""
+        with self._lock:
+            matrix, examples = self._matrix, list(self._examples)
+        if matrix is None or not k:
+            return []
+        query = self._unit(await self.embeddings.aembed_query(question))
+        scores = matrix[: len(examples)] @ query
+        return [examples[i] for i in np.argsort(-scores)[:k]]
+
+    def __len__(self):
+        return len(self._examples)
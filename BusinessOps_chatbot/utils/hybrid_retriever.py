@@ -0,0 +1,211 @@
+import re
+import math
+from collections import Counter, defaultdict
+from typing import Any, List, Optional
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+
+from config.config import HYBRID_FETCH_K, RRF_K
+
+# Fields the lexical index is built over, as stored in the candidate index metadata
+LEXICAL_FIELDS = ["job_title", "key_skill", "professional_summary"]
+
+_TOKEN = re.compile(r"[a-z0-9][a-z0-9+#.]*")
+
+# Only explicit asks turn on the availability filter; a bare "available" or "availability" is too often
+# "not available" or "availability doesn't matter"
+_AVAILABILITY_REQUIRED = re.compile(
+    r"\b(?:(?:immediately|currently)\s+available|available\s+(?:immediately|now|right away|to (?:start|join))"
+    r"|immediate(?:ly)?\s+(?:joiners?|joining|start|hiring|availability)|(?:start|join)(?:ing)?\s+(?:immediately|right away)"
+    r"|must be available)\b"
+)
+_NEGATED = re.compile(r"\b(?:not|no|never|without|isn't|aren't|doesn't|don't|needn't)\s+(?:\S+\s+){0,3}$")
+
+
+def tokenize(text):
+    # Keeps skill spellings like "c++", "c#" and "node.js" intact; drops a trailing full stop
+    return [token.rstrip(".") for token in _TOKEN.findall((text or "").lower())]
+
+
+def parse_charge_rate(charge_rate):
+    """Numeric hourly rate from strings such as "$50/hr"; None if there is no number"""
+    match = re.search(r"\d+(?:\.\d+)?", str(charge_rate or "").replace(",", ""))
+    return float(match.group()) if match else None
+
+
+def is_available(availability):
+    text = (availability or "").lower()
+    return bool(text) and not any(word in text for word in ("unavailable", "not available", "engaged"))
+
+
+def candidate_index_metadata(row):
+    """Scalar metadata stored with each vector: what the lexical index and the pre-filters need"""
+    metadata = {
+        "id": row["id"],
+        "name": row["profile_name"],
+        "location": (row["location"] or "").strip().lower(),
+        "is_available": is_available(row["availability"]),
+    }
+    for field in LEXICAL_FIELDS:
+        metadata[field] = row[field] or ""
+    rate = parse_charge_rate(row["charge_rate"])
+    if rate is not None:
+        metadata["charge_rate_value"] = rate
+    return metadata
+
+
+def matches_filters(metadata, filters):
+    if filters.get("available") is not None and metadata.get("is_available") != filters["available"]:
+        return False
+    if filters.get("location") and metadata.get("location") != filters["location"].lower():
+        return False
+    rate = metadata.get("charge_rate_value")
+    if filters.get("max_charge_rate") is not None and (rate is None or rate > filters["max_charge_rate"]):
+        return False
+    if filters.get("min_charge_rate") is not None and (rate is None or rate < filters["min_charge_rate"]):
+        return False
+    return True
+
+
+def chroma_where(filters):
+    """The same filters as a Chroma `where` clause, so the vector search only scores eligible profiles"""
+    clauses = []
+    if filters.get("available") is not None:
+        clauses.append({"is_available": {"$eq": filters["available"]}})
+    if filters.get("location"):
+        clauses.append({"location": {"$eq": filters["location"].lower()}})
+    if filters.get("max_charge_rate") is not None:
+        clauses.append({"charge_rate_value": {"$lte": float(filters["max_charge_rate"])}})
+    if filters.get("min_charge_rate") is not None:
+        clauses.append({"charge_rate_value": {"$gte": float(filters["min_charge_rate"])}})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def extract_candidate_filters(text, known_locations=()):
+    """Best-effort filters implied by a job description: availability, a single known location, a rate ceiling"""
+    lowered = (text or "").lower()
+    filters = {}
+    if any(not _NEGATED.search(lowered[:m.start()]) for m in _AVAILABILITY_REQUIRED.finditer(lowered)):
+        filters["available"] = True
+    rate = re.search(r"(?:under|below|less than|up to|at most|max(?:imum)?|budget(?: of| is)?)\s*(?:of\s*)?\$\s*(\d+(?:\.\d+)?)", lowered)
+    if rate:
+        filters["max_charge_rate"] = float(rate.group(1))
+    locations = [loc for loc in known_locations if loc and re.search(rf"\b{re.escape(loc)}\b", lowered)]
+    if len(locations) == 1:
+        filters["location"] = locations[0]
+    return filters
+
+
+class BM25Index:
+    """In-memory Okapi BM25 over the lexical fields of every indexed profile"""
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(dict)   # term -> {doc id: term frequency}
+        self.doc_lengths = {}
+        self.metadata = {}
+        self._total_length = 0
+
+    def add(self, doc_id, metadata):
+        self.remove(doc_id)
+        terms = Counter(tokenize(" ".join(str(metadata.get(field, "")) for field in LEXICAL_FIELDS)))
+        for term, tf in terms.items():
+            self.postings[term][doc_id] = tf
+        length = sum(terms.values())
+        self.doc_lengths[doc_id] = length
+        self._total_length += length
+        self.metadata[doc_id] = metadata
+
+    def remove(self, doc_id):
+        if doc_id not in self.doc_lengths:
+            return
+        for term in tokenize(" ".join(str(self.metadata[doc_id].get(field, "")) for field in LEXICAL_FIELDS)):
+            self.postings.get(term, {}).pop(doc_id, None)
+        self._total_length -= self.doc_lengths.pop(doc_id)
+        del self.metadata[doc_id]
+
+    def search(self, query, k, filters=None):
+        """Top-k (doc id, score); documents failing `filters` are never scored"""
+        n = len(self.doc_lengths)
+        if not n:
+            return []
+        avgdl = self._total_length / n
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                if filters and not matches_filters(self.metadata[doc_id], filters):
+                    continue
+                norm = tf + self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avgdl)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / norm
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    @classmethod
+    def from_chroma(cls, vector_store, page_size=1000):
+        """Build from the metadata already stored with the vectors; pages through the collection"""
+        index = cls()
+        offset = 0
+        while True:
+            page = vector_store._collection.get(include=["metadatas"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                return index
+            for doc_id, metadata in zip(page["ids"], page["metadatas"]):
+                index.add(doc_id, metadata or {})
+            offset += len(page["ids"])
+
+
+class HybridCandidateRetriever(BaseRetriever):
+    """BM25 + vector retrieval fused with reciprocal-rank fusion. Filters are applied inside both
+    searches (Chroma `where`, BM25 candidate set) rather than to their results."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    vector_store: Any
+    bm25: Any
+    k: int = 3
+    fetch_k: int = HYBRID_FETCH_K
+    rrf_k: int = RRF_K
+
+    def known_locations(self):
+        return {metadata.get("location") for metadata in self.bm25.metadata.values()} - {"", None}
+
+    def _fuse(self, query, filters):
+        ranked_lists = [
+            [doc_id for doc_id, _ in self.bm25.search(query, self.fetch_k, filters)],
+        ]
+        if self.vector_store._collection.count():
+            vector_hits = self.vector_store.similarity_search_with_score(
+                query, k=self.fetch_k, filter=chroma_where(filters or {})
+            )
+            ranked_lists.append([str(doc.metadata.get("id")) for doc, _ in vector_hits])
+
+        fused = defaultdict(float)
+        for ranked in ranked_lists:
+            for rank, doc_id in enumerate(ranked):
+                fused[doc_id] += 1.0 / (self.rrf_k + rank + 1)
+        return [doc_id for doc_id, _ in sorted(fused.items(), key=lambda item: item[1], reverse=True)[: self.k]]
+
+    def _get_relevant_documents(self, query, *, run_manager=None, filters: Optional[dict] = None) -> List[Document]:
+        inferred = filters is None
+        if inferred:
+            filters = extract_candidate_filters(query, self.known_locations())
+
+        ids = self._fuse(query, filters)
+        if not ids and inferred and filters:
+            # Filters guessed from free text were too strict; better a loose match than none
+            ids = self._fuse(query, {})
+        if not ids:
+            return []
+
+        found = self.vector_store._collection.get(ids=ids, include=["documents", "metadatas"])
+        by_id = {doc_id: Document(page_content=text, metadata=metadata or {})
+                 for doc_id, text, metadata in zip(found["ids"], found["documents"], found["metadatas"])}
+        return [by_id[doc_id] for doc_id in ids if doc_id in by_id]
@@ -0,0 +1,81 @@
+import os
+import time
+from itertools import islice
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from config.config import EMBEDDING_BATCH_SIZE, EMBEDDING_WORKERS
+
+
+def _batches(profiles, batch_size):
+    profiles = iter(profiles)
+    while True:
+        batch = list(islice(profiles, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _embed_batch(embedding_function, batch):
+    return batch, embedding_function.embed_documents([profile["content"] for profile in batch])
+
+
+def _write_batch(vector_store, batch, vectors):
+    # Vectors are already computed, so go straight to the collection; profile ids keep the write an upsert
+    vector_store._collection.upsert(
+        ids=[str(profile["id"]) for profile in batch],
+        embeddings=vectors,
+        documents=[profile["content"] for profile in batch],
+        metadatas=[profile["index_metadata"] for profile in batch],
+    )
+
+
+def run_embedding_pipeline(
+    profiles,
+    vector_store,
+    embedding_function,
+    batch_size=EMBEDDING_BATCH_SIZE,
+    workers=EMBEDDING_WORKERS,
+    on_batch_written=None,
+):
+    """Embed an iterable of preprocessed profiles in parallel batches and upsert them into `vector_store`.
+
+    Batches are embedded on a thread pool (the local model releases the GIL inside torch, the Gemini
+    embedder is network bound). At most two batches per worker are in flight: once that many are
+    queued the producer stops pulling profiles and the calling thread drains the oldest batch into
+    the vector store, so memory stays bounded however large `profiles` is.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * 2
+    started = time.perf_counter()
+    written = 0
+    batches = 0
+
+    def drain(pending):
+        nonlocal written, batches
+        batch, vectors = pending.popleft().result()
+        _write_batch(vector_store, batch, vectors)
+        written += len(batch)
+        batches += 1
+        if on_batch_written:
+            on_batch_written(batch)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="embed") as pool:
+        pending = deque()
+        for batch in _batches(profiles, batch_size):
+            pending.append(pool.submit(_embed_batch, embedding_function, batch))
+            if len(pending) >= max_in_flight:
+                drain(pending)
+        while pending:
+            drain(pending)
+
+    seconds = time.perf_counter() - started
+    stats = {
+        "profiles": written,
+        "batches": batches,
+        "seconds": seconds,
+        "profiles_per_second": written / seconds if seconds else 0.0,
+    }
+    if written:
+        print(f"Embedded {written} profiles in {batches} batches: {stats['profiles_per_second']:.1f} profiles/s")
+    return stats
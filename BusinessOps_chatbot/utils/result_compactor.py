@@ -0,0 +1,71 @@
+from collections import Counter
+from numbers import Number
+
+from config.config import ANSWER_RESULT_TOKEN_BUDGET, ANSWER_RESULT_MAX_CELL_CHARS
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token), good enough for budgeting a prompt"""
+    return (len(text) + 3) // 4
+
+
+def _cell(value, max_chars=ANSWER_RESULT_MAX_CELL_CHARS):
+    text = "NULL" if value is None else str(value).replace("\n", " ")
+    return text if len(text) <= max_chars else text[: max_chars - 3] + "..."
+
+
+def _line(values):
+    return " | ".join(_cell(value) for value in values)
+
+
+def summarize_columns(columns, rows, top_n=5):
+    """One line per column: min/max/avg/sum for numeric columns, the most common values for the rest"""
+    lines = []
+    for i, column in enumerate(columns):
+        values = [row[i] for row in rows if row[i] is not None]
+        if not values:
+            lines.append(f"- {column}: all NULL")
+        elif all(isinstance(value, Number) and not isinstance(value, bool) for value in values):
+            lines.append(
+                f"- {column}: min {min(values)}, max {max(values)}, "
+                f"avg {sum(values) / len(values):.2f}, sum {sum(values)}"
+            )
+        else:
+            counts = Counter(_cell(value, 60) for value in values)
+            if counts.most_common(1)[0][1] == 1:
+                lines.append(f"- {column}: {len(counts)} distinct values")
+                continue
+            common = ", ".join(f"{value} ({count})" for value, count in counts.most_common(top_n))
+            lines.append(f"- {column}: {len(counts)} distinct; most common: {common}")
+    return lines
+
+
+def compact_result(result, token_budget=ANSWER_RESULT_TOKEN_BUDGET):
+    """Render a query result for the answer prompt within `token_budget`.
+
+    Small results are rendered whole. Larger ones get the row count and a per-column summary, then
+    as many leading rows as still fit (the query's ORDER BY decides which) and an "N more rows" marker.
+    """
+    if "error" in result:
+        return f"Error: {result['error']}"
+    columns, rows = result["columns"], result["rows"]
+    if not rows:
+        return ""
+
+    header = _line(columns)
+    full = "\n".join([header] + [_line(row) for row in rows])
+    if estimate_tokens(full) <= token_budget:
+        return full
+
+    summary = [f"{len(rows)} rows in total. Column summary:"] + summarize_columns(columns, rows)
+    shown = [header]
+    used = estimate_tokens("\n".join(summary + shown)) + 10   # room for the trailing marker
+    for row in rows:
+        line = _line(row)
+        cost = estimate_tokens(line) + 1
+        if used + cost > token_budget:
+            break
+        shown.append(line)
+        used += cost
+    hidden = len(rows) - (len(shown) - 1)
+    return "\n".join(summary + ["First rows:"] + shown + [f"... {hidden} more rows not shown"])
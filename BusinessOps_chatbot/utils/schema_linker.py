@@ -0,0 +1,149 @@
+import re
+import threading
+
+import numpy as np
+from sqlalchemy import select
+
+from config.config import SCHEMA_LINK_TOP_COLUMNS, SCHEMA_LINK_MIN_SIMILARITY, SCHEMA_EXCLUDED_COLUMNS
+
+_WORD = re.compile(r"[a-z0-9]+")
+# Too common in questions or column names to link anything on their own
+_GENERIC = {
+    "a", "an", "the", "of", "in", "on", "at", "to", "for", "by", "with", "and", "or", "is", "are", "was", "be",
+    "what", "which", "who", "how", "many", "much", "me", "show", "list", "give", "find", "all", "their", "there",
+    "id", "add", "more", "than", "have", "ha", "do", "doe",
+}
+
+
+def _words(text):
+    # Crude singular form so "profiles" matches "profile" and "skills" matches "skill"
+    words = {word[:-1] if len(word) > 3 and word.endswith("s") else word for word in _WORD.findall(text.lower())}
+    return words - _GENERIC
+
+
+class SchemaLinker:
+    """Picks the tables and columns a question needs and renders `table_info` for just those.
+
+    Every column is described once at start-up (its name, type and an optional description) and
+    embedded; a question selects the columns it is most similar to, plus any whose name it mentions.
+    Selected tables always keep their key columns so joins stay possible. Sample rows are read at
+    start-up too, so nothing is reflected or queried on the request path.
+    """
+
+    def __init__(self, db, embeddings, descriptions=None, sample_rows=3,
+                 top_columns=SCHEMA_LINK_TOP_COLUMNS, min_similarity=SCHEMA_LINK_MIN_SIMILARITY):
+        self.db = db
+        self.embeddings = embeddings
+        self.descriptions = descriptions or {}
+        self.top_columns = top_columns
+        self.min_similarity = min_similarity
+        self._lock = threading.Lock()
+        self.linked = 0
+        self.fallbacks = 0
+
+        tables = [db._metadata.tables[name] for name in db.get_usable_table_names() if name in db._metadata.tables]
+        self.tables = {table.name: table for table in tables}
+        self.columns = [
+            (table.name, column.name)
+            for table in tables
+            for column in table.columns
+            if column.name not in SCHEMA_EXCLUDED_COLUMNS
+        ]
+        texts = [self._describe(table, column) for table, column in self.columns]
+        vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+        self._matrix = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        self._table_words = {name: _words(f"{name} {self.descriptions.get(name, '')}") for name in self.tables}
+        # A column is linked by name only on words that are not already its table's ("company" in company_name)
+        self._column_words = [
+            _words(f"{column} {self.descriptions.get(f'{table}.{column}', '')}") - _words(table)
+            for table, column in self.columns
+        ]
+        self._samples = self._read_samples(sample_rows)
+        # Fallback when a question links to nothing: every table, still without the excluded columns
+        self._everything = {
+            name: [column.name for column in table.columns if column.name not in SCHEMA_EXCLUDED_COLUMNS]
+            for name, table in self.tables.items()
+        }
+
+    def _describe(self, table, column):
+        kind = self.tables[table].columns[column].type
+        text = f"{table} {column.replace('_', ' ')} ({kind})"
+        extra = self.descriptions.get(f"{table}.{column}")
+        return f"{text}: {extra}" if extra else text
+
+    def _read_samples(self, sample_rows):
+        samples = {}
+        if not sample_rows:
+            return samples
+        with self.db._engine.connect() as conn:
+            for name, table in self.tables.items():
+                try:
+                    rows = conn.execute(select(table).limit(sample_rows)).mappings().fetchall()
+                    samples[name] = [dict(row) for row in rows]
+                except Exception as e:
+                    print(f"Could not read sample rows from {name}: {e}")
+        return samples
+
+    def _key_columns(self, table, selected_tables):
+        keys = {column.name for column in table.primary_key.columns}
+        keys.update(fk.parent.name for fk in table.foreign_keys if fk.column.table.name in selected_tables)
+        return keys
+
+    async def alink(self, question):
+        """{table: [columns]} relevant to `question`, in schema order; empty if nothing stands out"""
+        query = np.asarray(await self.embeddings.aembed_query(question), dtype=np.float32)
+        scores = self._matrix @ (query / max(np.linalg.norm(query), 1e-12))
+        words = _words(question)
+
+        chosen = {i for i in np.argsort(-scores)[: self.top_columns] if scores[i] >= self.min_similarity}
+        chosen.update(i for i, column_words in enumerate(self._column_words) if column_words & words)
+        selected = {}
+        for i in sorted(chosen):
+            table, column = self.columns[i]
+            selected.setdefault(table, set()).add(column)
+        for table, table_words in self._table_words.items():
+            if table_words & words:
+                selected.setdefault(table, set())
+
+        linked = {}
+        for name in selected:
+            table = self.tables[name]
+            wanted = selected[name] | self._key_columns(table, selected)
+            linked[name] = [column.name for column in table.columns if column.name in wanted]
+        return linked
+
+    def render(self, linked):
+        """CREATE TABLE statements and sample rows in the same layout SQLDatabase uses, restricted to `linked`"""
+        blocks = []
+        for name, columns in linked.items():
+            table = self.tables[name]
+            lines = [f"\t{column} {table.columns[column].type}" for column in columns]
+            primary = [column.name for column in table.primary_key.columns if column.name in columns]
+            if primary:
+                lines.append(f"\tPRIMARY KEY ({', '.join(primary)})")
+            for fk in table.foreign_keys:
+                if fk.parent.name in columns and fk.column.table.name in linked:
+                    lines.append(f"\tFOREIGN KEY({fk.parent.name}) REFERENCES {fk.column.table.name} ({fk.column.name})")
+            block = f"CREATE TABLE {name} (\n" + ", \n".join(lines) + "\n)"
+
+            rows = self._samples.get(name)
+            if rows:
+                sample = "\n".join("\t".join(str(row[column])[:100] for column in columns) for row in rows)
+                block += f"\n\n/*\n{len(rows)} rows from {name} table:\n" + "\t".join(columns) + f"\n{sample}\n*/"
+            blocks.append(block)
+        return "\n\n".join(blocks)
+
+    async def atable_info(self, question):
+        """Minimal table_info for `question`; every table if the question links to nothing. Either way
+        SCHEMA_EXCLUDED_COLUMNS never reach the prompt"""
+        linked = await self.alink(question)
+        with self._lock:
+            if linked:
+                self.linked += 1
+            else:
+                self.fallbacks += 1
+        return self.render(linked or self._everything)
+
+    def stats(self):
+        with self._lock:
+            return {"linked": self.linked, "fallbacks": self.fallbacks, "columns": len(self.columns)}
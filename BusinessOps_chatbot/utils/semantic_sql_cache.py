@@ -0,0 +1,199 @@
+import re
+import time
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from config.config import SQL_CACHE_SIMILARITY_THRESHOLD, SQL_CACHE_MAX_SIZE, SQL_CACHE_TTL_SECONDS
+
+
+def normalize_question(question):
+    """Lower-case, collapse whitespace and drop closing punctuation so trivial variants share a key.
+    Nothing else is removed: operators and symbols ("> 5", "C++", "C#") change what is asked"""
+    return " ".join(question.lower().split()).rstrip("?.! ")
+
+
+# Longest entity value, in words, looked for in a question
+_MAX_ENTITY_WORDS = 4
+# Comparison and negation words; "more than 5" and "less than 5" embed almost identically
+_QUALIFIERS = {"more", "less", "greater", "fewer", "above", "below", "over", "under", "least", "most",
+               "before", "after", "not", "no", "without", "except"}
+
+
+def _question_literals(question, entity_values=frozenset()):
+    # Numbers, quoted strings, names and other entities change the meaning of the SQL even when the
+    # embeddings barely move ("more than 5 years" vs "more than 10 years", "in Pune" vs "in Mumbai"),
+    # so a semantic hit must agree on them exactly.
+    numbers = re.findall(r"\d+(?:\.\d+)?", question)
+    quoted = [q.lower() for q in re.findall(r"['\"]([^'\"]+)['\"]", question)]
+    operators = re.findall(r"[<>!=]=?", question)
+    # Words carrying symbols ("c++", "c#") and the bare word they would otherwise collapse into ("c")
+    symbols = [
+        word.lower() for word in re.findall(r"(?<![\w+#])\w+[+#]*", question)
+        if word[-1] in "+#" or (len(word) == 1 and word.lower() not in ("a", "i"))
+    ]
+    qualifiers = [word for word in re.findall(r"[a-z]+", question.lower()) if word in _QUALIFIERS]
+
+    # Capitalized words other than the first of each sentence: proper nouns the database may not list yet
+    capitalized = []
+    for sentence in re.split(r"[.?!\n]+", question):
+        words = re.findall(r"[A-Za-z][\w+#]*", sentence)
+        capitalized += [word.lower() for word in words[1:] if word[0].isupper() and len(word) > 1]
+
+    # Known values from the database, matched case-insensitively on whole words ("new york", "java")
+    entities = []
+    if entity_values:
+        words = [word.rstrip(".") for word in re.findall(r"[\w+#.]+", question.lower())]
+        for size in range(1, _MAX_ENTITY_WORDS + 1):
+            for start in range(len(words) - size + 1):
+                phrase = " ".join(words[start:start + size])
+                if phrase in entity_values:
+                    entities.append(phrase)
+    return frozenset(numbers + quoted + operators + symbols + qualifiers + capitalized + entities)
+
+
+class SemanticSQLCache:
+    """Reuses generated SQL for questions that are near-repeats of one already answered"""
+
+    def __init__(
+        self,
+        embeddings,
+        similarity_threshold=SQL_CACHE_SIMILARITY_THRESHOLD,
+        max_size=SQL_CACHE_MAX_SIZE,
+        ttl_seconds=SQL_CACHE_TTL_SECONDS,
+        schema_fingerprint=None,
+    ):
+        self.embeddings = embeddings
+        self.similarity_threshold = similarity_threshold
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.schema_fingerprint = schema_fingerprint
+
+        # Lower-cased values of SQL_CACHE_ENTITY_COLUMNS, see set_entity_values
+        self.entity_values = frozenset()
+
+        # normalized question -> {"vector", "sql", "literals", "created_at"}, oldest first
+        self._entries = OrderedDict()
+        self._matrix = None
+        self._keys = []
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def set_schema_fingerprint(self, schema_fingerprint):
+        """Drop every entry if the schema the SQL was written against has changed"""
+        with self._lock:
+            if schema_fingerprint != self.schema_fingerprint:
+                self._clear()
+                self.schema_fingerprint = schema_fingerprint
+
+    def set_entity_values(self, values):
+        """Known entity values (cities, skills, names, ...) that two questions must share for a semantic hit.
+        Values under three characters are skipped; codes such as "on" or "be" are mostly ordinary words"""
+        values = frozenset(
+            value.lower() for value in values if value and len(value) >= 3 and len(value.split()) <= _MAX_ENTITY_WORDS
+        )
+        with self._lock:
+            if values != self.entity_values:
+                # Literals of the stored entries were computed against the old values
+                self._clear()
+                self.entity_values = values
+
+    def invalidate(self):
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        self._entries.clear()
+        self._matrix = None
+        self._keys = []
+
+    def _expire(self, now):
+        expired = [k for k, e in self._entries.items() if now - e["created_at"] > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            self._matrix = None
+
+    def _lookup_exact(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None or now - entry["created_at"] > self.ttl_seconds:
+            return None
+        self._entries.move_to_end(key)
+        return entry["sql"]
+
+    def _lookup_similar(self, vector, literals):
+        if not self._entries:
+            return None
+        if self._matrix is None:
+            self._keys = list(self._entries)
+            self._matrix = np.stack([self._entries[k]["vector"] for k in self._keys])
+
+        scores = self._matrix @ vector
+        for idx in np.argsort(-scores):
+            if scores[idx] < self.similarity_threshold:
+                break
+            entry = self._entries[self._keys[idx]]
+            if entry["literals"] == literals:
+                self._entries.move_to_end(self._keys[idx])
+                return entry["sql"]
+        return None
+
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    async def aget_or_generate(self, question, generate):
+        """Return cached SQL for `question`, or await `generate()` and remember its result"""
+        key = normalize_question(question)
+        literals = _question_literals(question, self.entity_values)
+        now = time.monotonic()
+
+        with self._lock:
+            self._expire(now)
+            sql = self._lookup_exact(key, now)
+            if sql is not None:
+                self.hits += 1
+                return sql
+
+        vector = self._unit(await self.embeddings.aembed_query(question))
+
+        with self._lock:
+            sql = self._lookup_similar(vector, literals)
+            if sql is not None:
+                self.hits += 1
+                return sql
+            self.misses += 1
+            fingerprint = self.schema_fingerprint
+
+        sql = await generate()
+
+        with self._lock:
+            # Skip the store if the schema changed while the LLM was writing the query
+            if fingerprint == self.schema_fingerprint:
+                self._store(key, vector, sql, literals, time.monotonic())
+        return sql
+
+    def _store(self, key, vector, sql, literals, now):
+        self._entries[key] = {"vector": vector, "sql": sql, "literals": literals, "created_at": now}
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        self._matrix = None
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,98 @@
+import asyncio
+
+from config.config import SINGLE_FLIGHT_TIMEOUT_SECONDS
+
+
+class _Flight:
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+        self.events = []
+        self.done = False
+        self.error = None
+        self.changed = asyncio.Event()
+
+
+class SingleFlight:
+    """Coalesces identical in-flight work: the first caller for a key runs it, everyone else who asks
+    for the same key while it is running shares that one execution.
+
+    Cancellation-safe: a waiter that is cancelled or times out only detaches itself; the shared
+    work is cancelled when its last waiter is gone.
+    """
+
+    def __init__(self, timeout=SINGLE_FLIGHT_TIMEOUT_SECONDS):
+        self.timeout = timeout
+        self._flights = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    def _join(self, key, start):
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(None)
+            flight.task = asyncio.create_task(start(flight))
+            flight.task.add_done_callback(lambda _, key=key, flight=flight: self._finish(key, flight))
+            self._flights[key] = flight
+            self.executions += 1
+        else:
+            self.coalesced += 1
+        flight.waiters += 1
+        return flight
+
+    def _finish(self, key, flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def _leave(self, flight):
+        flight.waiters -= 1
+        if flight.waiters == 0 and not flight.task.done():
+            flight.task.cancel()
+
+    async def do(self, key, factory):
+        """Result of `await factory()`, shared with every concurrent caller using the same key"""
+        async def start(_):
+            return await factory()
+
+        flight = self._join(key, start)
+        try:
+            return await asyncio.wait_for(asyncio.shield(flight.task), self.timeout)
+        finally:
+            self._leave(flight)
+
+    async def stream(self, key, factory):
+        """Events of the async generator `factory()`, shared with every concurrent subscriber to the same
+        key; late subscribers replay what was already produced, then follow along"""
+        async def start(flight):
+            try:
+                async for event in factory():
+                    flight.events.append(event)
+                    flight.changed.set()
+                    flight.changed = asyncio.Event()
+            except Exception as e:
+                flight.error = e
+            finally:
+                flight.done = True
+                flight.changed.set()
+
+        flight = self._join(key, start)
+        deadline = asyncio.get_running_loop().time() + self.timeout
+        try:
+            position = 0
+            while True:
+                while position < len(flight.events):
+                    yield flight.events[position]
+                    position += 1
+                if flight.done:
+                    # Every subscriber sees the producer's failure, not just the first
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                changed = flight.changed
+                remaining = deadline - asyncio.get_running_loop().time()
+                await asyncio.wait_for(changed.wait(), max(remaining, 0))
+        finally:
+            self._leave(flight)
+
+    def stats(self):
+        return {"in_flight": len(self._flights), "executions": self.executions, "coalesced": self.coalesced}
@@ -0,0 +1,127 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config.config import SQL_EXECUTOR_WORKERS, SQL_STATEMENT_TIMEOUT_SECONDS
+
+# One bounded pool for every chain, so concurrent requests cannot fan out into unbounded threads
+_sql_pool = ThreadPoolExecutor(max_workers=SQL_EXECUTOR_WORKERS, thread_name_prefix="sql")
+
+
+class QueryCancelled(Exception):
+    """Raised inside the worker when the query was cancelled before it started"""
+
+
+class _QueryHandle:
+    """Lets the event loop interrupt a statement that a worker thread is running"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.dbapi_connection = None
+        self.cancelled = False
+
+
+class AsyncSQLExecutor:
+    """Runs generated SQL on a bounded thread pool so slow queries never block the event loop.
+
+    Cancelling the awaiting task (e.g. the client disconnected) interrupts the statement on its
+    connection: sqlite3's `interrupt()`, or `KILL QUERY` for MySQL, instead of letting it run to completion.
+    Every statement also gets a wall-clock limit: a progress handler on SQLite, MAX_EXECUTION_TIME on MySQL.
+    """
+
+    def __init__(self, db, pool=None, timeout=SQL_STATEMENT_TIMEOUT_SECONDS):
+        self.db = db
+        self.engine = db._engine
+        self._pool = pool or _sql_pool
+        self.timeout = timeout
+        # Counters are bumped from the pool's worker threads as well as the event loop
+        self._stats_lock = threading.Lock()
+        self.cancelled = 0
+        self.timed_out = 0
+        self.truncated = 0
+
+    def _count(self, counter):
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _start_timer(self, conn, dbapi_connection):
+        """Arm the statement timeout; returns a callable telling whether it fired"""
+        if not self.timeout:
+            return lambda: False
+        if hasattr(dbapi_connection, "set_progress_handler"):
+            deadline = time.monotonic() + self.timeout
+            fired = []
+
+            def check():
+                if time.monotonic() > deadline:
+                    fired.append(True)
+                    return 1
+                return 0
+
+            dbapi_connection.set_progress_handler(check, 10000)
+            return lambda: bool(fired)
+        if self.engine.dialect.name == "mysql":
+            conn.exec_driver_sql(f"SET SESSION MAX_EXECUTION_TIME = {int(self.timeout * 1000)}")
+        return lambda: False
+
+    def _stop_timer(self, dbapi_connection):
+        if self.timeout and hasattr(dbapi_connection, "set_progress_handler"):
+            dbapi_connection.set_progress_handler(None, 0)
+
+    def _execute(self, sql, handle, max_rows=None):
+        with self.engine.connect() as conn:
+            dbapi_connection = conn.connection.dbapi_connection
+            with handle.lock:
+                if handle.cancelled:
+                    raise QueryCancelled(sql)
+                handle.dbapi_connection = dbapi_connection
+            timer_fired = self._start_timer(conn, dbapi_connection)
+            try:
+                result = conn.exec_driver_sql(sql)
+                if not result.returns_rows:
+                    return [], []
+                if not max_rows:
+                    return list(result.keys()), result.fetchall()
+                # One row past the cap tells a truncated result apart from one that fits exactly
+                rows = result.fetchmany(max_rows + 1)
+                if len(rows) > max_rows:
+                    self._count("truncated")
+                    rows = rows[:max_rows]
+                return list(result.keys()), rows
+            except Exception:
+                if timer_fired():
+                    self._count("timed_out")
+                    raise TimeoutError(f"query exceeded the {self.timeout}s time limit")
+                raise
+            finally:
+                self._stop_timer(dbapi_connection)
+                with handle.lock:
+                    handle.dbapi_connection = None
+                conn.rollback()
+
+    def _interrupt(self, handle):
+        with handle.lock:
+            handle.cancelled = True
+            dbapi_connection = handle.dbapi_connection
+        if dbapi_connection is None:
+            return
+        try:
+            if hasattr(dbapi_connection, "interrupt"):
+                dbapi_connection.interrupt()
+            else:
+                with self.engine.connect() as conn:
+                    conn.exec_driver_sql(f"KILL QUERY {int(dbapi_connection.connection_id)}")
+        except Exception as e:
+            print(f"Could not interrupt query: {e}")
+
+    async def fetch(self, sql, max_rows=None):
+        """(column names, rows) for `sql`, at most `max_rows` of them; raises whatever the driver raises"""
+        handle = _QueryHandle()
+        future = asyncio.get_running_loop().run_in_executor(self._pool, self._execute, sql, handle, max_rows)
+        try:
+            return await future
+        except asyncio.CancelledError:
+            self._count("cancelled")
+            self._interrupt(handle)
+            raise
@@ -0,0 +1,124 @@
+import re
+import time
+import threading
+
+from config.config import SQL_GUARD_MAX_ROWS, SQL_GUARD_MAX_SCAN_ROWS
+from utils.sql_result_cache import normalize_sql
+
+_READ_STATEMENT = re.compile(r"^\s*(select|with)\b", re.IGNORECASE)
+_TABLE_REF = re.compile(r"(?:\bfrom|\bjoin|,)\s+([a-z_][a-z0-9_]*)(?:\s+(?:as\s+)?([a-z_][a-z0-9_]*))?")
+_NOT_AN_ALIAS = {
+    "where", "join", "left", "right", "inner", "outer", "cross", "natural", "on", "using", "group",
+    "order", "limit", "having", "union", "except", "intersect", "window", "as",
+}
+
+
+class QueryRejected(Exception):
+    """The generated SQL is not allowed to run; the message says why"""
+
+
+def has_top_level_limit(normalized_sql):
+    """True if the outermost statement already has a LIMIT (ignores LIMITs inside parentheses)"""
+    depth = 0
+    for token in normalized_sql.split(" "):
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+        elif token == "limit" and depth == 0:
+            return True
+    return False
+
+
+def table_aliases(normalized_sql):
+    """Map every name a table is referred to by (itself and its alias) to the table"""
+    aliases = {}
+    for table, alias in _TABLE_REF.findall(normalized_sql):
+        aliases[table] = table
+        if alias and alias not in _NOT_AN_ALIAS:
+            aliases[alias] = table
+    return aliases
+
+
+class SQLGuard:
+    """Sits between write_query and execute_query: only reads get through, a LIMIT is added when the
+    statement has none, and plans whose unindexed full scans would touch too many rows are rejected.
+    A LIMIT the statement already has may exceed max_rows; callers fetch at most max_rows rows"""
+
+    def __init__(self, executor, max_rows=SQL_GUARD_MAX_ROWS, max_scan_rows=SQL_GUARD_MAX_SCAN_ROWS, row_count_ttl=300):
+        self.executor = executor
+        self.dialect = executor.engine.dialect.name
+        self.max_rows = max_rows
+        self.max_scan_rows = max_scan_rows
+        self.row_count_ttl = row_count_ttl
+        self._row_counts = {}
+        self._lock = threading.Lock()
+        self.limits_added = 0
+        self.rejected = 0
+
+    async def _row_count(self, table):
+        with self._lock:
+            cached = self._row_counts.get(table)
+        if cached and time.monotonic() - cached[1] < self.row_count_ttl:
+            return cached[0]
+        _, rows = await self.executor.fetch(f'SELECT COUNT(*) FROM "{table}"')
+        count = rows[0][0]
+        with self._lock:
+            self._row_counts[table] = (count, time.monotonic())
+        return count
+
+    async def _scanned_rows(self, sql, normalized):
+        """Rows the plan reads without an index, multiplied across nested scans (a Cartesian join multiplies)"""
+        if self.dialect == "sqlite":
+            _, plan = await self.executor.fetch(f"EXPLAIN QUERY PLAN {sql}")
+            aliases = table_aliases(normalized)
+            # Scans under the same parent are nested loops of one join, so their sizes multiply
+            nested = {}
+            for _, parent, _, detail in plan:
+                words = detail.split()
+                # "SCAN p" and "SCAN p USING [COVERING] INDEX ..." read every row; SEARCH, virtual tables and subqueries do not
+                if len(words) < 2 or words[0] != "SCAN" or "VIRTUAL" in words:
+                    continue
+                table = aliases.get(words[1].lower())
+                if table is None:
+                    continue
+                nested[parent] = nested.get(parent, 1) * max(await self._row_count(table), 1)
+            return max(nested.values(), default=0)
+
+        if self.dialect == "mysql":
+            columns, plan = await self.executor.fetch(f"EXPLAIN {sql}")
+            columns = [c.lower() for c in columns]
+            scanned = 1
+            found = False
+            for row in plan:
+                row = dict(zip(columns, row))
+                if row.get("type") == "ALL":
+                    scanned *= max(int(row.get("rows") or 1), 1)
+                    found = True
+            return scanned if found else 0
+
+        return 0
+
+    async def check(self, sql):
+        """The SQL to actually run, or QueryRejected"""
+        sql = sql.strip().rstrip(";")
+        normalized = normalize_sql(sql)
+        if not _READ_STATEMENT.match(normalized):
+            self.rejected += 1
+            raise QueryRejected("only SELECT statements can be run")
+
+        scanned = await self._scanned_rows(sql, normalized)
+        if scanned > self.max_scan_rows:
+            self.rejected += 1
+            raise QueryRejected(
+                f"the query would scan about {scanned} rows without an index (limit {self.max_scan_rows}); "
+                "add a filter on an indexed column"
+            )
+
+        if not has_top_level_limit(normalized):
+            self.limits_added += 1
+            sql = f"{sql}\nLIMIT {self.max_rows}"
+        return sql
+
+    def stats(self):
+        return {"limits_added": self.limits_added, "rejected": self.rejected}
@@ -0,0 +1,236 @@
+import re
+import json
+import time
+import pickle
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+from config.config import SQL_RESULT_CACHE_BACKEND, SQL_RESULT_CACHE_PATH, SQL_RESULT_CACHE_MAX_BYTES, SQL_RESULT_CACHE_TTL_SECONDS
+
+_WRITE_STATEMENT = re.compile(r"^\s*(insert|update|delete|replace|create|alter|drop|truncate)\b", re.IGNORECASE)
+_TOKEN = re.compile(r"""'(?:[^']|'')*'|"[^"]*"|`[^`]*`|\d+(?:\.\d+)?|\w+|--[^\n]*|/\*.*?\*/|\S""", re.DOTALL)
+
+
+def normalize_sql(sql):
+    """Canonical text for a SQL statement: no comments, single spaces, lower-cased keywords and bare
+    identifiers and canonical numbers. String literals and quoted identifiers are kept verbatim, since
+    their case (and, in MySQL's ANSI_QUOTES-less default, a double-quoted string) can change the result"""
+    tokens = []
+    for token in _TOKEN.findall(sql.strip().rstrip(";")):
+        if token.startswith("--") or token.startswith("/*"):
+            continue
+        if token[0] in "'`\"":
+            tokens.append(token)
+        elif token[0].isdigit():
+            number = float(token)
+            tokens.append(str(int(number)) if number.is_integer() else repr(number))
+        else:
+            tokens.append(token.lower())
+    return " ".join(tokens)
+
+
+def tables_in_sql(normalized_sql, known_tables):
+    """Known tables referenced by a normalized statement (bare or quoted)"""
+    words = set(re.findall(r"[a-z_][a-z0-9_]*", re.sub(r"'(?:[^']|'')*'", "''", normalized_sql).lower()))
+    return sorted(words & {t.lower() for t in known_tables})
+
+
+class MemoryResultBackend:
+    """In-process LRU bounded by the pickled size of the results"""
+
+    def __init__(self, max_bytes=SQL_RESULT_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes_held = 0
+        self._entries = OrderedDict()
+        self._versions = {}
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return pickle.loads(entry[0]), entry[1]
+
+    def set(self, key, value, tags):
+        blob = pickle.dumps(value)
+        self.delete(key)
+        self._entries[key] = (blob, tags)
+        self.bytes_held += len(blob)
+        while self.bytes_held > self.max_bytes and self._entries:
+            _, (old_blob, _) = self._entries.popitem(last=False)
+            self.bytes_held -= len(old_blob)
+
+    def delete(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes_held -= len(entry[0])
+
+    def version(self, table):
+        return self._versions.get(table, 0)
+
+    def bump(self, table):
+        self._versions[table] = self._versions.get(table, 0) + 1
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes_held = 0
+
+
+class DiskResultBackend:
+    """SQLite file holding results and table versions, so entries and invalidations survive restarts
+    and are shared by every worker process on the host"""
+
+    def __init__(self, path=SQL_RESULT_CACHE_PATH, max_bytes=SQL_RESULT_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value BLOB, tags TEXT, nbytes INTEGER, last_used REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_last_used ON results(last_used)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS table_versions (name TEXT PRIMARY KEY, version INTEGER)")
+
+    @property
+    def bytes_held(self):
+        return self._conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM results").fetchone()[0]
+
+    def get(self, key):
+        row = self._conn.execute("SELECT value, tags FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self._conn.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+        return pickle.loads(row[0]), json.loads(row[1])
+
+    def set(self, key, value, tags):
+        blob = pickle.dumps(value)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO results (key, value, tags, nbytes, last_used) VALUES (?, ?, ?, ?, ?)",
+            (key, blob, json.dumps(tags), len(blob), time.time()),
+        )
+        overflow = self.bytes_held - self.max_bytes
+        if overflow > 0:
+            # Drop least recently used rows until the overflow is covered
+            self._conn.execute(
+                """DELETE FROM results WHERE key IN (
+                    SELECT key FROM (
+                        SELECT key, nbytes, SUM(nbytes) OVER (ORDER BY last_used, key) AS running FROM results
+                    ) WHERE running - nbytes < ?
+                )""",
+                (overflow,),
+            )
+
+    def delete(self, key):
+        self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+
+    def version(self, table):
+        row = self._conn.execute("SELECT version FROM table_versions WHERE name = ?", (table,)).fetchone()
+        return row[0] if row else 0
+
+    def bump(self, table):
+        self._conn.execute(
+            "INSERT INTO table_versions (name, version) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET version = version + 1",
+            (table,),
+        )
+
+    def clear(self):
+        self._conn.execute("DELETE FROM results")
+
+
+def create_result_backend(kind=SQL_RESULT_CACHE_BACKEND):
+    if kind == "memory":
+        return MemoryResultBackend()
+    if kind == "disk":
+        return DiskResultBackend()
+    raise ValueError(f"Unknown SQL result cache backend: {kind}")
+
+
+class SQLResultCache:
+    """Caches SQL results by normalized statement. Each entry records the version of every table it
+    read, so bumping one table's version invalidates only the entries that depend on it.
+
+    Writes made behind the cache's back are caught two ways: entries older than `ttl` seconds are
+    dropped, and when `data_version` is given (a callable whose value changes whenever the database
+    is written, see sqlite_data_version) entries written under another value are dropped too.
+
+    SQLite's data_version is per database, not per table: any write by another connection invalidates
+    every entry. With it set, per-table versions only add the cases it cannot see (writes made through
+    this cache or reported by invalidate_tables); backends without one, such as MySQL, rely on them.
+    """
+
+    def __init__(self, known_tables, backend=None, namespace="", ttl=SQL_RESULT_CACHE_TTL_SECONDS, data_version=None):
+        self.known_tables = list(known_tables)
+        self.namespace = namespace
+        self.backend = backend or create_result_backend()
+        self.ttl = ttl
+        self.data_version = data_version
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, normalized_sql):
+        # The namespace (db uri) keeps databases sharing one on-disk backend apart
+        return hashlib.sha256(f"{self.namespace}\0{normalized_sql}".encode()).hexdigest()
+
+    def current_data_version(self):
+        return self.data_version() if self.data_version else None
+
+    def get(self, sql):
+        """Return the cached result for `sql`, or None if missing or stale"""
+        normalized = normalize_sql(sql)
+        key = self._key(normalized)
+        data_version = self.current_data_version()
+        with self._lock:
+            entry = self.backend.get(key)
+            if entry is not None:
+                (stored_at, stored_version, value), tags = entry
+                fresh = (
+                    (not self.ttl or time.time() - stored_at < self.ttl)
+                    and stored_version == data_version
+                    and all(self.backend.version(table) == version for table, version in tags.items())
+                )
+                if fresh:
+                    self.hits += 1
+                    return value
+                self.backend.delete(key)
+            self.misses += 1
+            return None
+
+    def put(self, sql, value, data_version=None):
+        """Cache `value` for `sql`. Pass the current_data_version() read before the query ran, so a write
+        that lands while it runs leaves the entry already stale"""
+        if data_version is None:
+            data_version = self.current_data_version()
+        normalized = normalize_sql(sql)
+        tables = tables_in_sql(normalized, self.known_tables)
+        with self._lock:
+            if _WRITE_STATEMENT.match(normalized):
+                # A write through the cache invalidates whatever it touched instead of being cached
+                for table in tables:
+                    self.backend.bump(table)
+                return
+            tags = {table: self.backend.version(table) for table in tables}
+            self.backend.set(self._key(normalized), (time.time(), data_version, value), tags)
+
+    def invalidate_tables(self, *tables):
+        """Call after writing to `tables`; only entries that read them are affected"""
+        with self._lock:
+            for table in tables:
+                self.backend.bump(table.lower())
+
+    def clear(self):
+        with self._lock:
+            self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "bytes_held": self.backend.bytes_held,
+            }
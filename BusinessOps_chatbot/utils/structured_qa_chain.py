@@ -1,20 +1,32 @@
 import os, json, datetime
 import sys
+import hashlib
+import threading
+import sqlalchemy
 from uuid import uuid1
 from operator import itemgetter
 from langchain_community.utilities import SQLDatabase
-from langchain.chains import create_sql_query_chain
 # from langchain_community.tools.sql_database.tool import QuerySQLDataBaseTool
-from langchain_community.tools import QuerySQLDatabaseTool
 from langchain_core.prompts import PromptTemplate
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import RunnablePassthrough, RunnableLambda
 from langchain_core.output_parsers import StrOutputParser
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import asyncio
 from langchain_groq import ChatGroq
-from config.gemini_llm import gemini_flash_llm, gemini_pro_llm, gemini_embeddings
+from config.config import SQLITE_DB_PATH, ANSWER_TEMPLATES_ENABLED, SQL_CACHE_ENTITY_COLUMNS, SQL_CACHE_MAX_ENTITY_VALUES
+from config.gemini_llm import gemini_flash_llm, gemini_pro_llm, gemini_embeddings, local_embeddings
+from dependencies.database import get_sqlite_engine, sqlite_data_version
+from utils.semantic_sql_cache import SemanticSQLCache
+from utils.sql_result_cache import SQLResultCache
+from utils.sql_executor import AsyncSQLExecutor
+from utils.sql_guard import SQLGuard, QueryRejected
+from utils.result_compactor import compact_result, estimate_tokens
+from utils.example_store import SQLExampleStore
+from utils.schema_linker import SchemaLinker
+from utils.answer_templates import render_answer
+from utils.tracing import stage, annotate
 
 # # Initialize Groq LLM
 # llm = ChatGroq(
@@ -26,66 +38,57 @@ from config.gemini_llm import gemini_flash_llm, gemini_pro_llm, gemini_embedding
 #     max_retries=2
 # )
 
-async def get_structured_qa_chain(
-    token: str,
-    connection,
-    table_names: list,          # list of 3 tables to allow
-    query: str,                 # the standalone modified question from the user
-    real_user_question: str,                 # the raw question from the user
-    chat_history: list,         # previous conversation messages 
-    llm,                        # LLM
-    chat_id: str                # chat/session identifier
-):
+# # # Set up the MySQL connection string
+# # mysql_conn_str = (
+# #     f"mysql+mysqlconnector://{connection['user']}:{connection['password']}"
+# #     f"@{connection['host']}/{connection['database']}?charset=utf8mb4&max_allowed_packet=67108864"
+# # )
+# # # Create a database object
+# # db = SQLDatabase.from_uri(mysql_conn_str)
 
-    standalone_question = query
-    
-    # formatted_chat_history = format_chat_history(chat_history, 3) if chat_history else "No previous conversation chat history"
-        
-    # # # Set up the MySQL connection string
-    # # mysql_conn_str = (
-    # #     f"mysql+mysqlconnector://{connection['user']}:{connection['password']}"
-    # #     f"@{connection['host']}/{connection['database']}?charset=utf8mb4&max_allowed_packet=67108864"
-    # # )
-    # # # Create a database object
-    # # db = SQLDatabase.from_uri(mysql_conn_str)
-    
-    # ###############################connect to the DB################################
-    # db_uri = f"mysql+pymysql://"
-    # engine_args = {
-    #     "creator": getconn,
-    #     "connect_args": {
-    #         "max_allowed_packet": 67108864,
-    #     }
-    # }
-    
-    sqlite_db_path = r"C:\Users\aanch\Desktop\BusinessOps_chatbot\database\talent_management.db"
-    # Define SQLite Database
-    db_uri = f"sqlite:///{sqlite_db_path}"
-    db = SQLDatabase.from_uri(db_uri, include_tables= table_names)
+# ###############################connect to the DB################################
+# db_uri = f"mysql+pymysql://"
+# engine_args = {
+#     "creator": getconn,
+#     "connect_args": {
+#         "max_allowed_packet": 67108864,
+#     }
+# }
+
+# Define SQLite Database
+DB_URI = f"sqlite:///{SQLITE_DB_PATH}"
 
-    PROMPT_SUFFIX = """
+# Tables the structured chain is allowed to query
+STRUCTURED_TABLES = ["company", "users", "add_profile", "profile_skill"]
+
+PROMPT_SUFFIX = """
         Only use the following tables:
         {table_info}
         Question: {input}
     """
-    
-    
-    _mysql_prompt = """You are a MySQL expert. Given an input question, first create a syntactically correct MySQL query to run, then look at the results of the query and return the answer to the input question.
-    Unless the user specifies in the question a specific number of examples to obtain, query for at most {top_k} results using the LIMIT clause as per MySQL. You can order the results to return the most informative data in the database.
-    Never query for all columns from a table. You must query only the columns that are needed to answer the question. Wrap each column name in backticks (`) to denote them as delimited identifiers.
+
+
+SQLITE_PROMPT_TEMPLATE = """You are a SQLite expert. Given an input question, first create a syntactically correct SQLite query to run, then look at the results of the query and return the answer to the input question.
+    Unless the user specifies in the question a specific number of examples to obtain, query for at most {top_k} results using the LIMIT clause as per SQLite. You can order the results to return the most informative data in the database.
+    Never query for all columns from a table. You must query only the columns that are needed to answer the question. Wrap each column name in double quotes (") to denote them as delimited identifiers.
    
     **INSTRUCTIONS**:
         Pay attention to use only the column names you can see in the tables below. Be careful to not query for columns that do not exist. Also, pay attention to which column is in which table.
-        Pay attention to use CURDATE() function to get the current date, if the question involves "today". 
-        Use LIKE with '%term%' for partial matches. Always use '%' wildcards on both sides for maximum matching potential.
+        Pay attention to use date('now') to get the current date, if the question involves "today"; shift it with modifiers such as date('now', '+30 day') and compare timestamps with datetime('now', '-30 day'). 
+        To filter by skill, JOIN `profile_skill` and compare the lower-cased skill exactly (s.skill = 'java'); never use LIKE on key_skill.
+        For words inside job_title, availability or professional_summary, use the full-text index: p.id IN (SELECT rowid FROM add_profile_fts WHERE add_profile_fts MATCH 'job_title:consultant*').
+        Use LIKE with '%term%' only for partial matches on other text columns.
         Use appropriate JOIN statements when data needs to be retrieved from multiple tables.
         Use aggregate functions (COUNT, SUM, AVG, MAX, MIN) appropriately for analytical questions.
-        Pay special attention to CASTING when comparing numeric values that might be stored as strings.
+        `experience` and `charge_rate` are free text ("10 years", "$50/hr"). For comparisons, ranges, sorting and aggregates use the numeric, indexed columns `experience_years` and `charge_rate_dollar` instead; never CAST the text columns.
     
     **TABLE RELATIONSHIPS**:
     - The `users` table has a foreign key `company_id` that references `company.id`
     - The `add_profile` table has a foreign key `user_id` that references `users.id`
     - The `add_profile` table has a foreign key `company_id` that references `company.id`
+    - The `profile_skill` table has one row per skill of a profile; `profile_id` references `add_profile.id` and `skill` is lower-case
+    - `add_profile.experience_years` is the years of experience as a number and `add_profile.charge_rate_dollar` the hourly charge rate in dollars as a number
+    - `add_profile_fts` is a full-text index over add_profile (key_skill, job_title, availability, professional_summary); its `rowid` is `add_profile.id`
     
         
     Use the following format:
@@ -101,65 +104,86 @@ async def get_structured_qa_chain(
 
     Just for your understanding, here are some of the few shot examples on the type of queries you should return:
     few shot examples:
-        [
-            {{
-                "input_question": "How many active users are in company with ID 123?",
-                "SQLQuery": "SELECT COUNT(*) FROM users WHERE company_id = 123 AND is_active = 1;"
-            }},
-            {{
-                "input_question": "List all profiles with Java skills in Mumbai location",
-                "SQLQuery": "SELECT profile_name, key_skill, location FROM add_profile WHERE key_skill LIKE '%Java%' AND location = 'Mumbai';"
-            }},
-            {{
-                "input_question": "Show companies expiring their subscription in next 30 days",
-                "SQLQuery": "SELECT company_name, expire_date FROM company WHERE expire_date BETWEEN CURDATE() AND DATE_ADD(CURDATE(), INTERVAL 30 DAY);"
-            }},
-            {{
-                "input_question": "What's the average charge rate in INR for Data Scientists?",
-                "SQLQuery": "SELECT AVG(charge_rate_inr) FROM add_profile WHERE job_title = 'Data Scientist';"
-            }},
-            {{
-                "input_question": "Show me profiles and linkedin_account of users with PHP skills who are available for immediate hiring",
-                "SQLQuery": "SELECT p.profile_name, p.linkedin_account_id, p.key_skill, p.availability FROM add_profile p WHERE p.key_skill LIKE '%PHP%' AND p.availability LIKE '%immediate%'"
-            }},
-            {{
-                "input_question": "What is the average charge rate in INR for profiles that have more than 5 years of experience?",
-                "SQLQuery": "SELECT AVG(charge_rate_inr) FROM add_profile WHERE CAST(experience AS UNSIGNED) > 5;"
-            }},
-            {{
-                "input_question": "Show me the profiles that were added in the last 30 days.",
-                "SQLQuery": "SELECT profile_name, job_title, created_at FROM add_profile WHERE created_at >= CURDATE() - INTERVAL 30 DAY ORDER BY created_at DESC;"
-            }},
-            {{
-                "input_question": "Find profiles with the highest view counts and show their companies and skills",
-                "SQLQuery": "SELECT p.profile_name, c.company_name, p.job_title, p.key_skill, p.view_count FROM add_profile p JOIN company c ON p.company_id = c.id ORDER BY p.view_count DESC"
-            }},
-            {{
-                "input_question": "Which candidates match a JD requiring Python and SQL skills with 5 years of experience?",
-                "SQLQuery": "SELECT profile_name, job_title, experience, key_skill FROM add_profile WHERE key_skill LIKE '%python%' AND key_skill LIKE '%SQL%' AND CAST(experience AS UNSIGNED) >= 5"
-            }},
-            {{
-                "input_question": "Which skills are most common among profiles with high view counts?",
-                "SQLQuery": "SELECT key_skill, COUNT(*) as skill_count, AVG(view_count) as avg_views FROM add_profile WHERE view_count > (SELECT AVG(view_count) FROM add_profile) GROUP BY key_skill ORDER BY skill_count DESC;"
-            }},
-            {{
-                "input_question": "What's the ratio of male to female profiles across different job titles?",
-                "SQLQuery": "SELECT job_title, SUM(CASE WHEN gender = 'Male' THEN 1 ELSE 0 END) as male_count, SUM(CASE WHEN gender = 'Female' THEN 1 ELSE 0 END) as female_count, COUNT(*) as total FROM add_profile GROUP BY job_title HAVING male_count > 0 AND female_count > 0 ORDER BY total DESC;"
-            }},
-        ]
+{few_shot_examples}
 
     """
-    
-    MYSQL_PROMPT_ = PromptTemplate(input_variables=["input", "table_info", "top_k"], template=_mysql_prompt + PROMPT_SUFFIX,)
 
-    # Create a chain to generate a SQL query from the question.
-    write_query = create_sql_query_chain(llm, db, k=25, prompt=MYSQL_PROMPT_)
+# Extra words for the schema linker where a column name alone does not say what users call it
+SCHEMA_DESCRIPTIONS = {
+    "add_profile": "candidate profiles, candidates, consultants, employees",
+    "add_profile.profile_name": "candidate name, person",
+    "add_profile.key_skill": "skills, technologies",
+    "add_profile.experience_years": "years of experience, seniority",
+    "add_profile.charge_rate_dollar": "hourly rate, price, cost, fee per hour, dollars",
+    "add_profile.charge_rate_inr": "rate in rupees, INR",
+    "add_profile.availability": "available, immediate joining, notice",
+    "add_profile.view_count": "views, popularity, most viewed",
+    "add_profile.location": "city, place, based in",
+    "profile_skill": "skills of each profile",
+    "company.company_name": "company name, organisation, employer",
+    "company.expire_date": "subscription expiry, plan expiring",
+    "company.company_turnover": "revenue, turnover",
+    "users.full_name": "user name, person",
+    "users.is_active": "active, inactive users",
+}
 
-    # Create a tool to execute the generated SQL query.
-    execute_query = QuerySQLDatabaseTool(db=db)
+# Seed question -> SQL pairs; each prompt only carries the few most similar to the question (see SQLExampleStore)
+FEW_SHOT_EXAMPLES = [
+    {
+        "input_question": "How many active users are in company with ID 123?",
+        "SQLQuery": "SELECT COUNT(*) FROM users WHERE company_id = 123 AND is_active = 1;",
+    },
+    {
+        "input_question": "List all profiles with Java skills in Mumbai location",
+        "SQLQuery": "SELECT p.profile_name, p.key_skill, p.location FROM add_profile p JOIN profile_skill s ON s.profile_id = p.id WHERE s.skill = 'java' AND p.location = 'Mumbai';",
+    },
+    {
+        "input_question": "Show companies expiring their subscription in next 30 days",
+        "SQLQuery": "SELECT company_name, expire_date FROM company WHERE expire_date BETWEEN date('now') AND date('now', '+30 day');",
+    },
+    {
+        "input_question": "What's the average charge rate in INR for Data Scientists?",
+        "SQLQuery": "SELECT AVG(charge_rate_inr) FROM add_profile WHERE job_title = 'Data Scientist';",
+    },
+    {
+        "input_question": "Show me profiles and linkedin_account of users with PHP skills who are available for immediate hiring",
+        "SQLQuery": "SELECT p.profile_name, p.linkedin_account_id, p.key_skill, p.availability FROM add_profile p JOIN profile_skill s ON s.profile_id = p.id WHERE s.skill = 'php' AND p.id IN (SELECT rowid FROM add_profile_fts WHERE add_profile_fts MATCH 'availability:immediate*')",
+    },
+    {
+        "input_question": "What is the average charge rate in INR for profiles that have more than 5 years of experience?",
+        "SQLQuery": "SELECT AVG(charge_rate_inr) FROM add_profile WHERE experience_years > 5;",
+    },
+    {
+        "input_question": "Who charges between 50 and 60 dollars an hour?",
+        "SQLQuery": "SELECT profile_name, job_title, charge_rate FROM add_profile WHERE charge_rate_dollar BETWEEN 50 AND 60 ORDER BY charge_rate_dollar;",
+    },
+    {
+        "input_question": "Show me the profiles that were added in the last 30 days.",
+        "SQLQuery": "SELECT profile_name, job_title, created_at FROM add_profile WHERE created_at >= datetime('now', '-30 day') ORDER BY created_at DESC;",
+    },
+    {
+        "input_question": "Find profiles with the highest view counts and show their companies and skills",
+        "SQLQuery": "SELECT p.profile_name, c.company_name, p.job_title, p.key_skill, p.view_count FROM add_profile p JOIN company c ON p.company_id = c.id ORDER BY p.view_count DESC",
+    },
+    {
+        "input_question": "Which candidates match a JD requiring Python and SQL skills with 5 years of experience?",
+        "SQLQuery": "SELECT profile_name, job_title, experience, key_skill FROM add_profile WHERE id IN (SELECT profile_id FROM profile_skill WHERE skill IN ('python', 'sql') GROUP BY profile_id HAVING COUNT(*) = 2) AND experience_years >= 5",
+    },
+    {
+        "input_question": "List the consultants with their locations",
+        "SQLQuery": "SELECT p.profile_name, p.job_title, p.location FROM add_profile p WHERE p.id IN (SELECT rowid FROM add_profile_fts WHERE add_profile_fts MATCH 'job_title:consultant*');",
+    },
+    {
+        "input_question": "Which skills are most common among profiles with high view counts?",
+        "SQLQuery": "SELECT s.skill, COUNT(*) as skill_count, AVG(p.view_count) as avg_views FROM profile_skill s JOIN add_profile p ON p.id = s.profile_id WHERE p.view_count > (SELECT AVG(view_count) FROM add_profile) GROUP BY s.skill ORDER BY skill_count DESC;",
+    },
+    {
+        "input_question": "What's the ratio of male to female profiles across different job titles?",
+        "SQLQuery": "SELECT job_title, SUM(CASE WHEN gender = 'Male' THEN 1 ELSE 0 END) as male_count, SUM(CASE WHEN gender = 'Female' THEN 1 ELSE 0 END) as female_count, COUNT(*) as total FROM add_profile GROUP BY job_title HAVING male_count > 0 AND female_count > 0 ORDER BY total DESC;",
+    },
+]
 
-    # Create a prompt to transform the SQL query result into a final human-readable answer.    
-    answer_prompt = PromptTemplate.from_template(
+ANSWER_PROMPT = PromptTemplate.from_template(
         """You are an helpful assistant.
         Given the following user question, corresponding SQL query, and SQL result, answer the user question.
         Maintain context from previous conversations to ensure coherent and relevant responses. ONLY consider Chat History into context if you think it is needed for better understanding before answering. Do not mention database table name in the final answer
@@ -179,38 +203,376 @@ async def get_structured_qa_chain(
     
     Accumulate the complete perfect answer for the asked question and then You must strictly give your final response answer in f'{language}' language.
     """
-    )
+)
 
-    answer = answer_prompt | llm | StrOutputParser()
+SQLITE_PROMPT_ = PromptTemplate(input_variables=["input", "table_info", "top_k", "few_shot_examples"], template=SQLITE_PROMPT_TEMPLATE + PROMPT_SUFFIX,)
 
-    # Combine the SQL query generation, execution, and answer generation into one chain.                
-    structured_qa_chain = (
-        RunnablePassthrough.assign(query=write_query)
-        .assign(result=itemgetter("query") | execute_query)
-        | {'question':itemgetter("question"), 'language':itemgetter("language"), 'chat_history':itemgetter("chat_history"), 'output':answer, 'query':itemgetter("query")})
+_example_store = None
+_example_store_lock = threading.Lock()
 
-    chain_input = {"question": standalone_question, "language": "ENGLISH", "chat_history": "No previous conversation chat history"}
 
+def get_example_store():
+    """The process-wide few-shot example store, seeded from FEW_SHOT_EXAMPLES on first use"""
+    global _example_store
+    with _example_store_lock:
+        if _example_store is None:
+            _example_store = SQLExampleStore(local_embeddings, FEW_SHOT_EXAMPLES)
+        return _example_store
+
+
+def record_verified_example(question, sql):
+    """Add a question/SQL pair confirmed to be correct, so similar questions get it as an example"""
+    return get_example_store().add(question, sql)
+
+
+class CachedSQLDatabase(SQLDatabase):
+    """SQLDatabase that renders `table_info` (DDL + sample rows) once and reuses it until the schema is refreshed"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._table_info_cache = {}
+        self._table_info_lock = threading.Lock()
+
+    def get_table_info(self, table_names=None):
+        key = tuple(sorted(table_names)) if table_names else None
+        with self._table_info_lock:
+            if key not in self._table_info_cache:
+                self._table_info_cache[key] = super().get_table_info(table_names)
+            return self._table_info_cache[key]
+
+    def schema_fingerprint(self):
+        """Hash of the reflected tables and column types; changes only when the DDL does"""
+        digest = hashlib.sha256()
+        for table in self._metadata.sorted_tables:
+            digest.update(table.name.encode())
+            for column in table.columns:
+                digest.update(f"{column.name}:{column.type}".encode())
+        return digest.hexdigest()
+
+    def distinct_values(self, columns, limit=SQL_CACHE_MAX_ENTITY_VALUES):
+        """Distinct non-empty text values of `columns` ("table.column"), skipping columns this database lacks"""
+        tables = {table.name: table for table in self._metadata.sorted_tables}
+        values = set()
+        with self._engine.connect() as conn:
+            for name in columns:
+                table_name, column_name = name.split(".")
+                table = tables.get(table_name)
+                if table is None or column_name not in table.columns or len(values) >= limit:
+                    continue
+                column = table.columns[column_name]
+                query = sqlalchemy.select(column).where(column.isnot(None)).distinct().limit(limit - len(values))
+                values.update(str(value).strip() for (value,) in conn.execute(query) if str(value).strip())
+        return values
+
+
+def open_sql_database(db_uri, table_names):
+    """SQLite files are opened through the shared read-only pool, so generated SQL can never write"""
+    if db_uri.startswith("sqlite:///"):
+        engine = get_sqlite_engine(db_uri[len("sqlite:///"):])
+        return CachedSQLDatabase(engine, include_tables=table_names)
+    return CachedSQLDatabase.from_uri(db_uri, include_tables=table_names)
+
+
+class StructuredChain:
+    """The long-lived pieces of the structured QA chain for one (db uri, table set, llm)"""
+
+    def __init__(self, db_uri, table_names, llm, sql_cache=None, result_cache=None, example_store=None):
+        self.db_uri = db_uri
+        self.table_names = list(table_names)
+        self.llm = llm
+        self.example_store = example_store or get_example_store()
+        self.sql_calls = 0
+        self.prompt_tokens = 0
+        self.template_answers = 0
+        self.llm_answers = 0
+
+        # Reflect the schema up front so requests never pay for it
+        self.db = open_sql_database(db_uri, self.table_names)
+
+        # Near-repeat questions reuse previously generated SQL; entries die with the schema they were written for
+        self.sql_cache = sql_cache or SemanticSQLCache(gemini_embeddings)
+        self.sql_cache.set_schema_fingerprint(self.db.schema_fingerprint())
+        try:
+            self.sql_cache.set_entity_values(self.db.distinct_values(SQL_CACHE_ENTITY_COLUMNS))
+        except Exception as e:
+            # Numbers, quotes and capitalized words are still compared
+            print(f"Could not load entity values for the SQL cache: {e}")
+
+        # Only the tables and columns a question needs go into its prompt
+        self.schema_linker = SchemaLinker(self.db, local_embeddings, SCHEMA_DESCRIPTIONS)
+
+        # Generate a SQL query from the assembled prompt.
+        self.write_query = llm.bind(stop=["\nSQLResult:"]) | StrOutputParser()
+
+        # Execute the generated SQL on a bounded worker pool; cancelling the request interrupts the query.
+        self.execute_query = AsyncSQLExecutor(self.db)
+
+        # Checks the plan of every generated query before it runs and caps its row count
+        self.guard = SQLGuard(self.execute_query)
+
+        # Identical SQL is answered from the versioned result cache until one of its tables is written.
+        # On SQLite any commit to the file invalidates it; other databases rely on the entry TTL.
+        self.result_cache = result_cache or SQLResultCache(
+            self.db.get_usable_table_names(), namespace=db_uri,
+            data_version=sqlite_data_version(db_uri[len("sqlite:///"):]) if db_uri.startswith("sqlite:///") else None,
+        )
+
+        # Transform the SQL query result into a final human-readable answer.
+        self.answer = ANSWER_PROMPT | llm | StrOutputParser()
+
+        # Combine the SQL query generation, execution, and answer generation into one chain.
+        # The answer prompt gets a token-budgeted rendering of the rows; the caller gets all of them.
+        self.chain = (
+            RunnablePassthrough.assign(query=RunnableLambda(self.aquery_or_write))
+            .assign(sql_result=itemgetter("query") | RunnableLambda(self.aexecute_query))
+            .assign(result=itemgetter("sql_result") | RunnableLambda(compact_result))
+            | {'question':itemgetter("question"), 'language':itemgetter("language"), 'chat_history':itemgetter("chat_history"), 'output':RunnableLambda(self.aanswer), 'query':itemgetter("query"), 'sql_result':itemgetter("sql_result")})
+
+    async def aquery_or_write(self, inputs):
+        # SQL written ahead of time (speculatively, while routing) is used as is
+        return inputs.get("query") or await self.awrite_query(inputs)
+
+    async def awrite_query(self, inputs):
+        """Generate SQL for the standalone question, served from the semantic cache when possible"""
+        with stage("sql_generation") as span:
+            # Overwritten by _agenerate_sql when the cache misses
+            span.set("cache_hit", True)
+            return await self.sql_cache.aget_or_generate(inputs["question"], lambda: self._agenerate_sql(inputs))
+
+    async def _agenerate_sql(self, inputs):
+        # Only the examples and schema closest to this question go into the prompt
+        question = inputs["question"]
+        examples, table_info = await asyncio.gather(
+            self.example_store.aselect(question), self.schema_linker.atable_info(question)
+        )
+        prompt = SQLITE_PROMPT_.format(
+            input=question + "\nSQLQuery: ", table_info=table_info, top_k=25, few_shot_examples=json.dumps(examples, indent=4)
+        )
+        tokens = estimate_tokens(prompt)
+        self.sql_calls += 1
+        self.prompt_tokens += tokens
+        # Callers that may throw the SQL away pass a "usage" dict to learn what it cost
+        usage = inputs.get("usage")
+        if usage is not None:
+            usage["prompt_tokens"] = tokens
+        sql = (await self.write_query.ainvoke(prompt)).strip()
+        if usage is not None:
+            usage["completion_tokens"] = estimate_tokens(sql)
+        annotate(cache_hit=False, prompt_tokens=tokens, completion_tokens=estimate_tokens(sql), examples=len(examples))
+        return sql
+
+    def template_answer(self, inputs):
+        """Deterministic markdown answer when the result is simple and no chat history or translation is involved"""
+        if not ANSWER_TEMPLATES_ENABLED or inputs.get("language", "ENGLISH").upper() != "ENGLISH":
+            return None
+        if inputs.get("chat_history") not in (None, "", [], "No previous conversation chat history"):
+            return None
+        answer = render_answer(inputs["sql_result"])
+        if answer is not None:
+            self.template_answers += 1
+        return answer
+
+    async def aanswer(self, inputs):
+        with stage("answer_generation") as span:
+            answer = self.template_answer(inputs)
+            span.set("template", answer is not None)
+            if answer is not None:
+                return answer
+            self.llm_answers += 1
+            answer = await self.answer.ainvoke(inputs)
+            span.set("prompt_tokens", estimate_tokens(ANSWER_PROMPT.template) + estimate_tokens(str(inputs.get("result", ""))))
+            span.set("completion_tokens", estimate_tokens(answer))
+            return answer
+
+    def answer_stats(self):
+        answered = self.template_answers + self.llm_answers
+        return {
+            "template_answers": self.template_answers,
+            "llm_answers": self.llm_answers,
+            "bypass_rate": self.template_answers / answered if answered else 0.0,
+        }
+
+    def stats(self):
+        """Cache hit rates, answer-template use, guard rejections and SQL generation cost"""
+        return {
+            "sql_calls": self.sql_calls,
+            "prompt_tokens": self.prompt_tokens,
+            "sql_cache": self.sql_cache.stats(),
+            "result_cache": self.result_cache.stats(),
+            "answers": self.answer_stats(),
+            "guard": self.guard.stats(),
+            "executor": {
+                "cancelled": self.execute_query.cancelled,
+                "timed_out": self.execute_query.timed_out,
+                "truncated": self.execute_query.truncated,
+            },
+            "schema_linker": self.schema_linker.stats(),
+        }
+
+    async def aexecute_query(self, sql):
+        """Run the generated SQL and return {"columns", "rows"} (or {"error"}), served from the result
+        cache when the tables it reads are unchanged. Every query passes the guard first, cached or not"""
+        with stage("sql_execution") as span:
+            try:
+                guarded_sql = await self.guard.check(sql)
+            except QueryRejected as e:
+                span.set("error", "rejected")
+                return {"error": f"Query rejected: {e}"}
+            except Exception as e:
+                span.set("error", type(e).__name__)
+                return {"error": str(e)}
+            data_version = self.result_cache.current_data_version()
+            result = self.result_cache.get(guarded_sql)
+            span.set("cache_hit", result is not None)
+            if result is None:
+                try:
+                    # The guard leaves an existing LIMIT alone, so the row cap is enforced on the fetch
+                    columns, rows = await self.execute_query.fetch(guarded_sql, max_rows=self.guard.max_rows)
+                except Exception as e:
+                    # Failures are reported to the answer step but never cached
+                    span.set("error", type(e).__name__)
+                    return {"error": str(e)}
+                result = {"columns": columns, "rows": [list(row) for row in rows]}
+                self.result_cache.put(guarded_sql, result, data_version)
+            span.set("rows", len(result["rows"]))
+            return result
+
+
+class StructuredChainRegistry:
+    """Process-wide registry of structured chains keyed by (db uri, table set, llm)"""
+
+    def __init__(self):
+        self._chains = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(db_uri, table_names, llm):
+        # LLM clients are not hashable; the registry keeps a reference so the id stays valid
+        return (db_uri, tuple(sorted(table_names)), id(llm))
+
+    def get(self, db_uri, table_names, llm):
+        """Return the chain for this key, building it on first use"""
+        key = self._key(db_uri, table_names, llm)
+        chain = self._chains.get(key)
+        if chain is None:
+            with self._lock:
+                chain = self._chains.get(key)
+                if chain is None:
+                    chain = StructuredChain(db_uri, table_names, llm)
+                    self._chains[key] = chain
+        return chain
+
+    def refresh_schema(self, db_uri=None):
+        """Re-reflect the schema after DDL changes. Rebuilds every chain for `db_uri` (or all chains)"""
+        with self._lock:
+            for key, chain in list(self._chains.items()):
+                if db_uri is None or chain.db_uri == db_uri:
+                    chain.result_cache.invalidate_tables(*chain.table_names)
+                    self._chains[key] = StructuredChain(
+                        chain.db_uri, chain.table_names, chain.llm,
+                        sql_cache=chain.sql_cache, result_cache=chain.result_cache, example_store=chain.example_store,
+                    )
+
+    def invalidate_tables(self, db_uri, *tables):
+        with self._lock:
+            for chain in self._chains.values():
+                if chain.db_uri == db_uri:
+                    chain.result_cache.invalidate_tables(*tables)
+
+    def clear(self):
+        with self._lock:
+            self._chains.clear()
+
+
+structured_chain_registry = StructuredChainRegistry()
+
+
+def get_structured_chain(table_names=STRUCTURED_TABLES, llm=gemini_pro_llm, db_uri=DB_URI):
+    """Fetch the shared structured chain, building it once per process"""
+    return structured_chain_registry.get(db_uri, table_names, llm)
+
+
+def refresh_structured_schema(db_uri=None):
+    """Call after DDL changes so the chains pick up the new schema"""
+    structured_chain_registry.refresh_schema(db_uri)
+
+
+def invalidate_structured_results(*tables, db_uri=DB_URI):
+    """Call after writing to `tables` so cached SQL results that read them are dropped"""
+    structured_chain_registry.invalidate_tables(db_uri, *tables)
+
+
+async def get_structured_qa_chain(
+    token: str,
+    connection,
+    table_names: list,          # list of 3 tables to allow
+    query: str,                 # the standalone modified question from the user
+    real_user_question: str,                 # the raw question from the user
+    chat_history: list,         # previous conversation messages 
+    llm,                        # LLM
+    chat_id: str,               # chat/session identifier
+    sql_query: str = None       # SQL already written for this question, if any
+):
 
+    standalone_question = query
     
-    response = await structured_qa_chain.ainvoke(chain_input)
+    # formatted_chat_history = format_chat_history(chat_history, 3) if chat_history else "No previous conversation chat history"
+
+    structured_qa_chain = get_structured_chain(table_names, llm).chain
+
+    chain_input = {"question": standalone_question, "language": "ENGLISH", "chat_history": "No previous conversation chat history"}
+    if sql_query:
+        chain_input["query"] = sql_query
+
+
     
-    # yield json.dumps({"type": "chatId", "content": chat_id})
-
-    # ai_text = ""
-    # output_text = response['output']
-    # stream_size = 4
-    # for i in range(0, len(output_text), stream_size):
-    #     chunk = output_text[i: i+stream_size]
-    #     ai_text += chunk
-    #     yield json.dumps({"type": "text", "content": chunk})   
-    # print(f"final answer: {ai_text}")
+    with stage("structured_chain", sql_prewritten=bool(sql_query)):
+        response = await structured_qa_chain.ainvoke(chain_input)
     
-    # sql_query = response['query']
-    # yield json.dumps({"type": "sqlquery", "content": sql_query})   
+    return response
+
 
-    # msg_id = str(uuid1())
-    # yield json.dumps({"type": "messageId", "content": msg_id})
+async def stream_structured_qa_chain(
+    token: str,
+    connection,
+    table_names: list,          # list of 3 tables to allow
+    query: str,                 # the standalone modified question from the user
+    real_user_question: str,                 # the raw question from the user
+    chat_history: list,         # previous conversation messages 
+    llm,                        # LLM
+    chat_id: str                # chat/session identifier
+):
+    """Streaming variant of get_structured_qa_chain. Yields JSON events: chatId, sqlquery as soon as the
+    query is written, the full sqlresult, text chunks as the answer LLM produces them, then messageId"""
+
+    structured_chain = get_structured_chain(table_names, llm)
+
+    chain_input = {"question": query, "language": "ENGLISH", "chat_history": "No previous conversation chat history"}
+
+    yield json.dumps({"type": "chatId", "content": chat_id})
+
+    sql_query = await structured_chain.awrite_query(chain_input)
+    yield json.dumps({"type": "sqlquery", "content": sql_query})
+
+    sql_result = await structured_chain.aexecute_query(sql_query)
+    yield json.dumps({"type": "sqlresult", "content": sql_result}, default=str)
+
+    answer_input = {**chain_input, "query": sql_query, "sql_result": sql_result}
+    with stage("answer_generation", streamed=True) as span:
+        ai_text = structured_chain.template_answer(answer_input)
+        span.set("template", ai_text is not None)
+        if ai_text is not None:
+            yield json.dumps({"type": "text", "content": ai_text})
+        else:
+            structured_chain.llm_answers += 1
+            ai_text = ""
+            async for chunk in structured_chain.answer.astream({**answer_input, "result": compact_result(sql_result)}):
+                ai_text += chunk
+                yield json.dumps({"type": "text", "content": chunk})
+            span.set("completion_tokens", estimate_tokens(ai_text))
+
+    msg_id = str(uuid1())
+    yield json.dumps({"type": "messageId", "content": msg_id})
     
     # ############this will be in MONGODB
     # timestamp = datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
@@ -227,23 +589,21 @@ async def get_structured_qa_chain(
     # connection.execute(sql3, {"last_followup_questions": json.dumps(followup_question), "timestamp": timestamp, "s_no" :chat_id, "user_id": token})
     # connection.commit()
     # connection.close()
-    
-
-    return response
 
 
-async def test_rag_chain(user_query):
+async def test_rag_chain(user_query, sql_query=None):
     """Execute a structured RAG chain query and return the results"""
     try:
         response = await get_structured_qa_chain(
             token="test_user",
             connection="",
-            table_names=["company", "users", "add_profile"],
+            table_names=STRUCTURED_TABLES,
             query=user_query,
             real_user_question=user_query,
             chat_history=[],
             llm=gemini_pro_llm,
-            chat_id="test_chat"
+            chat_id="test_chat",
+            sql_query=sql_query
         )
         
         # When running as a standalone script, print the results
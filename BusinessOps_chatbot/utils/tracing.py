@@ -0,0 +1,205 @@
+import os
+import re
+import time
+import asyncio
+import threading
+import contextvars
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+
+from config.config import TRACE_EXPORT_PATH, TRACE_SAMPLE_RATIO, STAGE_LATENCY_BUCKETS
+
+try:
+    from opentelemetry import trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+except ImportError:
+    # Spans need the OpenTelemetry SDK; the stage histograms behind /metrics work without it
+    trace = None
+    SpanExporter = object
+
+SERVICE_NAME = "businessops-chatbot"
+
+# Set by configure_tracing(); until then stages only feed the histograms and skip OpenTelemetry entirely
+_tracer = None
+_provider = None
+# Innermost stage of the current task/thread, for annotate()
+_current = contextvars.ContextVar("rag_stage", default=None)
+
+
+class StageMetrics:
+    """Latency histogram, outcome counts, cache hits and token totals per stage, rendered in the
+    Prometheus text format"""
+
+    def __init__(self, buckets=STAGE_LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._latency = {}
+        self._outcomes = {}
+        self._cache_hits = {}
+        self._tokens = {}
+
+    def observe(self, stage, seconds, outcome="ok", attributes=None):
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._latency.get(stage)
+            if series is None:
+                series = self._latency[stage] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += seconds
+            series[2] += 1
+            self._outcomes[(stage, outcome)] = self._outcomes.get((stage, outcome), 0) + 1
+            if attributes:
+                if attributes.get("cache_hit") is True:
+                    self._cache_hits[stage] = self._cache_hits.get(stage, 0) + 1
+                for key, value in attributes.items():
+                    if key.endswith("_tokens") and isinstance(value, (int, float)):
+                        kind = key[: -len("_tokens")]
+                        self._tokens[(stage, kind)] = self._tokens.get((stage, kind), 0) + value
+
+    def render(self):
+        lines = [
+            "# HELP rag_stage_duration_seconds Time spent in each stage of the RAG pipeline",
+            "# TYPE rag_stage_duration_seconds histogram",
+        ]
+        with self._lock:
+            for stage, (counts, total, count) in sorted(self._latency.items()):
+                cumulative = 0
+                for bound, bucket in zip(self.buckets, counts):
+                    cumulative += bucket
+                    lines.append(f'rag_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'rag_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {count}')
+                lines.append(f'rag_stage_duration_seconds_sum{{stage="{stage}"}} {total}')
+                lines.append(f'rag_stage_duration_seconds_count{{stage="{stage}"}} {count}')
+
+            lines += ["# HELP rag_stage_total Finished stages by outcome", "# TYPE rag_stage_total counter"]
+            lines += [f'rag_stage_total{{stage="{stage}",outcome="{outcome}"}} {n}' for (stage, outcome), n in sorted(self._outcomes.items())]
+
+            lines += ["# HELP rag_stage_cache_hits_total Stages answered from a cache", "# TYPE rag_stage_cache_hits_total counter"]
+            lines += [f'rag_stage_cache_hits_total{{stage="{stage}"}} {n}' for stage, n in sorted(self._cache_hits.items())]
+
+            lines += ["# HELP rag_llm_tokens_total Estimated LLM tokens by stage", "# TYPE rag_llm_tokens_total counter"]
+            lines += [f'rag_llm_tokens_total{{stage="{stage}",kind="{kind}"}} {n}' for (stage, kind), n in sorted(self._tokens.items())]
+        return "\n".join(lines) + "\n"
+
+
+metrics = StageMetrics()
+
+
+def render_stats(stats, prefix="rag"):
+    """Numeric leaves of a nested stats dict (RAGSystem.stats()) as Prometheus gauges named after their
+    path, e.g. {"router": {"rules": 3}} -> rag_router_rules 3"""
+    values = {}
+
+    def walk(path, value):
+        if isinstance(value, dict):
+            for key, child in value.items():
+                walk(f"{path}_{re.sub(r'[^a-zA-Z0-9_]', '_', str(key))}", child)
+        elif isinstance(value, (bool, int, float)):
+            values[path] = float(value)
+
+    walk(prefix, stats)
+    lines = []
+    for name, value in sorted(values.items()):
+        lines += [f"# TYPE {name} gauge", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
+
+
+class _Stage:
+    __slots__ = ("span", "attributes")
+
+    def __init__(self, span, attributes):
+        self.span = span
+        self.attributes = attributes
+
+    def set(self, key, value):
+        if value is None:
+            return
+        self.attributes[key] = value
+        if self.span is not None:
+            self.span.set_attribute(key, value)
+
+
+@contextmanager
+def stage(name, **attributes):
+    """Time a pipeline stage: feeds the /metrics histogram and, when tracing is configured, records an
+    OpenTelemetry span (nested under the enclosing stage). Yields a handle whose `set(key, value)` adds
+    attributes such as token counts, row counts or cache hits"""
+    attributes = {key: value for key, value in attributes.items() if value is not None}
+    span_context = _tracer.start_as_current_span(name, attributes=attributes) if _tracer else nullcontext()
+    started = time.perf_counter()
+    outcome = "ok"
+    with span_context as span:
+        record = _Stage(span, attributes)
+        token = _current.set(record)
+        try:
+            yield record
+        except (asyncio.CancelledError, GeneratorExit):
+            outcome = "cancelled"
+            raise
+        except BaseException:
+            outcome = "error"
+            raise
+        finally:
+            _current.reset(token)
+            metrics.observe(name, time.perf_counter() - started, outcome, record.attributes)
+
+
+def annotate(**attributes):
+    """Add attributes to the innermost stage running in this context; a no-op outside any stage"""
+    record = _current.get()
+    if record is not None:
+        for key, value in attributes.items():
+            record.set(key, value)
+
+
+class FileSpanExporter(SpanExporter):
+    """Appends finished spans to a local file, one OpenTelemetry JSON span per line"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def export(self, spans):
+        lines = "".join(span.to_json(indent=None) + "\n" for span in spans)
+        with self._lock:
+            self._file.write(lines)
+            self._file.flush()
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        with self._lock:
+            self._file.close()
+
+    def force_flush(self, timeout_millis=30000):
+        return True
+
+
+def configure_tracing(export_path=TRACE_EXPORT_PATH, sample_ratio=TRACE_SAMPLE_RATIO):
+    """Export spans to `export_path` ("{pid}" becomes the process id, so workers do not share a file).
+    Spans are batched and written off the request path; returns False when tracing stays off"""
+    global _provider, _tracer
+    if trace is None or not export_path or _provider is not None:
+        return False
+    path = export_path.format(pid=os.getpid())
+    _provider = TracerProvider(
+        resource=Resource.create({"service.name": SERVICE_NAME}),
+        sampler=ParentBased(TraceIdRatioBased(sample_ratio)),
+    )
+    _provider.add_span_processor(BatchSpanProcessor(FileSpanExporter(path)))
+    trace.set_tracer_provider(_provider)
+    _tracer = _provider.get_tracer(SERVICE_NAME)
+    print(f"Tracing spans to {path} (sample ratio {sample_ratio})")
+    return True
+
+
+def shutdown_tracing():
+    """Flush and close the span exporter"""
+    global _provider, _tracer
+    if _provider is not None:
+        _tracer = None
+        _provider.shutdown()
+        _provider = None
@@ -1,17 +1,29 @@
 # Import necessary libraries
 import pandas as pd
 import os
+import sys
+import shutil
+import sqlite3
+import hashlib
+from itertools import islice
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_community.vectorstores import Chroma
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough
-from langchain.embeddings import HuggingFaceEmbeddings
-from langchain_groq import ChatGroq
 import json
 import re
 import PyPDF2  # For PDF text extraction
 import mysql.connector  # For MySQL connection
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.gemini_llm import local_embeddings, groq_matcher_llm
+from utils.result_compactor import estimate_tokens
+from utils.tracing import stage
+from config.config import PROFILE_SOURCE, SQLITE_DB_PATH, PROFILE_LOAD_CHUNK_SIZE
+from utils.ingestion_pipeline import run_embedding_pipeline
+from utils.hybrid_retriever import HybridCandidateRetriever, BM25Index, candidate_index_metadata
+
 # Set your Grok API key
 os.environ["GROQ_API_KEY"] = "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"
 
@@ -27,23 +39,19 @@ def extract_text_from_pdf(file_path):
     except Exception as e:
         raise Exception(f"Error reading PDF file: {str(e)}")
 
-# Step 1: Load and preprocess data from MySQL
-def load_and_preprocess_data_from_db():
-    # MySQL database configuration
-    db_config = {
-        'host': 'localhost',          # Replace with your MySQL host
-        'user': 'your_username',      # Replace with your MySQL username
-        'password': 'your_password',  # Replace with your MySQL password
-        'database': 'your_database'   # Replace with your database name
-    }
-
-    try:
-        # Establish connection
-        connection = mysql.connector.connect(**db_config)
-        cursor = connection.cursor(dictionary=True)  # Return results as dictionaries
+# MySQL database configuration
+db_config = {
+    'host': 'localhost',          # Replace with your MySQL host
+    'user': 'your_username',      # Replace with your MySQL username
+    'password': 'your_password',  # Replace with your MySQL password
+    'database': 'your_database'   # Replace with your database name
+}
 
-        # Query to fetch candidate data (adjust table/column names as per your DB schema)
-        query = """
+# Candidate rows as the loader needs them, per source. `{since}` is filled in for incremental loads.
+# Both queries page by primary key (keyset pagination), so every chunk is an index range scan and
+# no cursor is held open between chunks.
+PROFILE_QUERIES = {
+    "mysql": """
         SELECT 
             id, 
             profile_name, 
@@ -57,32 +65,96 @@ def load_and_preprocess_data_from_db():
             charge_rate, 
             availability, 
             location, 
-            projects 
+            projects,
+            updated_at
         FROM candidates
-        """
-        cursor.execute(query)
-        rows = cursor.fetchall()
+        WHERE id > %s{since}
+        ORDER BY id
+        LIMIT %s
+        """,
+    "sqlite": """
+        SELECT 
+            p.id, 
+            p.profile_name, 
+            p.job_title, 
+            p.experience, 
+            u.department, 
+            p.professional_summary, 
+            p.key_skill, 
+            p.education, 
+            p.certificate, 
+            p.charge_rate, 
+            p.availability, 
+            p.location, 
+            p.projects,
+            p.updated_at
+        FROM add_profile p
+        LEFT JOIN users u ON u.id = p.user_id
+        WHERE p.id > ?{since}
+        ORDER BY p.id
+        LIMIT ?
+        """,
+}
+PROFILE_ID_QUERIES = {
+    "mysql": "SELECT id FROM candidates WHERE id > %s ORDER BY id LIMIT %s",
+    "sqlite": "SELECT id FROM add_profile WHERE id > ? ORDER BY id LIMIT ?",
+}
+PROFILE_WATERMARK_QUERIES = {
+    "mysql": "SELECT MAX(updated_at) AS watermark FROM candidates",
+    "sqlite": "SELECT MAX(updated_at) AS watermark FROM add_profile",
+}
 
-        profiles = []
+def _connect_profile_source(source):
+    """Open a connection to the profile source; rows come back as dictionaries"""
+    if source == "mysql":
+        connection = mysql.connector.connect(**db_config)
+        return connection, connection.cursor(dictionary=True)
+    if source == "sqlite":
+        connection = sqlite3.connect(SQLITE_DB_PATH)
+        connection.row_factory = sqlite3.Row
+        return connection, connection.cursor()
+    raise ValueError(f"Unknown profile source: {source}")
 
-        for row in rows:
-            skills = row['key_skill'].split(',') if row['key_skill'] else []
-            skills = [skill.strip() for skill in skills]
-            
-            projects = []
-            if row['projects']:
-                try:
-                    project_str = row['projects']
-                    matches = re.findall(r'projects_title : (.*?) \| projects:(.*?)"', project_str)
-                    for match in matches:
-                        projects.append({
-                            "title": match[0].strip(),
-                            "description": match[1].strip()
-                        })
-                except:
-                    projects = [{"title": "Project", "description": str(row['projects'])}]
-            
-            profile_text = f"""
+def _iter_keyset(query, params, source, chunk_size):
+    """Yield rows chunk by chunk, resuming each chunk after the last id seen"""
+    try:
+        connection, cursor = _connect_profile_source(source)
+        last_id = 0
+        while True:
+            cursor.execute(query, (last_id, *params, chunk_size))
+            rows = cursor.fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield dict(row)
+            last_id = rows[-1]["id"]
+    except (mysql.connector.Error, sqlite3.Error) as err:
+        raise Exception(f"Database error: {str(err)}")
+    finally:
+        if 'cursor' in locals():
+            cursor.close()
+        if 'connection' in locals():
+            connection.close()
+
+def preprocess_profile(row):
+    """Turn one candidate row into the text that is embedded plus its metadata"""
+    skills = row['key_skill'].split(',') if row['key_skill'] else []
+    skills = [skill.strip() for skill in skills]
+    
+    projects = []
+    if row['projects']:
+        try:
+            project_str = row['projects']
+            matches = re.findall(r'projects_title : (.*?) \| projects:(.*?)"', project_str)
+            for match in matches:
+                projects.append({
+                    "title": match[0].strip(),
+                    "description": match[1].strip()
+                })
+        except:
+            projects = [{"title": "Project", "description": str(row['projects'])}]
+    
+    profile_text = f"""
             CANDIDATE ID: {row['id']}
             NAME: {row['profile_name']}
             JOB TITLE: {row['job_title']}
@@ -96,27 +168,60 @@ def load_and_preprocess_data_from_db():
             AVAILABILITY: {row['availability'] if row['availability'] else 'Not specified'}
             LOCATION: {row['location'] if row['location'] else 'Not specified'}
             """
-            
-            if projects:
-                profile_text += "\nPROJECTS:\n"
-                for project in projects:
-                    profile_text += f"- {project['title']}: {project['description']}\n"
-            
-            profiles.append({
-                "id": row['id'],
-                "name": row['profile_name'],
-                "content": profile_text,
-                "metadata": {
-                    "job_title": row['job_title'],
-                    "experience": row['experience'],
-                    "skills": skills,
-                    "charge_rate": row['charge_rate'] if row['charge_rate'] else 'Not specified',
-                }
-            })
-
-        return profiles
-
-    except mysql.connector.Error as err:
+    
+    if projects:
+        profile_text += "\nPROJECTS:\n"
+        for project in projects:
+            profile_text += f"- {project['title']}: {project['description']}\n"
+    
+    return {
+        "id": row['id'],
+        "name": row['profile_name'],
+        "updated_at": row['updated_at'],
+        "content": profile_text,
+        "index_metadata": candidate_index_metadata(row),
+        "metadata": {
+            "job_title": row['job_title'],
+            "experience": row['experience'],
+            "skills": skills,
+            "charge_rate": row['charge_rate'] if row['charge_rate'] else 'Not specified',
+        }
+    }
+
+# Step 1: Load and preprocess data from the database
+def load_and_preprocess_data_from_db(updated_since=None, source=None, chunk_size=None):
+    """Lazily yield preprocessed candidate profiles, optionally only those updated at or after `updated_since`.
+    Rows are read PROFILE_LOAD_CHUNK_SIZE at a time, so memory stays flat regardless of table size."""
+    source = source or PROFILE_SOURCE
+    query = PROFILE_QUERIES[source]
+    params = ()
+    if updated_since is not None:
+        # >= rather than >: rows written in the same second as the watermark are re-checked by content hash
+        column = "updated_at" if source == "mysql" else "p.updated_at"
+        placeholder = "%s" if source == "mysql" else "?"
+        query = query.format(since=f" AND {column} >= {placeholder}")
+        params = (updated_since,)
+    else:
+        query = query.format(since="")
+
+    for row in _iter_keyset(query, params, source, chunk_size or PROFILE_LOAD_CHUNK_SIZE):
+        yield preprocess_profile(row)
+
+def load_profile_ids_from_db(source=None, chunk_size=None):
+    """Lazily yield every live candidate id, a chunk at a time; cheap enough to run on every sync to detect deletions"""
+    source = source or PROFILE_SOURCE
+    for row in _iter_keyset(PROFILE_ID_QUERIES[source], (), source, chunk_size or PROFILE_LOAD_CHUNK_SIZE):
+        yield row["id"]
+
+def load_profile_watermark(source=None):
+    """Newest updated_at in the profile source, read before a sync scans it. Rows changed while the scan
+    runs get a later updated_at, so the next sync (which re-reads from this value) still sees them"""
+    source = source or PROFILE_SOURCE
+    try:
+        connection, cursor = _connect_profile_source(source)
+        cursor.execute(PROFILE_WATERMARK_QUERIES[source])
+        return dict(cursor.fetchone())["watermark"]
+    except (mysql.connector.Error, sqlite3.Error) as err:
         raise Exception(f"Database error: {str(err)}")
     finally:
         if 'cursor' in locals():
@@ -124,27 +229,120 @@ def load_and_preprocess_data_from_db():
         if 'connection' in locals():
             connection.close()
 
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+class IndexSyncState:
+    """Per-profile content hashes plus the updated_at watermark of the last sync, kept next to the Chroma index"""
+
+    def __init__(self, persist_directory):
+        os.makedirs(persist_directory, exist_ok=True)
+        self.path = os.path.join(persist_directory, "sync_state.db")
+        self.is_new = not os.path.exists(self.path)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS indexed_profiles (id TEXT PRIMARY KEY, content_hash TEXT)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS sync_meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def watermark(self):
+        row = self.conn.execute("SELECT value FROM sync_meta WHERE key = 'watermark'").fetchone()
+        return row[0] if row else None
+
+    def hashes_for(self, ids):
+        """Stored content hashes of `ids` (one chunk of profiles, not the whole index)"""
+        return dict(self.conn.execute(
+            "SELECT id, content_hash FROM indexed_profiles WHERE id IN (SELECT value FROM json_each(?))", (json.dumps(ids),)
+        ))
+
+    def removed_ids(self, live_ids, chunk_size=PROFILE_LOAD_CHUNK_SIZE):
+        """Yield, a chunk at a time, the indexed ids missing from `live_ids`. The live ids are staged in a
+        temporary table on disk, so neither side is ever held in memory as a whole"""
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS live_ids (id TEXT PRIMARY KEY)")
+        with self.conn:
+            self.conn.execute("DELETE FROM live_ids")
+            for chunk in _chunks(live_ids, chunk_size):
+                self.conn.executemany("INSERT OR IGNORE INTO live_ids (id) VALUES (?)", [(str(i),) for i in chunk])
+        cursor = self.conn.execute("SELECT id FROM indexed_profiles WHERE id NOT IN (SELECT id FROM live_ids)")
+        while rows := cursor.fetchmany(chunk_size):
+            yield [row[0] for row in rows]
+
+    def commit(self, upserted, deleted, watermark):
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO indexed_profiles (id, content_hash) VALUES (?, ?)", upserted)
+            self.conn.executemany("DELETE FROM indexed_profiles WHERE id = ?", [(i,) for i in deleted])
+            if watermark is not None:
+                self.conn.execute("INSERT OR REPLACE INTO sync_meta (key, value) VALUES ('watermark', ?)", (str(watermark),))
+
+    def close(self):
+        self.conn.close()
+
+def profile_content_hash(profile):
+    # Covers the stored metadata too, so a change to what the filters see also triggers an upsert
+    payload = profile["content"] + json.dumps(profile["index_metadata"], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
 # Step 2: Create vector embeddings and store in ChromaDB
-def create_vector_store(profiles, persist_directory="candidate_db"):
-    documents = [profile["content"] for profile in profiles]
-    metadatas = [{"id": profile["id"], "name": profile["name"]} for profile in profiles]
-    
-    embedding_function = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-    
-    vector_store = Chroma.from_texts(
-        documents,
-        embedding_function,
-        metadatas=metadatas,
-        persist_directory=persist_directory
-    )
-    
+def sync_vector_store(persist_directory="candidate_db", embedding_function=None):
+    """Bring the persisted Chroma index in line with the candidates table, embedding only new or changed profiles"""
+    embedding_function = embedding_function or local_embeddings
+    state = IndexSyncState(persist_directory)
+
+    if state.is_new and os.path.exists(os.path.join(persist_directory, "chroma.sqlite3")):
+        # Index written before sync tracking existed: it holds duplicate vectors under random ids, start over
+        state.close()
+        shutil.rmtree(persist_directory)
+        state = IndexSyncState(persist_directory)
+
+    vector_store = Chroma(persist_directory=persist_directory, embedding_function=embedding_function)
+
+    try:
+        # Taken before the scan: the newest updated_at seen during it could be newer than a row the
+        # keyset scan had already passed when that row changed, and the next sync would skip it
+        watermark = load_profile_watermark()
+        seen = 0
+
+        def changed_profiles():
+            nonlocal seen
+            # Stored hashes are looked up one chunk of profiles at a time, never for the whole index
+            for chunk in _chunks(load_and_preprocess_data_from_db(updated_since=state.watermark()), PROFILE_LOAD_CHUNK_SIZE):
+                indexed = state.hashes_for([str(profile["id"]) for profile in chunk])
+                for profile in chunk:
+                    seen += 1
+                    profile["content_hash"] = profile_content_hash(profile)
+                    if indexed.get(str(profile["id"])) != profile["content_hash"]:
+                        yield profile
+
+        # Hashes are committed batch by batch, so an interrupted reindex resumes where it stopped
+        stats = run_embedding_pipeline(
+            changed_profiles(),
+            vector_store,
+            embedding_function,
+            on_batch_written=lambda batch: state.commit([(str(p["id"]), p["content_hash"]) for p in batch], [], None),
+        )
+
+        # Only profiles deleted since the last sync are collected here; the cursor is read out before
+        # indexed_profiles is modified
+        removed = 0
+        for chunk in list(state.removed_ids(load_profile_ids_from_db())):
+            vector_store.delete(ids=chunk)
+            state.commit([], chunk, None)
+            removed += len(chunk)
+
+        state.commit([], [], watermark)
+        print(f"Candidate index synced: {stats['profiles']} upserted, {removed} removed, {seen - stats['profiles']} unchanged")
+    finally:
+        state.close()
+
     return vector_store
 
 # Step 3: Define the retriever
 def get_retriever(vector_store):
-    return vector_store.as_retriever(
-        search_type="similarity",
-        search_kwargs={"k": 3}
+    # BM25 over job title/skills/summary fused with vector similarity; filters are pushed into both
+    return HybridCandidateRetriever(
+        vector_store=vector_store,
+        bm25=BM25Index.from_chroma(vector_store),
+        k=3
     )
 
 # Step 4: Create the RAG prompt
@@ -184,7 +382,7 @@ def create_rag_chain():
     """
     
     prompt = ChatPromptTemplate.from_template(template)
-    model = ChatGroq(model="llama3-70b-8192", temperature=0)
+    model = groq_matcher_llm
     
     chain = (
         {"context": lambda x: x["retriever_results"], "job_description": lambda x: x["job_description"]}
@@ -197,32 +395,40 @@ def create_rag_chain():
 
 # Step 5: Create the main function with document upload option
 def create_candidate_matcher():
-    profiles = load_and_preprocess_data_from_db()  # Fetch from DB instead of CSV
-    vector_store = create_vector_store(profiles)
+    vector_store = sync_vector_store()  # Reuses the persisted index, embedding only changed profiles
     retriever = get_retriever(vector_store)
     chain = create_rag_chain()
     
-    def match_candidate(input_data=None, document_path=None):
-        if document_path:
-            if not os.path.exists(document_path):
-                raise FileNotFoundError(f"Document not found at {document_path}")
-            job_description = extract_text_from_pdf(document_path)
-        elif input_data:
-            job_description = input_data
-        else:
-            raise ValueError("Please provide either a job description or a document path.")
-        
-        retriever_results = retriever.invoke(job_description)
-        retriever_docs = [doc.page_content for doc in retriever_results]
-        
-        formatted_docs = "\n\n".join(retriever_docs)
-        
-        response = chain.invoke({
-            "retriever_results": formatted_docs,
-            "job_description": job_description
-        })
-        
-        return response
+    def match_candidate(input_data=None, document_path=None, filters=None):
+        """`filters` (available, location, min/max_charge_rate) restrict retrieval; when omitted they are inferred from the text"""
+        with stage("match_candidate", source="document" if document_path else "text"):
+            if document_path:
+                if not os.path.exists(document_path):
+                    raise FileNotFoundError(f"Document not found at {document_path}")
+                with stage("pdf_extraction") as span:
+                    job_description = extract_text_from_pdf(document_path)
+                    span.set("characters", len(job_description))
+            elif input_data:
+                job_description = input_data
+            else:
+                raise ValueError("Please provide either a job description or a document path.")
+            
+            with stage("retrieval", filtered=bool(filters)) as span:
+                retriever_results = retriever.invoke(job_description, filters=filters)
+                span.set("documents", len(retriever_results))
+            retriever_docs = [doc.page_content for doc in retriever_results]
+            
+            formatted_docs = "\n\n".join(retriever_docs)
+            
+            with stage("candidate_llm") as span:
+                response = chain.invoke({
+                    "retriever_results": formatted_docs,
+                    "job_description": job_description
+                })
+                span.set("prompt_tokens", estimate_tokens(job_description) + estimate_tokens(formatted_docs))
+                span.set("completion_tokens", estimate_tokens(response))
+            
+            return response
     
     return match_candidate
 